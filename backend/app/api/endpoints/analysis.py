@@ -2,7 +2,7 @@ from fastapi import APIRouter, HTTPException, BackgroundTasks, status, UploadFil
 from app.models.pydantic_models import PipelineStatus, FullPipelineResponse, FieldDataImportRequest
 from app.services.data_processing import data_processing_service
 from app.services.canopy import canopy_analysis_service
-from app.services.ecological_analysis import ecological_analysis_service
+from app.services.ecological_analysis import ecological_analysis_service, metrics_store
 from app.services.visualization import visualization_service
 from app.services.report_generator import report_generator_service
 from app.core.config import APP_DATA_INPUT_CANOPY_IMAGES # Import the new config variable
@@ -85,6 +85,7 @@ def run_full_pipeline_task():
         (data_processing_service.clean_vegetation_data, "Data Cleaning"),
         (canopy_analysis_service.run_canopy_analysis, "Canopy Analysis"),
         (ecological_analysis_service.calculate_biomass_and_carbon, "Ecological Calculation"),
+        (metrics_store.materialize_plot_metrics, "Metrics Calculation"),
         (visualization_service.generate_all_plots, "Plot Generation"),
         (report_generator_service.generate_report, "Report Generation"),
     ]
@@ -106,6 +107,7 @@ async def run_single_step(step_name: str):
     - `clean-data`
     - `analyze-canopy`
     - `calculate-ecology`
+    - `compute-metrics`
     - `generate-plots`
     - `generate-report`
     """
@@ -113,6 +115,7 @@ async def run_single_step(step_name: str):
         "clean-data": data_processing_service.clean_vegetation_data,
         "analyze-canopy": canopy_analysis_service.run_canopy_analysis,
         "calculate-ecology": ecological_analysis_service.calculate_biomass_and_carbon,
+        "compute-metrics": metrics_store.materialize_plot_metrics,
         "generate-plots": visualization_service.generate_all_plots,
         "generate-report": report_generator_service.generate_report,
     }
@@ -1,30 +1,51 @@
-from fastapi import APIRouter, HTTPException, Path as FastAPIPath, Body
-from typing import Dict, Any, List
+from fastapi import APIRouter, HTTPException, Path as FastAPIPath, Body, Query
+from typing import Dict, Any, List, Optional
 from pathlib import Path
 import os
-from app.services.ecological_analysis import ecological_analysis_service
-from app.core.config import CANOPY_IMAGES_DIR
+from app.services.ecological_analysis import metrics_store, beta_diversity, accumulation, hill_numbers, carbon_uncertainty, stand_structure, size_classes, census_dynamics, spatial
+from app.services.ecological_analysis import bootstrap as bootstrap_intervals
+from app.services.ecological_analysis import ordination as plot_ordination
+from app.services.ecological_analysis import statistics as statistical_tests
+from app.services.ecological_analysis import diversity_stats
+from app.services.data_processing import data_processing_service
+from app.infrastructure.persistence import aggregation_cube, census_store
+from app.infrastructure.persistence.dataset_io import frame_to_records
+from app.core.config import CANOPY_IMAGES_DIR, ACCUMULATION_PERMUTATIONS, HILL_Q_MIN, HILL_Q_MAX, HILL_Q_STEP, UNCERTAINTY_DRAWS, HEGYI_RADIUS_M, CLUSTER_COUNT, CLUSTER_LINKAGE
 
 router = APIRouter()
 
+def _parse_plot_ids(plots: Optional[str]) -> Optional[List[str]]:
+    """Splits a comma-separated ?plots= value; None (all plots) when it is absent or empty."""
+    if not plots:
+        return None
+    return [plot_id.strip() for plot_id in plots.split(',') if plot_id.strip()]
+
 @router.get("/species-richness/{plot_id}", response_model=Dict[str, Any])
 async def get_species_richness(plot_id: str = FastAPIPath(..., title="The ID of the plot")):
     """
     Get species richness and list for a specific plot.
     """
     try:
-        result = ecological_analysis_service.calculate_species_richness(plot_id)
+        result = metrics_store.get_plot_metric(plot_id, 'richness')
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/diversity/{plot_id}", response_model=Dict[str, Any])
-async def get_diversity_indices(plot_id: str = FastAPIPath(..., title="The ID of the plot")):
+async def get_diversity_indices(
+    plot_id: str = FastAPIPath(..., title="The ID of the plot"),
+    bootstrap: int = Query(0, ge=0, le=100000, description="Bootstrap resamples for confidence intervals; 0 for point estimates only"),
+    ci: float = Query(0.95, gt=0, lt=1),
+    seed: Optional[int] = Query(None),
+):
     """
-    Get diversity indices (Shannon, Simpson, Evenness) for a specific plot.
+    Get diversity indices (Shannon, Simpson, Evenness) for a specific plot, optionally with
+    bootstrap confidence intervals and Chao1/ACE richness estimates.
     """
     try:
-        result = ecological_analysis_service.calculate_diversity_indices(plot_id)
+        result = metrics_store.get_plot_metric(plot_id, 'diversity')
+        if bootstrap:
+            result = {**result, **bootstrap_intervals.get_diversity_intervals([plot_id], bootstrap, ci, seed).get(plot_id, {})}
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -35,7 +56,7 @@ async def get_dominance_metrics(plot_id: str = FastAPIPath(..., title="The ID of
     Get species dominance metrics (abundance rank) for a specific plot.
     """
     try:
-        result = ecological_analysis_service.calculate_dominance(plot_id)
+        result = metrics_store.get_plot_metric(plot_id, 'dominance')
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -46,11 +67,389 @@ async def get_structural_metrics(plot_id: str = FastAPIPath(..., title="The ID o
     Get structural metrics (Height and DBH distributions) for a specific plot.
     """
     try:
-        result = ecological_analysis_service.calculate_structural_metrics(plot_id)
+        result = metrics_store.get_plot_metric(plot_id, 'structure')
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/species-richness", response_model=Dict[str, Any])
+async def get_species_richness_batch(plots: Optional[str] = Query(None, description="Comma-separated plot IDs; all plots if omitted")):
+    """
+    Get species richness for many plots in one request, keyed by plot ID.
+    """
+    try:
+        return metrics_store.get_plot_metrics_batch(_parse_plot_ids(plots), 'richness')
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/diversity", response_model=Dict[str, Any])
+async def get_diversity_indices_batch(
+    plots: Optional[str] = Query(None, description="Comma-separated plot IDs; all plots if omitted"),
+    bootstrap: int = Query(0, ge=0, le=100000, description="Bootstrap resamples for confidence intervals; 0 for point estimates only"),
+    ci: float = Query(0.95, gt=0, lt=1),
+    seed: Optional[int] = Query(None),
+):
+    """
+    Get diversity indices for many plots in one request, keyed by plot ID, optionally with
+    bootstrap confidence intervals and Chao1/ACE richness estimates.
+    """
+    try:
+        result = metrics_store.get_plot_metrics_batch(_parse_plot_ids(plots), 'diversity')
+        if bootstrap:
+            intervals = bootstrap_intervals.get_diversity_intervals(list(result), bootstrap, ci, seed)
+            result = {plot_id: {**value, **intervals.get(plot_id, {})} for plot_id, value in result.items()}
+        return result
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/dominance", response_model=Dict[str, Any])
+async def get_dominance_metrics_batch(plots: Optional[str] = Query(None, description="Comma-separated plot IDs; all plots if omitted")):
+    """
+    Get species dominance metrics for many plots in one request, keyed by plot ID.
+    """
+    try:
+        return metrics_store.get_plot_metrics_batch(_parse_plot_ids(plots), 'dominance')
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/structure", response_model=Dict[str, Any])
+async def get_structural_metrics_batch(plots: Optional[str] = Query(None, description="Comma-separated plot IDs; all plots if omitted")):
+    """
+    Get structural metrics for many plots in one request, keyed by plot ID.
+    """
+    try:
+        return metrics_store.get_plot_metrics_batch(_parse_plot_ids(plots), 'structure')
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/size-classes", response_model=Dict[str, Any])
+async def get_size_classes(
+    variable: str = Query('dbh', description="dbh or height"),
+    edges: Optional[str] = Query(None, description="Comma-separated class edges, e.g. 0,10,20,50; the last class is open-ended"),
+    width: Optional[float] = Query(None, gt=0, description="Class width from 0, used when edges are not given"),
+    plots: Optional[str] = Query(None, description="Comma-separated plot IDs; all plots if omitted"),
+):
+    """
+    Get height or DBH size-class distributions of many plots, with the default classes or
+    custom edges or class width.
+    """
+    try:
+        parsed_edges = [float(edge) for edge in edges.split(',') if edge.strip()] if edges else None
+        return size_classes.get_size_classes(variable, parsed_edges, width, _parse_plot_ids(plots))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/plot-metrics", response_model=Dict[str, Any])
+async def get_plot_metrics_batch(plots: Optional[str] = Query(None, description="Comma-separated plot IDs; all plots if omitted")):
+    """
+    Get richness, diversity, dominance and structure for many plots in one request, keyed by plot ID.
+    """
+    try:
+        return metrics_store.get_plot_metrics_batch(_parse_plot_ids(plots))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/diversity-stats", response_model=Dict[str, Any])
+async def get_diversity_stats(
+    plots: Optional[str] = Query(None, description="Comma-separated plot IDs; all plots if omitted"),
+    verify: bool = Query(False, description="Also recompute every plot from scratch and report the differences"),
+):
+    """
+    Get Shannon, Simpson, Pielou evenness and richness of many plots from the incrementally
+    maintained per-plot statistics, optionally checked against a full recompute.
+    """
+    try:
+        table = diversity_stats.get_diversity_stats(_parse_plot_ids(plots))
+        result = {"plots": frame_to_records(table.reset_index().round(6))}
+        if verify:
+            result["verification"] = diversity_stats.verify_diversity_stats()
+        return result
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/beta-diversity", response_model=Dict[str, Any])
+async def get_beta_diversity(
+    metric: str = Query('bray_curtis', description="bray_curtis, jaccard or sorensen"),
+    plots: Optional[str] = Query(None, description="Comma-separated plot IDs; all plots if omitted"),
+    top_k: Optional[int] = Query(None, ge=1, description="Return only the k most similar plots of each plot"),
+):
+    """
+    Get the pairwise dissimilarity matrix between plots, or the top-k nearest plots of each plot.
+    """
+    try:
+        return beta_diversity.get_beta_diversity(metric, _parse_plot_ids(plots), top_k)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/species-accumulation", response_model=Dict[str, Any])
+async def get_species_accumulation(
+    plots: Optional[str] = Query(None, description="Comma-separated plot IDs whose quadrants are pooled; all plots if omitted"),
+    permutations: int = Query(ACCUMULATION_PERMUTATIONS, ge=1, le=100000),
+    seed: Optional[int] = Query(None, description="Random seed for reproducible curves"),
+    ci: float = Query(0.95, gt=0, lt=1),
+):
+    """
+    Get the sample-based species accumulation curve over quadrants, with a confidence band from random orderings.
+    """
+    try:
+        return accumulation.get_species_accumulation(_parse_plot_ids(plots), permutations, seed, ci)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/rarefaction", response_model=Dict[str, Any])
+async def get_rarefaction(
+    plots: Optional[str] = Query(None, description="Comma-separated plot IDs; all plots if omitted"),
+    step: int = Query(1, ge=1, description="Spacing of the sample sizes (individuals)"),
+):
+    """
+    Get individual-based rarefaction curves (expected richness per number of individuals), keyed by plot ID.
+    """
+    try:
+        return accumulation.get_rarefaction(_parse_plot_ids(plots), step)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/hill-profiles", response_model=Dict[str, Any])
+async def get_hill_profiles(
+    plots: Optional[str] = Query(None, description="Comma-separated plot IDs; all plots if omitted"),
+    q_min: float = Query(HILL_Q_MIN, ge=0),
+    q_max: float = Query(HILL_Q_MAX, ge=0, le=10),
+    q_step: float = Query(HILL_Q_STEP, gt=0),
+):
+    """
+    Get Hill-number diversity profiles (effective number of species for each order q) for many plots.
+    """
+    try:
+        return hill_numbers.get_hill_profiles(_parse_plot_ids(plots), q_min, q_max, q_step)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/plot-clusters", response_model=Dict[str, Any])
+async def get_plot_clusters(
+    features: Optional[str] = Query(None, description="Comma-separated feature groups: species, structure, canopy, carbon; all if omitted"),
+    method: str = Query('hierarchical', description="hierarchical or kmeans"),
+    k: int = Query(CLUSTER_COUNT, ge=1, description="Number of clusters"),
+    linkage: str = Query(CLUSTER_LINKAGE, description="average, complete, single or ward"),
+    metric: str = Query('euclidean', description="euclidean, or bray_curtis, jaccard or sorensen on species alone"),
+    ordination: str = Query('pca', description="pca or pcoa"),
+    plots: Optional[str] = Query(None, description="Comma-separated plot IDs; all plots if omitted"),
+    seed: Optional[int] = Query(None, description="Random seed for reproducible k-means"),
+):
+    """
+    Cluster plots on species composition, structure, canopy and carbon, and place them on the
+    first two axes of a PCA or PCoA ordination.
+    """
+    try:
+        groups = [group.strip() for group in features.split(',') if group.strip()] if features else None
+        return plot_ordination.get_plot_clusters(groups, method, k, linkage, metric, ordination, _parse_plot_ids(plots), seed)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/group-comparison", response_model=Dict[str, Any])
+async def get_group_comparison(
+    source: str = Query('quadrants', description="trees, quadrants or canopy"),
+    by: str = Query('Plot', description="Grouping factor: Plot or Quadrant (and Species for trees)"),
+    variables: Optional[str] = Query(None, description="Comma-separated variables; the source's defaults if omitted"),
+    tests: str = Query('anova,kruskal', description="anova, kruskal or both"),
+    plots: Optional[str] = Query(None, description="Comma-separated plot IDs; all plots if omitted"),
+):
+    """
+    Test whether a variable differs across plots or quadrants (e.g. CO2 per hectare of quadrants
+    across plots) with one-way ANOVA and Kruskal-Wallis, with each group's n, mean and SD.
+    """
+    try:
+        parsed_variables = [variable.strip() for variable in variables.split(',') if variable.strip()] if variables else None
+        parsed_tests = [test.strip() for test in tests.split(',') if test.strip()]
+        return statistical_tests.compare_groups(source, by, parsed_variables, parsed_tests, _parse_plot_ids(plots))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/correlation-matrix", response_model=Dict[str, Any])
+async def get_correlation_matrix(
+    method: str = Query('pearson', description="pearson or spearman"),
+    variables: Optional[str] = Query(None, description="Comma-separated plot metrics; all if omitted"),
+    plots: Optional[str] = Query(None, description="Comma-separated plot IDs; all plots if omitted"),
+):
+    """
+    Get the correlation matrix, p-values and pair counts across the per-plot metrics
+    (diversity, stand structure, canopy and carbon).
+    """
+    try:
+        parsed_variables = [variable.strip() for variable in variables.split(',') if variable.strip()] if variables else None
+        return statistical_tests.get_correlation_matrix(method, parsed_variables, _parse_plot_ids(plots))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/aggregates", response_model=List[Dict[str, Any]])
+async def get_aggregates(
+    level: str = Query('plot', description="plot, quadrant or subplot"),
+    by: Optional[str] = Query(None, description="Breakdown: Type, Species or Type,Species"),
+    plots: Optional[str] = Query(None, description="Comma-separated plot IDs; all plots if omitted"),
+):
+    """
+    Get counts, cover, basal area, biomass and CO2 rolled up at a level of the plot hierarchy,
+    optionally broken down by Type and/or Species, from the precomputed aggregation cube.
+    """
+    try:
+        breakdown = tuple(part.strip() for part in by.split(',') if part.strip()) if by else ()
+        table = aggregation_cube.get_aggregate(level, breakdown, _parse_plot_ids(plots))
+        return frame_to_records(table.reset_index())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/carbon-uncertainty", response_model=List[Dict[str, Any]])
+async def get_carbon_uncertainty(
+    level: str = Query('plot', description="tree, quadrant or plot"),
+    plots: Optional[str] = Query(None, description="Comma-separated plot IDs; all plots if omitted"),
+    draws: int = Query(UNCERTAINTY_DRAWS, ge=2, le=100000),
+    seed: Optional[int] = Query(None, description="Random seed for reproducible intervals"),
+    ci: float = Query(0.95, gt=0, lt=1),
+):
+    """
+    Get Monte Carlo mean, SD and confidence interval of AGB, carbon stock and CO2 equivalent
+    per tree, quadrant or plot, propagating measurement, wood density and allometric model error.
+    """
+    try:
+        table = carbon_uncertainty.get_carbon_uncertainty(level, _parse_plot_ids(plots), draws, seed, ci)
+        return frame_to_records(table.reset_index().round(3))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/stand-structure", response_model=List[Dict[str, Any]])
+async def get_stand_structure(
+    level: str = Query('plot', description="plot or quadrant"),
+    plots: Optional[str] = Query(None, description="Comma-separated plot IDs; all plots if omitted"),
+):
+    """
+    Get stem count, basal area and stem volume (form factor and taper) per plot or quadrant,
+    as totals and per hectare.
+    """
+    try:
+        return frame_to_records(stand_structure.get_stand_structure(level, _parse_plot_ids(plots)).reset_index().round(4))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/importance-values", response_model=List[Dict[str, Any]])
+async def get_importance_values(
+    plots: Optional[str] = Query(None, description="Comma-separated plot IDs; all plots if omitted"),
+):
+    """
+    Get the Importance Value Index (relative density + frequency + dominance) of every species per plot.
+    """
+    try:
+        return frame_to_records(stand_structure.get_importance_values(_parse_plot_ids(plots)).reset_index().round(3))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/spatial-pattern", response_model=Dict[str, Any])
+async def get_spatial_pattern(
+    plots: Optional[str] = Query(None, description="Comma-separated plot IDs; all plots if omitted"),
+    radii: Optional[str] = Query(None, description="Comma-separated radii (m) of Ripley's K/L"),
+    include_derived: bool = Query(False, description="Also use stems without coordinates, placed at random in their quadrant"),
+):
+    """
+    Get the Clark-Evans aggregation index and Ripley's K/L curve of the stem map of many plots.
+    """
+    try:
+        parsed_radii = [float(radius) for radius in radii.split(',') if radius.strip()] if radii else None
+        return spatial.get_spatial_pattern(_parse_plot_ids(plots), include_derived, parsed_radii)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/stem-neighbourhoods", response_model=List[Dict[str, Any]])
+async def get_stem_neighbourhoods(
+    plots: Optional[str] = Query(None, description="Comma-separated plot IDs; all plots if omitted"),
+    radius: float = Query(HEGYI_RADIUS_M, gt=0, description="Neighbour radius (m) of the Hegyi competition index"),
+    include_derived: bool = Query(False, description="Also use stems without coordinates, placed at random in their quadrant"),
+):
+    """
+    Get every stem's position, nearest-neighbour distance and Hegyi competition index.
+    """
+    try:
+        table = spatial.get_stem_neighbourhoods(_parse_plot_ids(plots), include_derived, radius)
+        return frame_to_records(table.round(4))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/censuses", response_model=List[Dict[str, Any]])
+async def get_censuses():
+    """
+    Get the recorded censuses (ID, date, number of trees), oldest first.
+    """
+    try:
+        return census_store.list_censuses()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/censuses", response_model=Dict[str, Any])
+async def record_census(
+    date: str = Query(..., description="Census date, YYYY-MM-DD"),
+    census_id: Optional[str] = Query(None, description="Census ID; census_<date> if omitted"),
+):
+    """
+    Record the current ecological results as a dated census of the woody vegetation.
+    """
+    try:
+        return census_store.record_census(date, census_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/census-dynamics", response_model=List[Dict[str, Any]])
+async def get_census_dynamics(
+    from_census: str = Query(..., description="ID of the earlier census"),
+    to_census: str = Query(..., description="ID of the later census"),
+    level: str = Query('plot', description="stem, quadrant or plot"),
+    plots: Optional[str] = Query(None, description="Comma-separated plot IDs; all plots if omitted"),
+):
+    """
+    Get growth, recruitment, mortality and carbon flux between two censuses, per stem or
+    summarised per quadrant or plot.
+    """
+    try:
+        table = census_dynamics.get_census_dynamics(from_census, to_census, level, _parse_plot_ids(plots))
+        return frame_to_records(table.reset_index(drop=level == 'stem').round(4))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/validation-report", response_model=Dict[str, Any])
+async def get_validation_report():
+    """
+    Validate the raw survey files and return the per-row error table with a summary.
+    The saved validation report is left as the last cleaning run or validate-data wrote it.
+    """
+    try:
+        report, summary = data_processing_service.validate_raw_data(save=False)
+        errors = report.astype({'dataset': str, 'column': str, 'rule': str})
+        return {**summary, "errors": errors.to_dict(orient='records')}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/canopy-images", response_model=List[Dict[str, Any]])
 async def get_canopy_images():
     """
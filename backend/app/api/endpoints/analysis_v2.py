@@ -5,6 +5,7 @@ from app.services.visualization import plot_generator
 from app.core.config import IMAGE_DIR
 from app.application.services.analysis_service import AnalysisService
 from app.api.dependencies import get_analysis_service
+from app.infrastructure.persistence.dataset_io import frame_to_records
 import os
 import pandas as pd
 import shutil
@@ -78,11 +79,11 @@ async def get_plot_data_endpoint(
     # Handle tuple returns for co2_by_quadrant
     if isinstance(data, tuple):
         data = {
-            "method_1_summary": data[0].to_dict(orient='records'),
-            "method_2_summary": data[1].to_dict(orient='records')
+            "method_1_summary": frame_to_records(data[0]),
+            "method_2_summary": frame_to_records(data[1])
         }
     else:
-        data = data.to_dict(orient='records')
+        data = frame_to_records(data)
 
     return JSONResponse(content={"plot_id": plot_id, "plot_name": plot_name, "data": data})
 
@@ -11,100 +11,75 @@ class AnalysisService:
 
     def get_data_for_plant_composition(self, plot_id: str) -> Optional[pd.DataFrame]:
         """Prepares data for the plant composition plot (Fig 2)."""
-        df_cleaned = self.repo.get_cleaned_data()
-        if df_cleaned is None or 'Plot' not in df_cleaned.columns:
+        composition = self.repo.get_aggregates_for_plot(plot_id, 'quadrant', ('Type',))
+        if composition is None or composition.empty:
             return None
-        
-        df_plot = df_cleaned[df_cleaned['Plot'] == plot_id]
-        if df_plot.empty:
-            return None
-            
-        return df_plot.groupby(['Quadrant', 'Type'])['Number'].sum().unstack(fill_value=0).reindex(['Q1','Q2','Q3','Q4'])
+
+        return composition['number'].unstack(fill_value=0).reindex(['Q1','Q2','Q3','Q4'])
 
     def get_data_for_schematic_distribution(self, plot_id: str) -> Optional[pd.DataFrame]:
         """Prepares data for the schematic plant distribution plot (Fig 3)."""
-        df_cleaned = self.repo.get_cleaned_data()
-        df_trees = self.repo.get_ecological_results()
-        if df_cleaned is None or df_trees is None or 'Plot' not in df_cleaned.columns:
-            return None
-
-        df_cleaned_plot = df_cleaned[df_cleaned['Plot'] == plot_id]
-        df_trees_plot = df_trees[df_trees['Plot'] == plot_id]
-        if df_cleaned_plot.empty:
+        df_cleaned_plot = self.repo.get_cleaned_data_for_plot(plot_id)
+        df_trees_plot = self.repo.get_ecological_results_for_plot(plot_id)
+        if df_cleaned_plot is None or df_trees_plot is None or df_cleaned_plot.empty:
             return None
 
         return pd.merge(df_cleaned_plot, df_trees_plot[['Quadrant', 'ID', 'Effective_DBH_cm']], on=['Quadrant', 'ID'], how='left')
 
     def get_data_for_species_distribution(self, plot_id: str) -> Optional[pd.DataFrame]:
         """Prepares data for the woody species distribution plot (Fig 4)."""
-        df_cleaned = self.repo.get_cleaned_data()
-        if df_cleaned is None or 'Plot' not in df_cleaned.columns:
+        by_species = self.repo.get_aggregates_for_plot(plot_id, 'plot', ('Type', 'Species'))
+        if by_species is None or by_species.empty:
             return None
 
-        df_plot = df_cleaned[df_cleaned['Plot'] == plot_id]
-        if df_plot.empty:
-            return None
+        woody = by_species[by_species.index.get_level_values('Type').isin(['Tree', 'Sapling'])]
+        return woody['number'].groupby(level='Species', observed=True).sum().rename('Number').sort_values(ascending=False).reset_index()
 
-        woody_df = df_plot[df_plot['Type'].isin(['Tree', 'Sapling'])].copy()
-        return woody_df.dropna(subset=['Species']).groupby('Species')['Number'].sum().sort_values(ascending=False).reset_index()
+    def _tree_quadrants(self, plot_id: str) -> Optional[pd.DataFrame]:
+        """Quadrant rollup of a plot's ecological results, restricted to quadrants with trees."""
+        by_quadrant = self.repo.get_aggregates_for_plot(plot_id, 'quadrant')
+        if by_quadrant is None or 'trees' not in by_quadrant.columns:
+            return None
+        by_quadrant = by_quadrant[by_quadrant['trees'] > 0]
+        return by_quadrant if not by_quadrant.empty else None
 
     def get_data_for_co2_by_quadrant(self, plot_id: str) -> Optional[Tuple[pd.DataFrame, pd.DataFrame]]:
         """Prepares data for the CO2 sequestered by quadrant plots (Fig 5 & 7)."""
-        df_trees = self.repo.get_ecological_results()
-        if df_trees is None or 'Plot' not in df_trees.columns:
-            return None
-        
-        df_plot = df_trees[df_trees['Plot'] == plot_id]
-        if df_plot.empty:
+        by_quadrant = self._tree_quadrants(plot_id)
+        if by_quadrant is None:
             return None
 
-        summary_m1 = df_plot.groupby('Quadrant')['CO2_Eq_M1_kg'].sum().reset_index()
-        summary_m2 = df_plot.groupby('Quadrant')['CO2_Eq_M2_kg'].sum().reset_index()
+        summary_m1 = by_quadrant['co2_m1_kg'].rename('CO2_Eq_M1_kg').reset_index()
+        summary_m2 = by_quadrant['co2_m2_kg'].rename('CO2_Eq_M2_kg').reset_index()
         return summary_m1, summary_m2
 
     def get_data_for_tree_contribution(self, plot_id: str) -> Optional[pd.DataFrame]:
         """Prepares data for the tree contribution to carbon stock plots (Fig 6 & 8)."""
-        df_trees = self.repo.get_ecological_results()
-        if df_trees is None or 'Plot' not in df_trees.columns:
-            return None
-
-        df_plot = df_trees[df_trees['Plot'] == plot_id]
-        if df_plot.empty:
+        df_plot = self.repo.get_ecological_results_for_plot(plot_id)
+        if df_plot is None or df_plot.empty:
             return None
         
-        df_plot['Tree_Label'] = df_plot['Quadrant'] + " - ID " + df_plot['ID'].astype(str)
+        df_plot['Tree_Label'] = df_plot['Quadrant'].astype(str) + " - ID " + df_plot['ID'].astype(str)
         return df_plot
 
     def get_data_for_co2_comparison(self, plot_id: str) -> Optional[pd.DataFrame]:
         """Prepares data for the CO2 comparison plot (Fig 9)."""
-        df_trees = self.repo.get_ecological_results()
-        if df_trees is None or 'Plot' not in df_trees.columns:
-            return None
-
-        df_plot = df_trees[df_trees['Plot'] == plot_id]
-        if df_plot.empty:
+        by_quadrant = self._tree_quadrants(plot_id)
+        if by_quadrant is None:
             return None
 
-        plot_summary_comp = df_plot.groupby('Quadrant').agg(CO2_M1=('CO2_Eq_M1_kg', 'sum'), CO2_M2=('CO2_Eq_M2_kg', 'sum')).reset_index()
+        plot_summary_comp = by_quadrant[['co2_m1_kg', 'co2_m2_kg']].set_axis(['CO2_M1', 'CO2_M2'], axis=1).reset_index()
         plot_summary_melted = plot_summary_comp.melt(id_vars='Quadrant', var_name='Method', value_name='CO2_kg')
         plot_summary_melted['Method'] = plot_summary_melted['Method'].map({'CO2_M1': 'M1 (Height-Inclusive)', 'CO2_M2': 'M2 (Height-Exclusive)'})
         return plot_summary_melted
 
     def get_data_for_biomass_comparison(self, plot_id: str) -> Optional[pd.DataFrame]:
         """Prepares data for the biomass comparison plot (Fig 10)."""
-        df_trees = self.repo.get_ecological_results()
-        if df_trees is None or 'Plot' not in df_trees.columns:
-            return None
-        
-        df_plot = df_trees[df_trees['Plot'] == plot_id]
-        return df_plot if not df_plot.empty else None
+        df_plot = self.repo.get_ecological_results_for_plot(plot_id)
+        return df_plot if df_plot is not None and not df_plot.empty else None
 
     def get_data_for_canopy_summary(self, plot_id: str) -> Optional[pd.DataFrame]:
         """Prepares data for the canopy cover and LAI summary plots (Fig 11 & 12)."""
-        df_canopy = self.repo.get_canopy_results()
-        if df_canopy is None or 'plot_id' not in df_canopy.columns:
-            return None
-            
         # Map frontend plot_id to backend plot_id format if needed
         if '_' in plot_id and not plot_id.startswith("Plot-P"):
             try:
@@ -117,8 +92,9 @@ class AnalysisService:
         else:
             backend_plot_id = plot_id
 
-        df_plot = df_canopy[df_canopy['plot_id'] == backend_plot_id]
-        
+        df_plot = self.repo.get_canopy_results_for_plot(backend_plot_id)
+        if df_plot is None:
+            return None
         if df_plot.empty:
             logger.warning(f"No canopy data found for original plot_id '{plot_id}' (mapped to '{backend_plot_id}').")
             return None
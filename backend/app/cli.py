@@ -1,10 +1,13 @@
 import typer
 import logging
+from typing import Optional
 from app.services.data_processing import data_processing_service
 from app.services.canopy import canopy_analysis_service
-from app.services.ecological_analysis import ecological_analysis_service
+from app.services.ecological_analysis import ecological_analysis_service, metrics_store, beta_diversity, carbon_uncertainty, diversity_stats
 from app.services.visualization import visualization_service
 from app.services.report_generator import report_generator_service
+from app.infrastructure.persistence import census_store
+from app.core.config import BETA_DIVERSITY_PATH, CARBON_UNCERTAINTY_PATH, UNCERTAINTY_DRAWS
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -12,18 +15,37 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 app = typer.Typer(help="A CLI for running the vegetation analysis pipeline.")
 
 @app.command()
-def clean_data():
+def clean_data(chunksize: Optional[int] = None):
     """
-    Cleans the raw vegetation data.
+    Cleans the raw vegetation data. Pass --chunksize to stream files larger than memory.
     """
     typer.echo("Starting step 1: Cleaning vegetation data...")
     try:
-        data_processing_service.clean_vegetation_data()
+        if chunksize:
+            data_processing_service.stream_clean_vegetation_data(chunksize=chunksize)
+        else:
+            data_processing_service.clean_vegetation_data()
         typer.secho("Step 1: Completed successfully.", fg=typer.colors.GREEN)
     except Exception as e:
         typer.secho(f"Step 1 failed: {e}", fg=typer.colors.RED)
         raise typer.Exit(code=1)
 
+@app.command()
+def validate_data():
+    """
+    Validates the raw vegetation data and writes a per-row error report.
+    """
+    typer.echo("Validating raw vegetation data...")
+    try:
+        _, summary = data_processing_service.validate_raw_data()
+        for item in summary["by_rule"]:
+            typer.echo(f"  {item['dataset']}.{item['column']} [{item['rule']}]: {item['count']} rows")
+        color = typer.colors.YELLOW if summary["total_errors"] else typer.colors.GREEN
+        typer.secho(f"Validation finished: {summary['total_errors']} issues in {summary['rows_affected']} rows.", fg=color)
+    except Exception as e:
+        typer.secho(f"Validation failed: {e}", fg=typer.colors.RED)
+        raise typer.Exit(code=1)
+
 @app.command()
 def analyze_canopy():
     """
@@ -50,6 +72,92 @@ def calculate_ecology():
         typer.secho(f"Step 3 failed: {e}", fg=typer.colors.RED)
         raise typer.Exit(code=1)
 
+@app.command()
+def compute_metrics():
+    """
+    Computes richness, diversity, dominance and structure for every plot into the metrics store.
+    """
+    typer.echo("Computing plot metrics...")
+    try:
+        store = metrics_store.materialize_plot_metrics()
+        typer.secho(f"Plot metrics computed for {len(store['plots'])} plots.", fg=typer.colors.GREEN)
+    except Exception as e:
+        typer.secho(f"Computing plot metrics failed: {e}", fg=typer.colors.RED)
+        raise typer.Exit(code=1)
+
+@app.command(name="verify-diversity")
+def verify_diversity():
+    """
+    Recomputes every plot's diversity indices from scratch and compares them with the
+    incrementally maintained statistics.
+    """
+    typer.echo("Verifying incremental diversity statistics...")
+    try:
+        report = diversity_stats.verify_diversity_stats()
+        for index, difference in report['max_difference'].items():
+            typer.echo(f"  {index}: max difference {difference:.3g}")
+        if report['mismatched_plots']:
+            typer.secho(f"Mismatched plots: {', '.join(report['mismatched_plots'])}", fg=typer.colors.RED)
+            raise typer.Exit(code=1)
+        typer.secho(f"Diversity statistics of {report['plots']} plots match a full recompute.", fg=typer.colors.GREEN)
+    except typer.Exit:
+        raise
+    except Exception as e:
+        typer.secho(f"Verifying diversity statistics failed: {e}", fg=typer.colors.RED)
+        raise typer.Exit(code=1)
+
+@app.command(name="beta-diversity")
+def beta_diversity_matrix(metric: str = "bray_curtis", top_k: Optional[int] = None):
+    """
+    Computes pairwise plot dissimilarities (bray_curtis, jaccard or sorensen) and saves the matrix.
+    With --top-k, prints the k most similar plots of every plot instead.
+    """
+    typer.echo(f"Computing {metric} dissimilarities between plots...")
+    try:
+        if top_k:
+            for plot_id, neighbours in beta_diversity.load_nearest_plots(metric, top_k).items():
+                nearest = ", ".join(f"{n['plot_id']} ({n['dissimilarity']:.3f})" for n in neighbours)
+                typer.echo(f"  {plot_id}: {nearest}")
+        else:
+            path = BETA_DIVERSITY_PATH.with_name(BETA_DIVERSITY_PATH.name.format(metric=metric))
+            beta_diversity.load_beta_diversity(metric).to_csv(path)
+            typer.echo(f"  Saved to {path}")
+        typer.secho("Beta diversity: Completed successfully.", fg=typer.colors.GREEN)
+    except Exception as e:
+        typer.secho(f"Beta diversity failed: {e}", fg=typer.colors.RED)
+        raise typer.Exit(code=1)
+
+@app.command(name="carbon-uncertainty")
+def carbon_uncertainty_report(level: str = "plot", draws: int = UNCERTAINTY_DRAWS, seed: Optional[int] = None, ci: float = 0.95):
+    """
+    Propagates measurement, wood density and model error to AGB, carbon and CO2 by Monte Carlo
+    and saves the mean, SD and interval per tree, quadrant or plot.
+    """
+    typer.echo(f"Computing carbon uncertainty per {level} from {draws} draws per tree...")
+    try:
+        path = CARBON_UNCERTAINTY_PATH.with_name(CARBON_UNCERTAINTY_PATH.name.format(level=level))
+        carbon_uncertainty.get_carbon_uncertainty(level, draws=draws, seed=seed, ci=ci).to_csv(path)
+        typer.echo(f"  Saved to {path}")
+        typer.secho("Carbon uncertainty: Completed successfully.", fg=typer.colors.GREEN)
+    except Exception as e:
+        typer.secho(f"Carbon uncertainty failed: {e}", fg=typer.colors.RED)
+        raise typer.Exit(code=1)
+
+@app.command(name="record-census")
+def record_census(date: str, census_id: Optional[str] = None):
+    """
+    Records the current ecological results as a dated census, for growth, recruitment and
+    mortality between censuses.
+    """
+    typer.echo(f"Recording census of {date}...")
+    try:
+        entry = census_store.record_census(date, census_id)
+        typer.echo(f"  Saved {entry['trees']} trees as census '{entry['census_id']}'")
+        typer.secho("Record census: Completed successfully.", fg=typer.colors.GREEN)
+    except Exception as e:
+        typer.secho(f"Record census failed: {e}", fg=typer.colors.RED)
+        raise typer.Exit(code=1)
+
 @app.command()
 def generate_plots():
     """
@@ -85,6 +193,7 @@ def run_full_pipeline():
     clean_data()
     analyze_canopy()
     calculate_ecology()
+    compute_metrics()
     generate_plots()
     generate_report()
     typer.secho("--- Vegetation Analysis Pipeline Finished Successfully ---", fg=typer.colors.BRIGHT_GREEN)
@@ -24,6 +24,9 @@ RAW_WOODY_DATA = DATA_DIR / "plots-field-data" / "field-data" / "woody_vegetatio
 RAW_HERB_DATA = DATA_DIR / "plots-field-data" / "field-data" / "herb_floor_vegetation.csv"
 CANOPY_IMAGES_DIR = DATA_DIR / "plots-field-data" / "capopy_images"
 APP_DATA_INPUT_CANOPY_IMAGES = DATA_DIR / "canopy_input_images"
+SPECIES_REFERENCE_PATH = DATA_DIR / "reference" / "species_names.csv"
+# Wood density reference in Global Wood Density Database format (Zanne et al. 2009); the full GWDD export can replace it
+WOOD_DENSITY_REFERENCE_PATH = DATA_DIR / "reference" / "wood_density.csv"
 
 # Create input data directories if they don't exist
 os.makedirs(APP_DATA_INPUT_CANOPY_IMAGES, exist_ok=True)
@@ -33,6 +36,15 @@ CLEANED_VEG_FULL_PATH = OUTPUT_DIR / "data" / "cleaned_vegetation_data_full.csv"
 CLEANED_VEG_TREES_PATH = OUTPUT_DIR / "data" / "cleaned_vegetation_data_trees.csv"
 CANOPY_RESULTS_PATH = OUTPUT_DIR / "data" / "canopy_analysis_results.csv"
 ECO_RESULTS_PATH = OUTPUT_DIR / "data" / "ecological_analysis_results.csv"
+VALIDATION_REPORT_PATH = OUTPUT_DIR / "data" / "validation_report.csv"
+PLOT_METRICS_PATH = OUTPUT_DIR / "data" / "plot_metrics.json"
+# Incrementally maintained per-plot diversity sufficient statistics, stamped with the dataset version
+DIVERSITY_STATS_PATH = OUTPUT_DIR / "data" / "diversity_stats.json"
+BETA_DIVERSITY_PATH = OUTPUT_DIR / "data" / "beta_diversity_{metric}.csv"
+CARBON_UNCERTAINTY_PATH = OUTPUT_DIR / "data" / "carbon_uncertainty_{level}.csv"
+# Census-versioned copies of the per-tree ecological results, and their catalogue
+CENSUS_DIR = OUTPUT_DIR / "data" / "censuses"
+CENSUS_INDEX_PATH = CENSUS_DIR / "censuses.json"
 
 # Report paths
 MANUAL_REPORT_PATH = REPORTS_DIR / "manual_report.md"
@@ -47,3 +59,75 @@ SRC_DIR = BASE_DIR / "app"
 DATA_PROCESSING_SCRIPT_PATH = SRC_DIR / "services" / "data_processing" / "data_processing_service.py"
 CANOPY_ANALYSIS_SCRIPT_PATH = SRC_DIR / "services" / "canopy" / "canopy_analysis_service.py"
 ECOLOGICAL_ANALYSIS_SCRIPT_PATH = SRC_DIR / "services" / "ecological_analysis" / "ecological_analysis_service.py"
+
+# In-process cache of parsed datasets shared by the API readers (bytes of DataFrame memory)
+DATASET_CACHE_MAX_BYTES = 512 * 1024 * 1024
+# Derived structures (indexes, matrices, query results) kept per cached dataset, least recently used dropped first
+DATASET_CACHE_MAX_DERIVED = 64
+
+# Upper bound on the values held by one temporary block of the pairwise beta-diversity computation
+BETA_DIVERSITY_BLOCK_ELEMENTS = 4 * 1024 * 1024
+
+# Species accumulation: default number of random sample orderings, and the cap on values held per batch of them
+ACCUMULATION_PERMUTATIONS = 1000
+ACCUMULATION_BATCH_ELEMENTS = 4 * 1024 * 1024
+
+# Bootstrap intervals of the diversity indices: default resamples, and the cap on values drawn per chunk
+BOOTSTRAP_RESAMPLES = 1000
+BOOTSTRAP_MAX_ELEMENTS = 8 * 1024 * 1024
+
+# Default grid of orders q for the Hill-number diversity profiles
+HILL_Q_MIN = 0.0
+HILL_Q_MAX = 3.0
+HILL_Q_STEP = 0.25
+# Largest number of orders one profile request may ask for
+HILL_MAX_ORDERS = 2000
+
+# Largest number of classes one size-class distribution may have
+SIZE_CLASS_MAX_CLASSES = 2000
+
+# Biomass to carbon conversion: total/aboveground biomass ratio (root allowance), carbon fraction and CO2/C mass ratio
+BIOMASS_EXPANSION_FACTOR = 1.26
+CARBON_FRACTION = 0.47
+CO2_PER_CARBON = 44 / 12
+# Allometric models evaluated by the biomass step (names from the registry in ecological_analysis/allometry.py)
+ALLOMETRIC_MODELS_SELECTED = ['M1', 'M2']
+# Residual standard error of ln(AGB) for models that do not declare their own (Chave et al. 2014, eq. 4)
+ALLOMETRIC_RESIDUAL_SD = 0.357
+
+# Wood density (g/cm3) of trees whose species, genus and family are all missing from the wood density reference
+WOOD_DENSITY_DEFAULT = 0.62
+
+# Monte Carlo uncertainty of biomass and carbon: default draws per tree, the cap on tree x draw samples
+# held per chunk, and the relative (log-scale) measurement errors of DBH and height
+UNCERTAINTY_DRAWS = 1000
+UNCERTAINTY_MAX_ELEMENTS = 1024 * 1024
+UNCERTAINTY_DBH_ERROR = 0.05
+UNCERTAINTY_HEIGHT_ERROR = 0.10
+# Relative error of wood density by how it was matched in the wood density reference
+UNCERTAINTY_WOOD_DENSITY_ERROR = {'species': 0.10, 'genus': 0.15, 'family': 0.20, 'default': 0.25}
+
+# Plot layout used to scale stand metrics per hectare: plot dimensions and its grid of quadrants
+PLOT_DIMENSIONS = {'width': 10.0, 'height': 10.0, 'unit': 'm'}
+QUADRANT_GRID = {'rows': 2, 'cols': 2}
+# Stem volume: breast-height form factor, and the exponent of the taper profile above breast height
+# (0.5 paraboloid, 1 cone)
+FORM_FACTOR = 0.5
+TAPER_EXPONENT = 0.75
+
+# Stem maps: optional per-stem coordinate columns (metres from the plot's south-west corner),
+# seed of the positions drawn inside the quadrant for stems without coordinates, neighbour
+# radius of the Hegyi competition index, and radii of Ripley's K/L
+STEM_X_COLUMN = 'X_m'
+STEM_Y_COLUMN = 'Y_m'
+STEM_POSITION_SEED = 0
+HEGYI_RADIUS_M = 3.0
+RIPLEY_RADII_M = [0.5 * step for step in range(1, 11)]
+
+# Plot clustering and ordination: feature groups of the plot x feature matrix used by default,
+# default number of clusters and hierarchical linkage
+ORDINATION_FEATURES = ['species', 'structure', 'canopy', 'carbon']
+CLUSTER_COUNT = 3
+CLUSTER_LINKAGE = 'average'
+# Groups of per-plot metrics (ordination feature groups) correlated by the statistics engine
+CORRELATION_FEATURES = ['diversity', 'structure', 'canopy', 'carbon']
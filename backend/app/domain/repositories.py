@@ -78,3 +78,18 @@ class VegetationRepository(ABC):
     def get_canopy_results(self) -> Any:
         pass
 
+    @abstractmethod
+    def get_cleaned_data_for_plot(self, plot_id: str) -> Any:
+        pass
+
+    @abstractmethod
+    def get_ecological_results_for_plot(self, plot_id: str) -> Any:
+        pass
+
+    @abstractmethod
+    def get_canopy_results_for_plot(self, plot_id: str) -> Any:
+        pass
+
+    @abstractmethod
+    def get_aggregates_for_plot(self, plot_id: str, level: str, by: tuple = ()) -> Any:
+        pass
@@ -0,0 +1,188 @@
+import hashlib
+import logging
+import threading
+import pandas as pd
+from app.core.config import CLEANED_VEG_FULL_PATH, ECO_RESULTS_PATH
+from app.infrastructure.persistence.dataset_cache import dataset_version, load_plot_index
+
+logger = logging.getLogger(__name__)
+
+# Levels of the sampling hierarchy and the key columns that identify a cell at each level
+LEVELS = {
+    'plot': ['Plot'],
+    'quadrant': ['Plot', 'Quadrant'],
+    'subplot': ['Plot', 'Quadrant', 'Subplot_ID'],
+}
+# Breakdowns available at every level
+BREAKDOWNS = [(), ('Type',), ('Species',), ('Type', 'Species')]
+
+# Measures summed from the cleaned records. Herb-layer records (those with a Subplot_ID) hold a
+# cover percentage in 'Number'; all other records hold a count of individuals.
+RECORD_MEASURES = ['number', 'count', 'cover']
+# Measures summed from the per-tree ecological results, by source column ('trees' counts result rows)
+TREE_MEASURES = {
+    'trees': None,
+    'basal_area_m2': 'Basal_Area_m2',
+    'volume_ff_m3': 'Volume_FF_m3',
+    'volume_taper_m3': 'Volume_Taper_m3',
+    'agb_m1_kg': 'AGB_M1_kg',
+    'agb_m2_kg': 'AGB_M2_kg',
+    'co2_m1_kg': 'CO2_Eq_M1_kg',
+    'co2_m2_kg': 'CO2_Eq_M2_kg',
+}
+
+_state = {"versions": None, "fingerprints": {}, "blocks": {}, "assembled": {}}
+_lock = threading.Lock()
+
+
+def _dimensions(df: pd.DataFrame) -> pd.DataFrame:
+    """Key columns of the cube. Rows outside any subplot (trees) get an empty Subplot_ID so they still roll up."""
+    dims = df.reindex(columns=['Plot', 'Quadrant', 'Subplot_ID', 'Type', 'Species'])
+    dims['Subplot_ID'] = dims['Subplot_ID'].astype(object).where(dims['Subplot_ID'].notna(), '')
+    return dims
+
+
+def _record_facts(df: pd.DataFrame) -> pd.DataFrame:
+    number = df['Number'] if 'Number' in df.columns else pd.Series(1, index=df.index)
+    is_cover = df['Subplot_ID'].notna() if 'Subplot_ID' in df.columns else pd.Series(False, index=df.index)
+    facts = _dimensions(df)
+    facts['number'] = number
+    facts['count'] = number.where(~is_cover, 0)
+    facts['cover'] = number.where(is_cover, 0)
+    return facts
+
+
+def _tree_facts(df: pd.DataFrame) -> pd.DataFrame:
+    facts = _dimensions(df)
+    for measure, column in TREE_MEASURES.items():
+        if column is None:
+            facts[measure] = 1
+        elif column in df.columns:
+            facts[measure] = df[column]
+    return facts
+
+
+def _rollup(facts: pd.DataFrame, keys: list, measures: list) -> pd.DataFrame:
+    return facts.groupby(keys, observed=True)[measures].sum()
+
+
+def build_blocks(records: pd.DataFrame, trees: pd.DataFrame = None) -> dict:
+    """
+    All rollups of the plots in the given rows, keyed by plot then by (level, breakdown). Each
+    rollup is a frame indexed by the level's keys plus the breakdown columns, with one column per
+    measure. Every rollup is one groupby over all the plots, split per plot afterwards. Record and
+    tree measures are rolled up separately and aligned on the group keys, so integer counts stay
+    integers.
+    """
+    record_facts = _record_facts(records)
+    tree_facts = _tree_facts(trees) if trees is not None and not trees.empty else None
+    tree_measures = [m for m in TREE_MEASURES if tree_facts is not None and m in tree_facts.columns]
+
+    blocks = {}
+    for level, level_keys in LEVELS.items():
+        for breakdown in BREAKDOWNS:
+            keys = level_keys + list(breakdown)
+            table = _rollup(record_facts, keys, RECORD_MEASURES)
+            if tree_measures:
+                table = table.join(_rollup(tree_facts, keys, tree_measures), how='outer')
+                for measure in RECORD_MEASURES:
+                    table[measure] = table[measure].fillna(0).astype(record_facts[measure].dtype)
+                table[tree_measures] = table[tree_measures].fillna(0.0)
+                table['trees'] = table['trees'].astype('int64')
+            plot_level = table.index.get_level_values('Plot').astype(str)
+            for plot, rows in pd.Series(range(len(table))).groupby(plot_level.to_numpy()).indices.items():
+                blocks.setdefault(plot, {})[(level, tuple(breakdown))] = table.iloc[rows]
+    return blocks
+
+
+def _fingerprint(frame: pd.DataFrame) -> str:
+    if frame is None or frame.empty:
+        return ""
+    return hashlib.blake2b(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes(), digest_size=16).hexdigest()
+
+
+def _load_indexes():
+    records = load_plot_index(CLEANED_VEG_FULL_PATH)
+    try:
+        trees = load_plot_index(ECO_RESULTS_PATH)
+    except FileNotFoundError:
+        trees = None
+    return records, trees
+
+
+def _versions() -> tuple:
+    try:
+        trees_version = dataset_version(ECO_RESULTS_PATH)
+    except FileNotFoundError:
+        trees_version = None
+    return dataset_version(CLEANED_VEG_FULL_PATH), trees_version
+
+
+def refresh_cube() -> dict:
+    """
+    Brings the cube up to date with the datasets and returns its per-plot blocks. When a
+    dataset changes, each plot's rows are fingerprinted and only plots whose rows changed are
+    rolled up again; blocks of removed plots are dropped.
+    Raises FileNotFoundError if the cleaned dataset does not exist.
+    """
+    with _lock:
+        versions = _versions()
+        if _state["versions"] == versions:
+            return _state["blocks"]
+
+        records, trees = _load_indexes()
+        plots = set(records.keys())
+        fingerprints = {
+            plot: (_fingerprint(records.get(plot)), _fingerprint(trees.get(plot) if trees is not None else None))
+            for plot in plots
+        }
+        changed = sorted(plot for plot in plots
+                         if _state["fingerprints"].get(plot) != fingerprints[plot] or plot not in _state["blocks"])
+        if changed:
+            changed_trees = pd.concat([trees.get(plot) for plot in changed]) if trees is not None else None
+            rebuilt = build_blocks(pd.concat([records.get(plot) for plot in changed]), changed_trees)
+            _state["blocks"].update({plot: rebuilt.get(plot, {}) for plot in changed})
+        for plot in set(_state["blocks"]) - plots:
+            del _state["blocks"][plot]
+
+        _state.update(versions=versions, fingerprints=fingerprints, assembled={})
+        logger.info(f"Aggregation cube refreshed: {len(changed)} of {len(plots)} plots rebuilt.")
+        return _state["blocks"]
+
+
+def _check_query(level: str, by) -> tuple:
+    by = tuple([by] if isinstance(by, str) else by or ())
+    if level not in LEVELS:
+        raise ValueError(f"Unknown level '{level}'; expected one of {', '.join(LEVELS)}")
+    if by not in BREAKDOWNS:
+        raise ValueError(f"Unsupported breakdown {list(by)}; expected one of {[list(b) for b in BREAKDOWNS]}")
+    return by
+
+
+def get_plot_aggregate(plot_id: str, level: str = 'plot', by=()) -> pd.DataFrame:
+    """
+    One plot's rollup at a level ('plot', 'quadrant' or 'subplot') with an optional breakdown
+    by 'Type', 'Species' or both. The Plot key is dropped from the index. Empty for unknown plots.
+    """
+    by = _check_query(level, by)
+    block = refresh_cube().get(str(plot_id))
+    if not block:
+        return pd.DataFrame(columns=RECORD_MEASURES)
+    return block[(level, by)].droplevel('Plot') if len(LEVELS[level]) + len(by) > 1 else block[(level, by)]
+
+
+def get_aggregate(level: str = 'plot', by=(), plot_ids: list = None) -> pd.DataFrame:
+    """Rollup of many plots (all by default) at a level and breakdown, indexed by the full group keys."""
+    by = _check_query(level, by)
+    blocks = refresh_cube()
+    plots = sorted(blocks) if plot_ids is None else [str(plot_id) for plot_id in plot_ids if str(plot_id) in blocks]
+    if plot_ids is None:
+        with _lock:
+            assembled = _state["assembled"].get((level, by))
+            if assembled is None:
+                assembled = pd.concat([blocks[plot][(level, by)] for plot in plots]) if plots else pd.DataFrame(columns=RECORD_MEASURES)
+                _state["assembled"][(level, by)] = assembled
+        return assembled
+    if not plots:
+        return pd.DataFrame(columns=RECORD_MEASURES)
+    return pd.concat([blocks[plot][(level, by)] for plot in plots])
@@ -0,0 +1,78 @@
+import json
+import logging
+import os
+import re
+import threading
+from datetime import date, datetime, timezone
+import pandas as pd
+from app.core.config import CENSUS_DIR, CENSUS_INDEX_PATH, ECO_RESULTS_PATH
+from app.infrastructure.persistence.dataset_cache import load_dataset, store_dataset
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+# Census IDs name their file, so they are kept to plain file-name characters
+_CENSUS_ID = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_.-]*$')
+
+
+def _read_index() -> list:
+    try:
+        with open(CENSUS_INDEX_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (json.JSONDecodeError, FileNotFoundError):
+        return []
+
+
+def _write_index(censuses: list):
+    os.makedirs(CENSUS_DIR, exist_ok=True)
+    with open(CENSUS_INDEX_PATH, 'w', encoding='utf-8') as f:
+        json.dump(censuses, f, indent=4)
+
+
+def list_censuses() -> list:
+    """Recorded censuses, oldest first: census_id, date, number of trees and when each was recorded."""
+    return sorted(_read_index(), key=lambda census: (census['date'], census['census_id']))
+
+
+def get_census(census_id: str) -> dict:
+    """Catalogue entry of one census. Raises ValueError if it was never recorded."""
+    for census in _read_index():
+        if census['census_id'] == census_id:
+            return census
+    raise ValueError(f"Unknown census '{census_id}'")
+
+
+def record_census(census_date: str, census_id: str = None, source=ECO_RESULTS_PATH) -> dict:
+    """
+    Stores the current per-tree results as the census taken on census_date (YYYY-MM-DD), so
+    later imports no longer overwrite it. The rows are stamped with Census_ID and Census_Date.
+    Recording an existing census_id replaces that census.
+    """
+    surveyed = date.fromisoformat(census_date).isoformat()
+    census_id = census_id or f"census_{surveyed}"
+    if not _CENSUS_ID.match(census_id):
+        raise ValueError(f"Invalid census ID '{census_id}'; use letters, digits, '_', '-' and '.'")
+    trees = load_dataset(source)
+    trees.insert(0, 'Census_Date', surveyed)
+    trees.insert(0, 'Census_ID', census_id)
+    path = CENSUS_DIR / f"{census_id}.csv"
+    os.makedirs(CENSUS_DIR, exist_ok=True)
+    store_dataset(trees, path)
+
+    entry = {
+        "census_id": census_id,
+        "date": surveyed,
+        "trees": int(len(trees)),
+        "recorded_at": datetime.now(timezone.utc).isoformat(),
+        "file": path.name,
+    }
+    with _lock:
+        censuses = [census for census in _read_index() if census['census_id'] != census_id]
+        _write_index(censuses + [entry])
+    logger.info(f"Recorded census '{census_id}' ({surveyed}) with {len(trees)} trees.")
+    return entry
+
+
+def load_census(census_id: str) -> pd.DataFrame:
+    """Per-tree results of a recorded census, through the dataset cache."""
+    return load_dataset(CENSUS_DIR / get_census(census_id)['file'])
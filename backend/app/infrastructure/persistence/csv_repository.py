@@ -2,6 +2,8 @@ import pandas as pd
 import logging
 from typing import Any, Optional
 from app.domain.repositories import VegetationRepository
+from app.infrastructure.persistence.dataset_cache import load_dataset, load_plot_index
+from app.infrastructure.persistence.aggregation_cube import get_plot_aggregate
 from app.core.config import (
     CLEANED_VEG_FULL_PATH,
     ECO_RESULTS_PATH,
@@ -13,21 +15,49 @@ logger = logging.getLogger(__name__)
 class CsvVegetationRepository(VegetationRepository):
     def get_cleaned_data(self) -> Optional[pd.DataFrame]:
         try:
-            return pd.read_csv(CLEANED_VEG_FULL_PATH)
+            return load_dataset(CLEANED_VEG_FULL_PATH)
         except FileNotFoundError:
             logger.error(f"Data file not found: {CLEANED_VEG_FULL_PATH}")
             return None
 
     def get_ecological_results(self) -> Optional[pd.DataFrame]:
         try:
-            return pd.read_csv(ECO_RESULTS_PATH)
+            return load_dataset(ECO_RESULTS_PATH)
         except FileNotFoundError:
             logger.error(f"Data file not found: {ECO_RESULTS_PATH}")
             return None
 
     def get_canopy_results(self) -> Optional[pd.DataFrame]:
         try:
-            return pd.read_csv(CANOPY_RESULTS_PATH)
+            return load_dataset(CANOPY_RESULTS_PATH)
         except FileNotFoundError:
             logger.error(f"Data file not found: {CANOPY_RESULTS_PATH}")
             return None
+
+    def _get_plot_rows(self, path, plot_id: str, column: str = 'Plot') -> Optional[pd.DataFrame]:
+        """Rows of one plot through the cached per-plot index; None if the dataset is unavailable."""
+        try:
+            return load_plot_index(path, column).get(plot_id)
+        except FileNotFoundError:
+            logger.error(f"Data file not found: {path}")
+            return None
+        except KeyError:
+            logger.error(f"Column '{column}' not found in {path}")
+            return None
+
+    def get_cleaned_data_for_plot(self, plot_id: str) -> Optional[pd.DataFrame]:
+        return self._get_plot_rows(CLEANED_VEG_FULL_PATH, plot_id)
+
+    def get_ecological_results_for_plot(self, plot_id: str) -> Optional[pd.DataFrame]:
+        return self._get_plot_rows(ECO_RESULTS_PATH, plot_id)
+
+    def get_canopy_results_for_plot(self, plot_id: str) -> Optional[pd.DataFrame]:
+        return self._get_plot_rows(CANOPY_RESULTS_PATH, plot_id, column='plot_id')
+
+    def get_aggregates_for_plot(self, plot_id: str, level: str, by: tuple = ()) -> Optional[pd.DataFrame]:
+        """Rollup of one plot from the aggregation cube; None if the datasets are unavailable."""
+        try:
+            return get_plot_aggregate(plot_id, level, by)
+        except FileNotFoundError as e:
+            logger.error(f"Data file not found: {e.filename}")
+            return None
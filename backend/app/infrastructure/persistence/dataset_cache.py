@@ -0,0 +1,207 @@
+import logging
+import sys
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Optional, Union
+import numpy as np
+import pandas as pd
+from app.core.config import DATASET_CACHE_MAX_BYTES, DATASET_CACHE_MAX_DERIVED
+from app.infrastructure.persistence.dataset_io import dataset_version, read_dataset, write_dataset
+from app.infrastructure.persistence.plot_index import PlotIndex
+
+logger = logging.getLogger(__name__)
+
+
+def _cache_key(path: Union[str, Path]) -> str:
+    return str(Path(path).resolve())
+
+
+def _optional_version(path: Union[str, Path]) -> Optional[str]:
+    try:
+        return dataset_version(path)
+    except FileNotFoundError:
+        return None
+
+
+def _derived_nbytes(value, _seen: set = None) -> int:
+    """
+    Approximate memory held by a derived structure: deep memory usage of pandas objects, the
+    nbytes of arrays and of structures that report it (PlotIndex, CommunityMatrix), and the
+    recursive size of dicts, lists, tuples and object attributes (API payloads and the like).
+    """
+    seen = set() if _seen is None else _seen
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=True))
+    nbytes = getattr(value, 'nbytes', None)
+    if isinstance(nbytes, (int, np.integer)):
+        return int(nbytes)
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_derived_nbytes(k, seen) + _derived_nbytes(v, seen) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(_derived_nbytes(item, seen) for item in value)
+    elif hasattr(value, '__dict__') and not isinstance(value, type):
+        size += _derived_nbytes(vars(value), seen)
+    return size
+
+
+class DatasetCache:
+    """
+    LRU cache of parsed datasets keyed by path and file version. Entries are evicted
+    least-recently-used first once their combined memory exceeds max_bytes, and are
+    replaced whenever the file on disk changes, so a warm hit costs one stat() call.
+
+    Callers receive a shallow copy: with pandas Copy-on-Write (always on from pandas 3, which
+    requirements.txt pins), adding or overwriting columns on it never reaches the cached frame.
+
+    Derived structures such as per-plot indexes are built lazily and live in the same entry, so
+    they are rebuilt once per dataset version. Their memory counts towards max_bytes, and each
+    dataset keeps at most max_derived of them, dropping the least recently used first.
+    """
+    def __init__(self, max_bytes: int = DATASET_CACHE_MAX_BYTES, loader: Callable = read_dataset,
+                 max_derived: int = DATASET_CACHE_MAX_DERIVED):
+        self.max_bytes = max_bytes
+        self.max_derived = max_derived
+        self.loader = loader
+        self.entries = OrderedDict()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.RLock()
+
+    def get(self, path: Union[str, Path]) -> pd.DataFrame:
+        with self._lock:
+            return self._entry(path)["frame"].copy(deep=False)
+
+    def get_index(self, path: Union[str, Path], column: str = 'Plot') -> PlotIndex:
+        """PlotIndex of a dataset on the given key column, built once per dataset version."""
+        return self.get_derived(path, ('plot_index', column), lambda df: PlotIndex(df, column))
+
+    def get_derived(self, path: Union[str, Path], key, builder: Callable, depends_on: tuple = ()):
+        """
+        A structure derived from a dataset (index, matrix, ...) by builder(frame), built once per
+        dataset version and dropped with it. When it also depends on other files (depends_on),
+        it is rebuilt in place whenever one of their versions changes.
+        The builder receives the cached frame itself and must not modify it.
+        """
+        with self._lock:
+            entry = self._entry(path)
+            depends = tuple(_optional_version(other) for other in depends_on)
+            record = entry["derived"].get(key)
+            if record is not None and record["depends"] == depends:
+                entry["derived"].move_to_end(key)
+                return record["value"]
+            if record is not None:
+                self._drop_derived(entry, key)
+
+            value = builder(entry["frame"])
+            record = {"value": value, "nbytes": _derived_nbytes(value), "depends": depends}
+            entry["derived"][key] = record
+            self._resize(entry, record["nbytes"])
+            while len(entry["derived"]) > self.max_derived:
+                self._drop_derived(entry, next(iter(entry["derived"])))
+            self._evict(keep=entry)
+            return value
+
+    def _resize(self, entry: dict, nbytes: int):
+        entry["nbytes"] += nbytes
+        if any(cached is entry for cached in self.entries.values()):
+            self.current_bytes += nbytes
+
+    def _drop_derived(self, entry: dict, key):
+        record = entry["derived"].pop(key)
+        self._resize(entry, -record["nbytes"])
+
+    def _entry(self, path: Union[str, Path]) -> dict:
+        key = _cache_key(path)
+        version = dataset_version(path)
+        entry = self.entries.get(key)
+        if entry is not None and entry["version"] == version:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        self._drop(key)
+        frame = self.loader(path)
+        nbytes = int(frame.memory_usage(deep=True).sum())
+        entry = {"version": version, "frame": frame, "nbytes": nbytes, "derived": OrderedDict()}
+        if nbytes <= self.max_bytes:
+            self.entries[key] = entry
+            self.current_bytes += nbytes
+            self._evict(keep=entry)
+        else:
+            logger.warning(f"{path} needs {nbytes} bytes, more than the dataset cache limit; not caching it.")
+        return entry
+
+    def version(self, path: Union[str, Path]) -> Optional[str]:
+        """Version of the cached copy of a dataset, or None if it is not cached."""
+        with self._lock:
+            entry = self.entries.get(_cache_key(path))
+            return entry["version"] if entry is not None else None
+
+    def invalidate(self, path: Union[str, Path] = None):
+        """Drops one dataset from the cache, or every dataset when no path is given."""
+        with self._lock:
+            if path is None:
+                self.entries.clear()
+                self.current_bytes = 0
+            else:
+                self._drop(_cache_key(path))
+
+    def _drop(self, key: str):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.current_bytes -= entry["nbytes"]
+
+    def _evict(self, keep: dict = None):
+        """
+        Drops least-recently-used datasets until the cache fits max_bytes, then the oldest
+        derived structures of the dataset in use (keep), always leaving its newest one.
+        """
+        while self.current_bytes > self.max_bytes:
+            victim = next((key for key, entry in self.entries.items() if entry is not keep), None)
+            if victim is not None:
+                self.current_bytes -= self.entries.pop(victim)["nbytes"]
+                logger.info(f"Evicted {victim} from the dataset cache.")
+            elif keep is not None and len(keep["derived"]) > 1:
+                self._drop_derived(keep, next(iter(keep["derived"])))
+            else:
+                break
+
+
+# Process-wide cache used by the repositories, services and API endpoints
+dataset_cache = DatasetCache()
+
+
+def load_dataset(path: Union[str, Path]) -> pd.DataFrame:
+    """Cached read_dataset. Raises FileNotFoundError like pd.read_csv when the file does not exist."""
+    return dataset_cache.get(path)
+
+
+def load_plot_index(path: Union[str, Path], column: str = 'Plot') -> PlotIndex:
+    """Cached PlotIndex of a dataset. Raises FileNotFoundError when the file does not exist."""
+    return dataset_cache.get_index(path, column)
+
+
+def load_derived(path: Union[str, Path], key, builder: Callable, depends_on: tuple = ()):
+    """Cached structure derived from a dataset, rebuilt whenever the dataset (or a file in depends_on) changes."""
+    return dataset_cache.get_derived(path, key, builder, depends_on)
+
+
+def store_dataset(df: pd.DataFrame, path: Union[str, Path]) -> pd.DataFrame:
+    """write_dataset followed by invalidation of the cached copy, for pipeline steps that rewrite a dataset."""
+    df = write_dataset(df, path)
+    dataset_cache.invalidate(path)
+    return df
+
+
+def invalidate_dataset(path: Union[str, Path] = None):
+    """Drops a dataset (or all datasets) from the cache after it was rewritten outside store_dataset."""
+    dataset_cache.invalidate(path)
@@ -0,0 +1,163 @@
+import json
+import os
+import logging
+from pathlib import Path
+from typing import Union
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# --- Canonical schema for the cleaned and derived vegetation datasets ---
+# Identifier and label columns are stored as categoricals so that groupby and equality
+# filters work on integer codes instead of hashing Python strings. Field measurements are
+# recorded to one decimal place, so they are narrowed to float32 (or int32 when the column
+# holds whole numbers only); derived quantities (DBH, biomass, carbon) stay float64.
+CATEGORICAL_COLUMNS = [
+    'Plot', 'Quadrant', 'ID', 'Type', 'Species', 'Species_Raw', 'Location_Name', 'Condition',
+    'Subplot_ID', 'plot_id', 'filename',
+]
+
+COMPACT_NUMERIC_COLUMNS = [
+    'Number', 'Height_m', 'Total_GBH_cm',
+]
+COMPACT_NUMERIC_PREFIXES = ('Girth_cm_Stem', 'GBH_Stem')
+
+SCHEMA_SUFFIX = '.schema.json'
+
+
+def schema_path(path: Union[str, Path]) -> Path:
+    """Location of the persisted category dictionaries for a dataset file."""
+    path = Path(path)
+    return path.with_name(path.stem + SCHEMA_SUFFIX)
+
+
+def dataset_version(path: Union[str, Path]) -> str:
+    """
+    Version token of a dataset file, derived from its modification time and size.
+    Anything computed from a dataset can be stamped with this token and reused while it matches.
+    Raises FileNotFoundError if the file does not exist.
+    """
+    stat = os.stat(path)
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+def _is_compact_numeric_column(col: str) -> bool:
+    return col in COMPACT_NUMERIC_COLUMNS or col.startswith(COMPACT_NUMERIC_PREFIXES)
+
+
+def apply_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """Converts a frame to the canonical dtypes. Columns outside the schema are left as they are."""
+    conversions = {}
+    for col in df.columns:
+        if col in CATEGORICAL_COLUMNS and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            # Categories are the string form of the values so they round-trip through CSV
+            conversions[col] = pd.CategoricalDtype(sorted(df[col].dropna().astype(str).unique()))
+        elif _is_compact_numeric_column(col) and pd.api.types.is_integer_dtype(df[col]):
+            if df[col].dtype != np.int32:
+                conversions[col] = np.int32
+        elif _is_compact_numeric_column(col) and pd.api.types.is_float_dtype(df[col]):
+            if df[col].dtype != np.float32:
+                conversions[col] = np.float32
+    if not conversions:
+        return df
+    df = df.copy()
+    for col, dtype in conversions.items():
+        if isinstance(dtype, pd.CategoricalDtype):
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str)).astype(dtype)
+        else:
+            df[col] = df[col].astype(dtype)
+    return df
+
+
+def build_schema(df: pd.DataFrame) -> dict:
+    """Describes the dtypes of a frame, including the category dictionary of each categorical."""
+    columns = {}
+    for col in df.columns:
+        dtype = df[col].dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            columns[col] = {"dtype": "category", "categories": [str(c) for c in dtype.categories]}
+        elif dtype in (np.float32, np.int32):
+            columns[col] = {"dtype": str(dtype)}
+    return {"columns": columns}
+
+
+def merge_schemas(left: dict, right: dict) -> dict:
+    """Unions the category dictionaries of two schemas (used when a dataset is written in chunks)."""
+    columns = {col: dict(spec) for col, spec in left.get("columns", {}).items()}
+    for col, spec in right.get("columns", {}).items():
+        if col not in columns:
+            columns[col] = dict(spec)
+        elif spec["dtype"] == "category":
+            columns[col]["categories"] = sorted(set(columns[col]["categories"]) | set(spec["categories"]))
+        elif spec["dtype"] != columns[col]["dtype"]:
+            # A column that is whole numbers in one chunk and fractional in another is float32
+            columns[col] = {"dtype": "float32"}
+    return {"columns": columns}
+
+
+def write_schema(path: Union[str, Path], schema: dict):
+    """
+    Persists a schema next to its dataset, stamped with the dataset's version so that any later
+    edit of the file (even one that keeps its size) makes the schema stale.
+    """
+    schema = dict(schema, source_version=dataset_version(path))
+    with open(schema_path(path), 'w', encoding='utf-8') as f:
+        json.dump(schema, f)
+
+
+def read_schema(path: Union[str, Path]):
+    """Returns the persisted schema of a dataset, or None if it is missing or out of date."""
+    sidecar = schema_path(path)
+    if not sidecar.exists():
+        return None
+    try:
+        with open(sidecar, 'r', encoding='utf-8') as f:
+            schema = json.load(f)
+    except (json.JSONDecodeError, OSError):
+        return None
+    if schema.get("source_version") != dataset_version(path):
+        logger.warning(f"Schema {sidecar} does not match {path}; inferring dtypes instead.")
+        return None
+    return schema
+
+
+def write_dataset(df: pd.DataFrame, path: Union[str, Path]) -> pd.DataFrame:
+    """Writes a dataset as CSV in the canonical schema together with its category dictionaries."""
+    df = apply_schema(df)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    df.to_csv(path, index=False)
+    write_schema(path, build_schema(df))
+    return df
+
+
+def frame_to_records(df: pd.DataFrame) -> list:
+    """
+    Converts a frame to JSON-ready records. float32 columns are widened through their shortest
+    decimal representation so that a recorded 4.1 is served as 4.1, not 4.099999904632568.
+    """
+    float32_cols = [col for col in df.columns if df[col].dtype == np.float32]
+    if float32_cols:
+        df = df.copy()
+        for col in float32_cols:
+            df[col] = pd.to_numeric(df[col].astype(str), errors='coerce')
+    return df.to_dict(orient='records')
+
+
+def read_dataset(path: Union[str, Path]) -> pd.DataFrame:
+    """
+    Reads a dataset written by write_dataset, restoring categoricals and float32 columns.
+    Files without a (valid) schema are read normally and converted to the canonical schema.
+    Raises FileNotFoundError like pd.read_csv when the file does not exist.
+    """
+    schema = read_schema(path) if os.path.exists(path) else None
+    if schema is None:
+        return apply_schema(pd.read_csv(path))
+
+    dtypes = {}
+    for col, spec in schema["columns"].items():
+        if spec["dtype"] == "category":
+            dtypes[col] = pd.CategoricalDtype(spec["categories"])
+        else:
+            dtypes[col] = spec["dtype"]
+    return pd.read_csv(path, dtype=dtypes)
@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+
+
+class PlotIndex:
+    """
+    A dataset sorted by one key column (normally 'Plot') so that the rows of every key value
+    form one contiguous block. Selecting a plot is then a dict lookup plus an iloc slice
+    instead of a boolean scan over the whole frame.
+
+    The sort is stable, so each plot's rows keep their original order and index labels,
+    exactly as df[df['Plot'] == plot_id] would return them.
+    """
+    def __init__(self, df: pd.DataFrame, column: str = 'Plot'):
+        self.column = column
+        keys = df[column]
+        if isinstance(keys.dtype, pd.CategoricalDtype):
+            codes, labels = keys.cat.codes.to_numpy(), keys.cat.categories
+        else:
+            codes, labels = pd.factorize(keys, sort=True)
+
+        order = np.argsort(codes, kind='stable')
+        sorted_codes = codes[order]
+        # Rows with a missing key (code -1) sort first and are never addressable
+        start = int(np.searchsorted(sorted_codes, 0))
+        self.frame = df.iloc[order[start:]]
+        sorted_codes = sorted_codes[start:]
+
+        bounds = np.flatnonzero(np.diff(sorted_codes)) + 1
+        starts = np.concatenate([[0], bounds]) if sorted_codes.size else np.array([], dtype=int)
+        stops = np.concatenate([bounds, [sorted_codes.size]]) if sorted_codes.size else np.array([], dtype=int)
+        self.slices = {
+            str(labels[sorted_codes[s]]): slice(int(s), int(e)) for s, e in zip(starts, stops)
+        }
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the sorted copy of the dataset."""
+        return int(self.frame.memory_usage(deep=True).sum())
+
+    def __contains__(self, key) -> bool:
+        return str(key) in self.slices
+
+    def keys(self) -> list:
+        return list(self.slices)
+
+    def get(self, key) -> pd.DataFrame:
+        """Rows of one plot; an empty frame with the dataset's columns if the plot is unknown."""
+        return self.frame.iloc[self.slices.get(str(key), slice(0, 0))]
+
+    def items(self):
+        for key, rows in self.slices.items():
+            yield key, self.frame.iloc[rows]
@@ -9,6 +9,7 @@ from app.core.config import (
     CANOPY_RESULTS_PATH,
     CANOPY_IMAGE_DIR,
 )
+from app.infrastructure.persistence.dataset_cache import invalidate_dataset
 
 logger = logging.getLogger(__name__)
 
@@ -110,4 +111,5 @@ def run_canopy_analysis():
             else:
                 logging.warning(f"Skipping non-plot directory or file: {plot_path}")
 
+    invalidate_dataset(CANOPY_RESULTS_PATH)
     logging.info(f"Canopy analysis finished. Results saved to {CANOPY_RESULTS_PATH}")
@@ -1,3 +1,4 @@
+import re
 import pandas as pd
 import numpy as np
 import os
@@ -7,128 +8,302 @@ from app.core.config import (
     RAW_HERB_DATA,
     CLEANED_VEG_FULL_PATH,
     CLEANED_VEG_TREES_PATH,
+    VALIDATION_REPORT_PATH,
 )
+from app.services.data_processing.survey_validator import validate_survey_data, summarize_errors
+from app.services.data_processing.species_normalizer import SpeciesResolver
+from app.infrastructure.persistence.dataset_io import (
+    apply_schema,
+    build_schema,
+    merge_schemas,
+    write_schema,
+)
+from app.infrastructure.persistence.dataset_cache import store_dataset, invalidate_dataset
 
 logger = logging.getLogger(__name__)
 
-def clean_vegetation_data():
-    """
-    Cleans and preprocesses vegetation survey data from separate woody and herb files,
-    using paths from the central config.
-    """
-    logging.info(f"Starting data cleaning process for woody: {RAW_WOODY_DATA}, herb: {RAW_HERB_DATA}")
+WOODY_COLUMN_MAP = {
+    'Quad_ID': 'Quadrant',
+    'Species_Scientific': 'Species',
+    'Growth_Form': 'Type',
+    'Height_m': 'Height_m',
+    'Tree_ID': 'ID',
+    'Plot_ID': 'Plot'
+}
 
-    # Create output directory if it doesn't exist
-    os.makedirs(os.path.dirname(CLEANED_VEG_FULL_PATH), exist_ok=True)
-    os.makedirs(os.path.dirname(CLEANED_VEG_TREES_PATH), exist_ok=True)
+HERB_COLUMN_MAP = {
+    'Layer_Type': 'Type',
+    'Species_or_Category': 'Species',
+    'Count_or_Cover%': 'Number', # Note: This is a percentage, not a count
+    'Avg_Height_cm': 'Height_m',
+    'Plot_ID': 'Plot'
+}
 
-    # Load woody vegetation data
-    woody_df = pd.read_csv(RAW_WOODY_DATA)
-    woody_df.rename(columns={
-        'Quad_ID': 'Quadrant',
-        'Species_Scientific': 'Species',
-        'Growth_Form': 'Type',
-        'GBH_Stem1_cm': 'Girth_cm_Stem1',
-        'GBH_Stem2_cm': 'Girth_cm_Stem2',
-        'Height_m': 'Height_m',
-        'Tree_ID': 'ID',
-        'Plot_ID': 'Plot'
-    }, inplace=True)
+LEGACY_COLUMN_MAP = {
+    'Quadrant ID': 'Quadrant', # This might be from original data, ensure it's handled
+    'GBH (Girth at Breast Height) - First Branch': 'Girth_cm_Stem1',
+    'GBH (Girth at Breast Height) - Second Branch': 'Girth_cm_Stem2',
+    'GBH (Girth at Breast Height) - Third Branch': 'Girth_cm_Stem3',
+    'Height (m)': 'Height_m'
+}
+
+SUBPLOT_TO_QUADRANT = {
+    'SP1': 'Q1',
+    'SP2': 'Q2',
+    'SP3': 'Q3',
+    'SP4': 'Q4'
+}
+
+EXPECTED_COLUMNS = [
+    'Plot', 'Quadrant', 'ID', 'Type', 'Number', 'Species', 'Girth_cm_Stem1',
+    'Girth_cm_Stem2', 'Girth_cm_Stem3', 'Height_m'
+]
+
+NUMERIC_COLUMNS = ['Number', 'Girth_cm_Stem1', 'Girth_cm_Stem2', 'Girth_cm_Stem3', 'Height_m']
+
+DEFAULT_CHUNKSIZE = 100_000
+
+# Every recorded stem girth (GBH_Stem1_cm ... GBH_StemN_cm) becomes Girth_cm_StemN
+RAW_STEM_PATTERN = re.compile(r'^GBH_Stem(\d+)_cm$')
+STEM_PATTERN = re.compile(r'^Girth_cm_Stem(\d+)$')
+
+def _prepare_woody(woody_df: pd.DataFrame) -> pd.DataFrame:
+    """Maps a raw woody vegetation frame (or chunk) onto the cleaned column names."""
+    woody_df = woody_df.rename(columns=WOODY_COLUMN_MAP)
+    woody_df = woody_df.rename(columns=lambda col: RAW_STEM_PATTERN.sub(r'Girth_cm_Stem\1', col))
     woody_df['Number'] = 1 # Each row represents one individual
     woody_df['ID'] = woody_df['ID'].astype(str) # Ensure ID is string
     # Add placeholder for Girth_cm_Stem3 if it doesn't exist (for consistency)
     if 'Girth_cm_Stem3' not in woody_df.columns:
         woody_df['Girth_cm_Stem3'] = np.nan
+    return woody_df
 
-    # Load herb floor vegetation data
-    herb_df = pd.read_csv(RAW_HERB_DATA)
-    herb_df.rename(columns={
-        'Layer_Type': 'Type',
-        'Species_or_Category': 'Species',
-        'Count_or_Cover%': 'Number', # Note: This is a percentage, not a count
-        'Avg_Height_cm': 'Height_m',
-        'Plot_ID': 'Plot'
-    }, inplace=True)
+def _prepare_herb(herb_df: pd.DataFrame) -> pd.DataFrame:
+    """Maps a raw herb floor vegetation frame (or chunk) onto the cleaned column names."""
+    herb_df = herb_df.rename(columns=HERB_COLUMN_MAP)
     # Map Subplot_ID to Quadrant
-    subplot_to_quadrant_map = {
-        'SP1': 'Q1',
-        'SP2': 'Q2',
-        'SP3': 'Q3',
-        'SP4': 'Q4'
-    }
-    herb_df['Quadrant'] = herb_df['Subplot_ID'].map(subplot_to_quadrant_map)
+    herb_df['Quadrant'] = herb_df['Subplot_ID'].map(SUBPLOT_TO_QUADRANT)
     herb_df['Height_m'] = herb_df['Height_m'] / 100 # Convert cm to meters
     herb_df['Girth_cm_Stem1'] = np.nan # No girth for herbs
     herb_df['Girth_cm_Stem2'] = np.nan # No girth for herbs
     herb_df['Girth_cm_Stem3'] = np.nan # No girth for herbs
     herb_df['ID'] = herb_df['Type'] + '_' + herb_df['Subplot_ID'].astype(str) # Create a unique ID
     herb_df['ID'] = herb_df['ID'].astype(str) # Ensure ID is string
+    return herb_df
 
-    # Combine the dataframes
-    df = pd.concat([woody_df, herb_df], ignore_index=True)
+def _output_columns(woody_columns, herb_columns) -> list:
+    """
+    Column layout of the cleaned output: the expected columns and the species name as
+    recorded, then any extra raw columns in the order pd.concat of the woody and herb frames
+    would produce them.
+    """
+    leading = EXPECTED_COLUMNS + ['Species_Raw']
+    combined = list(dict.fromkeys(list(woody_columns) + list(herb_columns)))
+    combined = [LEGACY_COLUMN_MAP.get(col, col) for col in combined]
+    return leading + [col for col in dict.fromkeys(combined) if col not in leading]
+
+def _standardize(df: pd.DataFrame, columns: list, last_quadrant=None, resolver: SpeciesResolver = None):
+    """
+    Applies the row-wise cleaning steps to a prepared frame or chunk.
+    last_quadrant carries the quadrant forward-fill across chunk boundaries; the updated
+    value is returned alongside the cleaned frame. Passing the same resolver for every chunk
+    resolves each distinct species string only once per run.
+    """
+    df = df.rename(columns=LEGACY_COLUMN_MAP)
     df['Plot'] = 'Plot-' + df['Plot'].astype(str) # Standardize plot names to 'Plot-P01', 'Plot-P02', etc.
+    df = df.reindex(columns=columns)
 
-    # Ensure all expected columns are present, filling missing ones with NaN
-    expected_cols = [
-        'Plot', 'Quadrant', 'ID', 'Type', 'Number', 'Species', 'Girth_cm_Stem1',
-        'Girth_cm_Stem2', 'Girth_cm_Stem3', 'Height_m'
-    ]
-    for col in expected_cols:
-        if col not in df.columns:
-            df[col] = np.nan
-
-    # Reorder columns to match the original script's expected structure as much as possible
-    df = df[expected_cols + [col for col in df.columns if col not in expected_cols]]
-
-    # The rest of the cleaning logic remains largely the same, operating on the combined 'df'
-    # Rename columns for consistency (some already done above, but keeping for robustness)
-    df.rename(columns={
-        'Quadrant ID': 'Quadrant', # This might be from original data, ensure it's handled
-        'GBH (Girth at Breast Height) - First Branch': 'Girth_cm_Stem1',
-        'GBH (Girth at Breast Height) - Second Branch': 'Girth_cm_Stem2',
-        'GBH (Girth at Breast Height) - Third Branch': 'Girth_cm_Stem3',
-        'Height (m)': 'Height_m'
-    }, inplace=True)
-
-    df_cleaned = df.copy()
-    df_cleaned.loc[:, 'Quadrant'] = df_cleaned['Quadrant'].ffill()
-    df_cleaned['Type'] = df_cleaned['Type'].str.strip().replace('Saplings', 'Sapling')
-    
-    numeric_cols = ['Number', 'Girth_cm_Stem1', 'Girth_cm_Stem2', 'Girth_cm_Stem3', 'Height_m']
-    for col in numeric_cols:
-        df_cleaned[col] = pd.to_numeric(df_cleaned[col], errors='coerce')
+    df['Quadrant'] = df['Quadrant'].ffill()
+    if last_quadrant is not None:
+        df['Quadrant'] = df['Quadrant'].fillna(last_quadrant)
+    df['Type'] = df['Type'].str.strip().replace('Saplings', 'Sapling')
+
+    # Every stem girth column is read as a number, not only the first three
+    for col in dict.fromkeys(NUMERIC_COLUMNS + _stem_columns(df.columns)):
+        df[col] = pd.to_numeric(df[col], errors='coerce')
 
     # --- Data Cleaning for Species ---
-    df_cleaned['Species'] = df_cleaned['Species'].str.strip()
-    df_cleaned['Species'] = df_cleaned['Species'].replace('', np.nan)
-    
-    # Save the full cleaned data
-    df_cleaned.to_csv(CLEANED_VEG_FULL_PATH, index=False)
-    logging.info(f"Full cleaned data saved to {CLEANED_VEG_FULL_PATH}")
+    df['Species'] = df['Species'].str.strip()
+    df['Species'] = df['Species'].replace('', np.nan)
+    # Resolve synonyms, common names and misspellings to accepted names, keeping the original
+    df['Species_Raw'] = df['Species']
+    df['Species'] = (resolver or SpeciesResolver()).normalize(df['Species'])[0]
+
+    quadrants = df['Quadrant'].dropna()
+    if not quadrants.empty:
+        last_quadrant = quadrants.iloc[-1]
+    return df, last_quadrant
+
+def _stem_columns(columns) -> list:
+    """The Girth_cm_StemN columns of a frame, ordered by stem number."""
+    stems = [(int(match.group(1)), col) for col in columns if (match := STEM_PATTERN.match(col))]
+    return [col for _, col in sorted(stems)]
 
+def stem_metrics(girth_cm: np.ndarray):
+    """
+    Derives per-stem DBH (cm) and basal area (m2) from an (n_trees x n_stems) girth array
+    in one pass. Missing stems count as zero towards the effective DBH, which is the
+    diameter of a single stem with the same total basal area (sqrt of the sum of squares).
+    Returns (dbh, effective_dbh, basal_area, total_basal_area).
+    """
+    dbh = girth_cm / np.pi
+    dbh_sq = np.square(dbh)
+    basal_area = dbh_sq * (np.pi / 40000) # pi/4 * (DBH in m)^2
+    effective_dbh = np.sqrt(np.nansum(dbh_sq, axis=1))
+    return dbh, effective_dbh, basal_area, np.nansum(basal_area, axis=1)
+
+def _extract_trees(df_cleaned: pd.DataFrame) -> pd.DataFrame:
+    """Selects measurable trees from a cleaned frame or chunk and derives their DBH and basal area."""
     df_trees = df_cleaned[df_cleaned['Type'] == 'Tree'].copy()
     df_trees.dropna(subset=['Girth_cm_Stem1'], inplace=True)
-    
-    # Calculate DBH for each stem
-    df_trees['DBH1_cm'] = df_trees['Girth_cm_Stem1'] / np.pi
-    df_trees['DBH2_cm'] = df_trees['Girth_cm_Stem2'] / np.pi
-    df_trees['DBH3_cm'] = df_trees['Girth_cm_Stem3'] / np.pi
-    
-    # Calculate effective DBH
-    df_trees['Effective_DBH_cm'] = np.sqrt(
-        df_trees['DBH1_cm'].fillna(0)**2 + 
-        df_trees['DBH2_cm'].fillna(0)**2 + 
-        df_trees['DBH3_cm'].fillna(0)**2
+
+    # DBH and basal area for every recorded stem, reduced over an (n_trees x n_stems) array
+    stems = _stem_columns(df_trees.columns)
+    girth = df_trees[stems].to_numpy(dtype=np.float64, na_value=np.nan)
+    dbh, effective_dbh, basal_area, total_basal_area = stem_metrics(girth)
+    numbers = [STEM_PATTERN.match(col).group(1) for col in stems]
+    derived = pd.DataFrame(
+        np.column_stack([dbh, basal_area]),
+        columns=[f'DBH{i}_cm' for i in numbers] + [f'BA{i}_m2' for i in numbers],
+        index=df_trees.index,
     )
-    
+    derived['Effective_DBH_cm'] = effective_dbh
+    derived['Basal_Area_m2'] = total_basal_area
+    df_trees = pd.concat([df_trees, derived], axis=1)
+
     df_trees.dropna(subset=['Height_m'], inplace=True)
+    return df_trees
+
+def clean_vegetation_data():
+    """
+    Cleans and preprocesses vegetation survey data from separate woody and herb files,
+    using paths from the central config.
+    """
+    logging.info(f"Starting data cleaning process for woody: {RAW_WOODY_DATA}, herb: {RAW_HERB_DATA}")
+
+    # Create output directory if it doesn't exist
+    os.makedirs(os.path.dirname(CLEANED_VEG_FULL_PATH), exist_ok=True)
+    os.makedirs(os.path.dirname(CLEANED_VEG_TREES_PATH), exist_ok=True)
+
+    # Load the raw survey files and validate them before any coercion happens
+    woody_df = pd.read_csv(RAW_WOODY_DATA)
+    herb_df = pd.read_csv(RAW_HERB_DATA)
+    save_validation_report(validate_survey_data(woody_df, herb_df))
+
+    woody_df = _prepare_woody(woody_df)
+    herb_df = _prepare_herb(herb_df)
+    columns = _output_columns(woody_df.columns, herb_df.columns)
+
+    # Combine the dataframes and clean them in one go
+    df = pd.concat([woody_df, herb_df], ignore_index=True)
+    df_cleaned, _ = _standardize(df, columns, resolver=SpeciesResolver())
+    
+    df_trees = _extract_trees(df_cleaned)
+
+    # Save the full cleaned data in the canonical schema (categoricals, float32 measurements)
+    df_cleaned = store_dataset(df_cleaned, CLEANED_VEG_FULL_PATH)
+    logging.info(f"Full cleaned data saved to {CLEANED_VEG_FULL_PATH}")
 
     # Save the cleaned trees data
-    df_trees.to_csv(CLEANED_VEG_TREES_PATH, index=False)
+    df_trees = store_dataset(df_trees, CLEANED_VEG_TREES_PATH)
     logging.info(f"Cleaned tree data saved to {CLEANED_VEG_TREES_PATH}")
     
     return df_cleaned, df_trees
 
+def stream_clean_vegetation_data(chunksize: int = DEFAULT_CHUNKSIZE):
+    """
+    Streaming variant of clean_vegetation_data for raw files larger than memory.
+    Both raw CSVs are read in fixed-size chunks which go through the same rename, coerce
+    and DBH steps and are appended to the cleaned outputs, so peak memory is bounded by
+    chunksize rather than by the input size. Returns a dict with the number of cleaned rows
+    written ('full_rows'), tree rows written ('tree_rows') and validation issues found
+    ('validation_errors').
+    """
+    logging.info(f"Starting streaming data cleaning (chunksize={chunksize}) for woody: {RAW_WOODY_DATA}, herb: {RAW_HERB_DATA}")
+
+    os.makedirs(os.path.dirname(CLEANED_VEG_FULL_PATH), exist_ok=True)
+    os.makedirs(os.path.dirname(CLEANED_VEG_TREES_PATH), exist_ok=True)
+    os.makedirs(os.path.dirname(VALIDATION_REPORT_PATH), exist_ok=True)
+
+    # The output layout must be fixed before the first chunk is written
+    woody_header = _prepare_woody(pd.read_csv(RAW_WOODY_DATA, nrows=0))
+    herb_header = _prepare_herb(pd.read_csv(RAW_HERB_DATA, nrows=0))
+    columns = _output_columns(woody_header.columns, herb_header.columns)
+    tree_columns = list(_extract_trees(_standardize(woody_header, columns)[0]).columns)
+    # Columns that only one raw file has are upcast to float by the in-memory concat;
+    # do the same per chunk so both modes write identical files
+    one_sided = set(woody_header.columns) ^ set(herb_header.columns)
+
+    counts = {"full_rows": 0, "tree_rows": 0, "validation_errors": 0}
+    full_schema, trees_schema = {"columns": {}}, {"columns": {}}
+    last_quadrant = None
+    resolver = SpeciesResolver()
+    first_chunk = True
+    for name, path, prepare in (('woody', RAW_WOODY_DATA, _prepare_woody), ('herb', RAW_HERB_DATA, _prepare_herb)):
+        row_offset = 0
+        for chunk in pd.read_csv(path, chunksize=chunksize):
+            errors = validate_survey_data(
+                chunk if name == 'woody' else None,
+                chunk if name == 'herb' else None,
+                row_offsets=(row_offset, row_offset),
+            )
+            row_offset += len(chunk)
+
+            df_cleaned, last_quadrant = _standardize(prepare(chunk), columns, last_quadrant, resolver)
+            int_cols = [col for col in df_cleaned.select_dtypes('integer').columns if col in one_sided]
+            df_cleaned[int_cols] = df_cleaned[int_cols].astype(float)
+            df_trees = apply_schema(_extract_trees(df_cleaned).reindex(columns=tree_columns))
+            df_cleaned = apply_schema(df_cleaned)
+            full_schema = merge_schemas(full_schema, build_schema(df_cleaned))
+            trees_schema = merge_schemas(trees_schema, build_schema(df_trees))
+
+            mode, header = ('w', True) if first_chunk else ('a', False)
+            errors.to_csv(VALIDATION_REPORT_PATH, mode=mode, header=header, index=False)
+            df_cleaned.to_csv(CLEANED_VEG_FULL_PATH, mode=mode, header=header, index=False)
+            df_trees.to_csv(CLEANED_VEG_TREES_PATH, mode=mode, header=header, index=False)
+            first_chunk = False
+
+            counts["full_rows"] += len(df_cleaned)
+            counts["tree_rows"] += len(df_trees)
+            counts["validation_errors"] += len(errors)
+
+    # The category dictionaries are the union of those seen in every chunk
+    write_schema(CLEANED_VEG_FULL_PATH, full_schema)
+    write_schema(CLEANED_VEG_TREES_PATH, trees_schema)
+    invalidate_dataset(CLEANED_VEG_FULL_PATH)
+    invalidate_dataset(CLEANED_VEG_TREES_PATH)
+
+    if counts["validation_errors"]:
+        logging.warning(f"Validation found {counts['validation_errors']} issues. See {VALIDATION_REPORT_PATH}")
+    logging.info(f"Streaming cleaning complete: {counts['full_rows']} rows saved to {CLEANED_VEG_FULL_PATH}, "
+                 f"{counts['tree_rows']} trees saved to {CLEANED_VEG_TREES_PATH}")
+    return counts
+
+def save_validation_report(report: pd.DataFrame):
+    """
+    Writes the validation error table next to the cleaned outputs and logs a summary.
+    Rows listed with rule 'numeric' are the ones the cleaner coerces to NaN.
+    """
+    os.makedirs(os.path.dirname(VALIDATION_REPORT_PATH), exist_ok=True)
+    report.to_csv(VALIDATION_REPORT_PATH, index=False)
+    summary = summarize_errors(report)
+    if summary["total_errors"]:
+        logging.warning(f"Validation found {summary['total_errors']} issues in {summary['rows_affected']} raw rows. "
+                        f"See {VALIDATION_REPORT_PATH}")
+    else:
+        logging.info("Validation found no issues in the raw survey data.")
+    return summary
+
+def validate_raw_data(save: bool = True):
+    """
+    Runs the declarative validation rules over the raw survey files without cleaning them.
+    With save=False nothing is written; the error table and its summary are only returned.
+    """
+    woody_df = pd.read_csv(RAW_WOODY_DATA)
+    herb_df = pd.read_csv(RAW_HERB_DATA)
+    report = validate_survey_data(woody_df, herb_df)
+    return report, save_validation_report(report) if save else summarize_errors(report)
+
 def save_raw_field_data(woody_data: list, herb_data: list):
     """
     Saves raw woody and herb data (from API request) to their respective CSV files.
@@ -0,0 +1,173 @@
+import re
+import logging
+from collections import Counter
+from functools import lru_cache
+from pathlib import Path
+from typing import Union
+import numpy as np
+import pandas as pd
+from app.core.config import SPECIES_REFERENCE_PATH
+
+logger = logging.getLogger(__name__)
+
+# Match levels reported for every resolved name, in order of precedence
+NAME_TYPES = ['accepted', 'synonym', 'common']
+FUZZY_MATCH = 'fuzzy'
+UNMATCHED = 'unmatched'
+
+# Fuzzy matching is only attempted for keys of at least this length, and accepts a candidate
+# within max(1, FUZZY_MAX_EDIT_RATIO * len) edits. Short labels such as 'A' or 'Ber' are
+# too ambiguous to correct.
+FUZZY_MIN_LENGTH = 5
+FUZZY_MAX_EDIT_RATIO = 0.15
+FUZZY_CANDIDATES = 5
+
+_PARENTHETICAL = re.compile(r'^(?P<outer>[^()]*?)\s*\((?P<inner>[^()]*)\)\s*$')
+_NON_KEY_CHARS = re.compile(r'[^0-9a-z\- ]+')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def name_key(name: str) -> str:
+    """Lookup key for a species name: case-folded, punctuation dropped, whitespace collapsed."""
+    key = _NON_KEY_CHARS.sub(' ', str(name).casefold().replace('_', ' '))
+    return _WHITESPACE.sub(' ', key).strip()
+
+
+def _trigrams(key: str) -> set:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance between a and b, or limit + 1 as soon as it must exceed limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class SpeciesIndex:
+    """
+    Compiled lookup structure over a reference table of accepted names, synonyms and common names.
+    Exact matches are a single dict lookup on the normalised key; misspellings fall back to a
+    character-trigram candidate search verified by a bounded edit distance.
+    """
+    def __init__(self, reference: pd.DataFrame):
+        self.entries = {}
+        self.families = {}
+        rank = {name_type: i for i, name_type in enumerate(NAME_TYPES)}
+        reference = reference.assign(_rank=reference['name_type'].map(rank)).sort_values('_rank', kind='stable')
+        ambiguous = set()
+        for name, accepted, name_type, family in reference[['name', 'accepted_name', 'name_type', 'family']].itertuples(index=False):
+            key = name_key(name)
+            if key in self.entries:
+                # A common name shared by two taxa cannot be resolved; drop it rather than guess.
+                # A common name never displaces an accepted name or synonym with the same key.
+                existing_accepted, existing_type = self.entries[key]
+                if existing_accepted != accepted and name_type == 'common' and existing_type == 'common':
+                    ambiguous.add(key)
+                continue
+            self.entries[key] = (accepted, name_type)
+            if name_type == 'accepted':
+                self.families[accepted] = family
+        for key in ambiguous:
+            del self.entries[key]
+
+        self.keys = list(self.entries)
+        self.trigram_index = {}
+        for i, key in enumerate(self.keys):
+            for gram in _trigrams(key):
+                self.trigram_index.setdefault(gram, []).append(i)
+
+    def exact(self, name: str):
+        return self.entries.get(name_key(name))
+
+    def fuzzy(self, name: str):
+        key = name_key(name)
+        if len(key) < FUZZY_MIN_LENGTH:
+            return None
+        shared = Counter()
+        for gram in _trigrams(key):
+            shared.update(self.trigram_index.get(gram, ()))
+        limit = max(1, int(FUZZY_MAX_EDIT_RATIO * len(key)))
+        best, best_distance = None, limit + 1
+        for i, _ in shared.most_common(FUZZY_CANDIDATES):
+            distance = _edit_distance(key, self.keys[i], limit)
+            if distance < best_distance:
+                best, best_distance = self.keys[i], distance
+        if best is None:
+            return None
+        return self.entries[best][0], FUZZY_MATCH
+
+    def resolve(self, raw: str):
+        """
+        Resolves one raw name to (accepted_name, match_level). Names written as
+        'Scientific name (common name)' are tried on both parts. Unresolved names are
+        returned stripped, with match level 'unmatched'.
+        """
+        raw = str(raw).strip()
+        parts = [raw]
+        match = _PARENTHETICAL.match(raw)
+        if match:
+            parts = [match.group('outer'), match.group('inner')]
+        for lookup in (self.exact, self.fuzzy):
+            for part in parts:
+                hit = lookup(part) if part else None
+                if hit is not None:
+                    return hit
+        return raw, UNMATCHED
+
+
+class SpeciesResolver:
+    """
+    Per-run memo over a SpeciesIndex. Each distinct raw string is resolved once, however many
+    rows (or chunks) contain it, and the result is broadcast back to the rows by factor code.
+    """
+    def __init__(self, index: 'SpeciesIndex' = None):
+        self.index = index if index is not None else load_species_index()
+        self.memo = {}
+
+    def resolve(self, raw: str):
+        if raw not in self.memo:
+            self.memo[raw] = self.index.resolve(raw)
+            name, level = self.memo[raw]
+            if level == FUZZY_MATCH:
+                logger.info(f"Species '{raw}' matched approximately to '{name}'.")
+        return self.memo[raw]
+
+    def normalize(self, species: pd.Series):
+        """Returns (accepted names, match levels) aligned with the input; missing values stay missing."""
+        codes, uniques = pd.factorize(species)
+        resolved = [self.resolve(raw) for raw in uniques]
+        names = np.array([name for name, _ in resolved] + [np.nan], dtype=object)
+        levels = np.array([level for _, level in resolved] + [np.nan], dtype=object)
+        # Code -1 (missing) picks the trailing NaN
+        return (
+            pd.Series(names[codes], index=species.index, name=species.name),
+            pd.Series(levels[codes], index=species.index, name='Species_Match'),
+        )
+
+
+@lru_cache(maxsize=4)
+def _load_species_index(path: str) -> SpeciesIndex:
+    reference = pd.read_csv(path, dtype=str)
+    logger.info(f"Compiled species index from {path} ({len(reference)} names).")
+    return SpeciesIndex(reference)
+
+
+def load_species_index(path: Union[str, Path] = None) -> SpeciesIndex:
+    """Builds (once per process) the species index for a reference table, by default the bundled one."""
+    return _load_species_index(str(path if path is not None else SPECIES_REFERENCE_PATH))
+
+
+def normalize_species(species: pd.Series, resolver: SpeciesResolver = None) -> pd.Series:
+    """Maps raw species names to accepted names using the bundled reference table."""
+    resolver = resolver if resolver is not None else SpeciesResolver()
+    return resolver.normalize(species)[0]
@@ -0,0 +1,183 @@
+import re
+import fnmatch
+import numpy as np
+import pandas as pd
+
+# --- Declarative rule sets for the raw survey files ---
+# Each rule targets one column (or a glob such as 'GBH_Stem*_cm') and is evaluated as a
+# boolean mask over the whole column. Only non-null values are checked, except for 'required'.
+WOODY_RULES = [
+    {"column": "Plot_ID", "rule": "required"},
+    {"column": "Plot_ID", "rule": "pattern", "regex": r"P\d{2,}"},
+    {"column": "Quad_ID", "rule": "pattern", "regex": r"Q[1-4]"},
+    {"column": "Growth_Form", "rule": "allowed", "values": ["Tree", "Sapling", "Saplings", "Shrub"]},
+    {"column": "Height_m", "rule": "numeric"},
+    {"column": "Height_m", "rule": "range", "min": 0, "max": 120},
+    {"column": "GBH_Stem*_cm", "rule": "numeric"},
+    {"column": "GBH_Stem*_cm", "rule": "range", "min": 0, "max": 2000},
+    {"column": "Total_GBH_cm", "rule": "numeric"},
+    {"column": "Total_GBH_cm", "rule": "range", "min": 0, "max": 5000},
+]
+
+HERB_RULES = [
+    {"column": "Plot_ID", "rule": "required"},
+    {"column": "Plot_ID", "rule": "pattern", "regex": r"P\d{2,}"},
+    {"column": "Subplot_ID", "rule": "required"},
+    {"column": "Subplot_ID", "rule": "pattern", "regex": r"SP[1-4]"},
+    {"column": "Layer_Type", "rule": "allowed", "values": ["Herb", "Grass", "Litter", "Bare Soil"]},
+    {"column": "Count_or_Cover%", "rule": "numeric"},
+    {"column": "Count_or_Cover%", "rule": "range", "min": 0, "max": 100},
+    {"column": "Avg_Height_cm", "rule": "numeric"},
+    {"column": "Avg_Height_cm", "rule": "range", "min": 0, "max": 1000},
+]
+
+ERROR_COLUMNS = ['row', 'column', 'rule']
+
+
+def _as_numeric(series: pd.Series, cache: dict) -> pd.Series:
+    # Memoised per column so 'numeric' and 'range' rules share one coercion pass
+    if 'numeric' not in cache:
+        cache['numeric'] = series if pd.api.types.is_numeric_dtype(series) else pd.to_numeric(series, errors='coerce')
+    return cache['numeric']
+
+
+def _factorized(series: pd.Series, cache: dict):
+    if 'factorized' not in cache:
+        codes, uniques = pd.factorize(series)
+        cache['factorized'] = (codes, pd.Series(uniques, dtype=object).astype(str).str.strip())
+    return cache['factorized']
+
+
+def _check_unique_values(series: pd.Series, cache: dict, predicate) -> np.ndarray:
+    """Evaluates a string predicate once per distinct value and broadcasts it back by code."""
+    codes, stripped = _factorized(series, cache)
+    if len(stripped) == 0:
+        return np.zeros(len(series), dtype=bool)
+    # Blank cells are treated as missing here; the 'required' rule is responsible for those
+    ok = np.asarray(predicate(stripped), dtype=bool) | (stripped == '').to_numpy()
+    bad = ~ok[codes]
+    bad[codes == -1] = False
+    return bad
+
+
+def _check_required(series: pd.Series, spec: dict, cache: dict) -> np.ndarray:
+    missing = series.isna().to_numpy().copy()
+    if pd.api.types.is_numeric_dtype(series):
+        return missing
+    return missing | _check_unique_values(series, cache, lambda u: u != '')
+
+
+def _check_numeric(series: pd.Series, spec: dict, cache: dict) -> np.ndarray:
+    # Flags exactly the rows that pd.to_numeric(errors='coerce') would silently turn into NaN
+    if pd.api.types.is_numeric_dtype(series):
+        return np.zeros(len(series), dtype=bool)
+    bad = (_as_numeric(series, cache).isna() & series.notna()).to_numpy().copy()
+    candidates = np.flatnonzero(bad)
+    if candidates.size:
+        # Blank cells coerce to NaN as well but are missing values, not bad ones
+        bad[candidates] = series.iloc[candidates].astype(str).str.strip().to_numpy() != ''
+    return bad
+
+
+def _check_range(series: pd.Series, spec: dict, cache: dict) -> np.ndarray:
+    values = _as_numeric(series, cache).to_numpy(dtype=float, na_value=np.nan)
+    with np.errstate(invalid='ignore'):
+        bad = np.zeros(len(values), dtype=bool)
+        if spec.get('min') is not None:
+            bad |= values < spec['min']
+        if spec.get('max') is not None:
+            bad |= values > spec['max']
+    return bad
+
+
+def _check_allowed(series: pd.Series, spec: dict, cache: dict) -> np.ndarray:
+    allowed = set(spec['values'])
+    return _check_unique_values(series, cache, lambda u: u.isin(allowed))
+
+
+def _check_pattern(series: pd.Series, spec: dict, cache: dict) -> np.ndarray:
+    regex = re.compile(spec['regex'])
+    return _check_unique_values(series, cache, lambda u: u.str.fullmatch(regex))
+
+
+_RULE_CHECKS = {
+    'required': _check_required,
+    'numeric': _check_numeric,
+    'range': _check_range,
+    'allowed': _check_allowed,
+    'pattern': _check_pattern,
+}
+
+
+def _rule_label(spec: dict) -> str:
+    if spec['rule'] == 'range':
+        return f"range[{spec.get('min')},{spec.get('max')}]"
+    return spec['rule']
+
+
+def validate_frame(df: pd.DataFrame, rules: list, row_offset: int = 0) -> pd.DataFrame:
+    """
+    Evaluates a rule set against a raw survey DataFrame.
+    Returns a compact error table with one row per (row, column, rule) violation, where 'row'
+    is the 0-based data row in the source file (shifted by row_offset for chunked input).
+    """
+    rows, columns, labels = [], [], []
+    column_cache = {}
+    for spec in rules:
+        check = _RULE_CHECKS[spec['rule']]
+        for column in fnmatch.filter(df.columns, spec['column']):
+            cache = column_cache.setdefault(column, {})
+            hits = np.flatnonzero(check(df[column], spec, cache))
+            if hits.size == 0:
+                continue
+            rows.append(hits + row_offset)
+            columns.append(np.full(hits.size, column, dtype=object))
+            labels.append(np.full(hits.size, _rule_label(spec), dtype=object))
+
+    if not rows:
+        return pd.DataFrame({
+            'row': pd.Series(dtype='int64'),
+            'column': pd.Series(dtype='category'),
+            'rule': pd.Series(dtype='category'),
+        })
+
+    errors = pd.DataFrame({
+        'row': np.concatenate(rows),
+        'column': pd.Categorical(np.concatenate(columns)),
+        'rule': pd.Categorical(np.concatenate(labels)),
+    })
+    return errors.sort_values(['row', 'column'], kind='stable').reset_index(drop=True)
+
+
+def validate_survey_data(woody_df: pd.DataFrame, herb_df: pd.DataFrame, row_offsets=(0, 0)) -> pd.DataFrame:
+    """
+    Validates both raw survey files and returns a single error table with a 'dataset' column
+    ('woody' or 'herb') in front of the (row, column, rule) triple.
+    """
+    reports = []
+    for name, df, rules, offset in (
+        ('woody', woody_df, WOODY_RULES, row_offsets[0]),
+        ('herb', herb_df, HERB_RULES, row_offsets[1]),
+    ):
+        if df is None:
+            continue
+        errors = validate_frame(df, rules, row_offset=offset)
+        errors.insert(0, 'dataset', name)
+        reports.append(errors)
+
+    report = pd.concat(reports, ignore_index=True) if reports else pd.DataFrame(columns=['dataset'] + ERROR_COLUMNS)
+    for col in ('dataset', 'column', 'rule'):
+        report[col] = report[col].astype('category')
+    return report
+
+
+def summarize_errors(report: pd.DataFrame) -> dict:
+    """Counts violations per dataset, column and rule for logging and API responses."""
+    if report.empty:
+        return {"total_errors": 0, "rows_affected": 0, "by_rule": []}
+    by_rule = report.groupby(['dataset', 'column', 'rule'], observed=True).size().reset_index(name='count')
+    return {
+        "total_errors": int(len(report)),
+        "rows_affected": int(report[['dataset', 'row']].drop_duplicates().shape[0]),
+        "by_rule": by_rule.to_dict(orient='records'),
+    }
@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.special import gammaln
+from app.core.config import CLEANED_VEG_FULL_PATH, ACCUMULATION_PERMUTATIONS, ACCUMULATION_BATCH_ELEMENTS
+from app.services.ecological_analysis.community_matrix import CommunityMatrix, load_community_matrix
+
+
+def _select_rows(matrix: CommunityMatrix, plot_ids: list = None) -> np.ndarray:
+    """Positions of the matrix rows that belong to the given plots (all rows when plot_ids is None)."""
+    if plot_ids is None:
+        return np.arange(matrix.shape[0])
+    plots = matrix.rows.get_level_values(0) if isinstance(matrix.rows, pd.MultiIndex) else matrix.rows
+    return np.flatnonzero(plots.isin([str(plot_id) for plot_id in plot_ids]))
+
+
+def sample_accumulation(presence, permutations: int = ACCUMULATION_PERMUTATIONS, seed: int = None,
+                        ci: float = 0.95, batch_elements: int = ACCUMULATION_BATCH_ELEMENTS) -> pd.DataFrame:
+    """
+    Sample-based species accumulation over random orderings of the sampling units (rows of a
+    sparse or dense samples x species presence matrix).
+
+    For each permutation only the position at which every species is first met matters:
+    it is the minimum rank of the samples holding that species, taken for a whole batch of
+    permutations at once with np.minimum.reduceat over the column structure. Richness after k
+    samples is then the cumulative count of first occurrences at positions < k.
+    Returns one row per number of samples with the mean, standard deviation and the
+    central ci interval of the richness across permutations.
+    """
+    presence = sparse.csc_matrix(presence)
+    presence.eliminate_zeros()
+    n_samples = presence.shape[0]
+    columns = np.flatnonzero(np.diff(presence.indptr))
+    starts = presence.indptr[columns]
+    rng = np.random.default_rng(seed)
+
+    curves = np.empty((permutations, n_samples), dtype=np.int64)
+    batch = max(1, batch_elements // max(presence.nnz, n_samples, 1))
+    for first in range(0, permutations, batch):
+        size = min(batch, permutations - first)
+        # ranks[b, i]: position of sample i in permutation b
+        ranks = np.argsort(rng.random((size, n_samples)), axis=1).argsort(axis=1)
+        if columns.size:
+            first_seen = np.minimum.reduceat(ranks[:, presence.indices], starts, axis=1)
+            offsets = (np.arange(size) * n_samples)[:, None]
+            new_species = np.bincount((first_seen + offsets).ravel(), minlength=size * n_samples)
+            curves[first:first + size] = np.cumsum(new_species.reshape(size, n_samples), axis=1)
+        else:
+            curves[first:first + size] = 0
+
+    tail = (1 - ci) / 2 * 100
+    return pd.DataFrame({
+        'samples': np.arange(1, n_samples + 1),
+        'richness_mean': curves.mean(axis=0),
+        'richness_sd': curves.std(axis=0, ddof=1) if permutations > 1 else np.zeros(n_samples),
+        'richness_lower': np.percentile(curves, tail, axis=0),
+        'richness_upper': np.percentile(curves, 100 - tail, axis=0),
+    })
+
+
+def rarefaction(counts, sizes=None) -> pd.DataFrame:
+    """
+    Individual-based rarefaction (Hurlbert 1971): the expected number of species in a random
+    draw of n individuals without replacement,
+        E[S_n] = sum_i 1 - C(N - N_i, n) / C(N, n),
+    evaluated for every n in sizes (1..N by default) as one broadcast over sizes x species.
+    """
+    counts = np.asarray(counts, dtype=np.float64)
+    counts = np.rint(counts[counts > 0])
+    total = counts.sum()
+    if sizes is None:
+        sizes = np.arange(1, int(total) + 1)
+    sizes = np.asarray(sizes, dtype=np.float64)
+    sizes = sizes[(sizes >= 1) & (sizes <= total)]
+
+    def log_comb(a, b):
+        return gammaln(a + 1) - gammaln(b + 1) - gammaln(a - b + 1)
+
+    remaining = total - counts[None, :]
+    n = sizes[:, None]
+    with np.errstate(invalid='ignore'):
+        missing = np.where(remaining >= n, np.exp(log_comb(remaining, n) - log_comb(total, n)), 0.0)
+    return pd.DataFrame({
+        'individuals': sizes.astype(np.int64),
+        'expected_richness': (1 - missing).sum(axis=1),
+    })
+
+
+def get_species_accumulation(plot_ids: list = None, permutations: int = ACCUMULATION_PERMUTATIONS,
+                             seed: int = None, ci: float = 0.95) -> dict:
+    """
+    Accumulation curve over the quadrants of the requested plots (all plots by default), each
+    quadrant of each plot being one sampling unit.
+    """
+    matrix = load_community_matrix(CLEANED_VEG_FULL_PATH, by=('Plot', 'Quadrant'))
+    rows = _select_rows(matrix, plot_ids)
+    curve = sample_accumulation(matrix.occurrences[rows], permutations, seed, ci)
+    return {
+        "sampling_units": int(len(rows)),
+        "permutations": int(permutations),
+        "seed": seed,
+        "curve": curve.round(3).to_dict(orient='records'),
+    }
+
+
+def get_rarefaction(plot_ids: list = None, step: int = 1) -> dict:
+    """Individual-based rarefaction curve of each requested plot (all plots by default), keyed by plot ID."""
+    matrix = load_community_matrix(CLEANED_VEG_FULL_PATH)
+    plot_ids = [str(label) for label in matrix.rows] if plot_ids is None else [str(plot_id) for plot_id in plot_ids]
+    result = {}
+    for plot_id in plot_ids:
+        counts = matrix.row_counts(plot_id).to_numpy()
+        total = int(np.rint(counts[counts > 0]).sum()) if counts.size else 0
+        sizes = np.unique(np.append(np.arange(1, total + 1, max(1, step)), total)) if total else []
+        result[plot_id] = rarefaction(counts, sizes).round(3).to_dict(orient='records')
+    return result
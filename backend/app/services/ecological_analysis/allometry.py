@@ -0,0 +1,173 @@
+import numpy as np
+import pandas as pd
+from app.core.config import BIOMASS_EXPANSION_FACTOR, CARBON_FRACTION, CO2_PER_CARBON, ALLOMETRIC_MODELS_SELECTED, ALLOMETRIC_RESIDUAL_SD
+
+# Terms of the shared design matrix. Every model is log-linear in them:
+#     ln(AGB) = sum_t coefficient_t * term_t
+TERMS = ['intercept', 'ln_rho', 'ln_d', 'ln_d2', 'ln_d3', 'ln_h']
+
+# Registry of allometric models for aboveground biomass (kg) from D (cm), H (m) and rho (g/cm3).
+# zero_at_zero: the model is a power law, so a zero input gives zero biomass (as (rho D^2 H)^b does);
+# otherwise zero or negative inputs are outside its domain and give NaN.
+# species: accepted names the model applies to; None for a generic model.
+# residual_sd: residual standard error of ln(AGB), used by the uncertainty propagation; None for
+# ALLOMETRIC_RESIDUAL_SD.
+ALLOMETRIC_MODELS = {
+    'M1': {
+        'description': "Height-inclusive, 0.0673 (rho D^2 H)^0.976 (Chave et al. 2014, eq. 4)",
+        'coefficients': {'intercept': np.log(0.0673), 'ln_rho': 0.976, 'ln_d': 2 * 0.976, 'ln_h': 0.976},
+        'zero_at_zero': True,
+        'species': None,
+        'residual_sd': 0.357,
+    },
+    'M2': {
+        'description': "Height-exclusive, exp(-1.803 - 0.976 ln rho + 2.673 ln D - 0.0299 (ln D)^2)",
+        'coefficients': {'intercept': -1.803, 'ln_rho': -0.976, 'ln_d': 2.673, 'ln_d2': -0.0299},
+        'zero_at_zero': False,
+        'species': None,
+        'residual_sd': None,
+    },
+    'chave2005_moist_h': {
+        'description': "Moist forest with height, 0.0509 rho D^2 H (Chave et al. 2005)",
+        'coefficients': {'intercept': np.log(0.0509), 'ln_rho': 1.0, 'ln_d': 2.0, 'ln_h': 1.0},
+        'zero_at_zero': True,
+        'species': None,
+        'residual_sd': None,
+    },
+    'chave2005_moist': {
+        'description': "Moist forest without height, rho exp(-1.499 + 2.148 ln D + 0.207 (ln D)^2 - 0.0281 (ln D)^3)",
+        'coefficients': {'intercept': -1.499, 'ln_rho': 1.0, 'ln_d': 2.148, 'ln_d2': 0.207, 'ln_d3': -0.0281},
+        'zero_at_zero': False,
+        'species': None,
+        'residual_sd': None,
+    },
+    'chave2005_dry_h': {
+        'description': "Dry forest with height, 0.112 (rho D^2 H)^0.916 (Chave et al. 2005)",
+        'coefficients': {'intercept': np.log(0.112), 'ln_rho': 0.916, 'ln_d': 2 * 0.916, 'ln_h': 0.916},
+        'zero_at_zero': True,
+        'species': None,
+        'residual_sd': None,
+    },
+    'chave2005_dry': {
+        'description': "Dry forest without height, rho exp(-0.667 + 1.784 ln D + 0.207 (ln D)^2 - 0.0281 (ln D)^3)",
+        'coefficients': {'intercept': -0.667, 'ln_rho': 1.0, 'ln_d': 1.784, 'ln_d2': 0.207, 'ln_d3': -0.0281},
+        'zero_at_zero': False,
+        'species': None,
+        'residual_sd': None,
+    },
+}
+
+
+def register_model(name: str, coefficients: dict, description: str = "", zero_at_zero: bool = False, species=None,
+                   residual_sd: float = None):
+    """
+    Adds (or replaces) a model in the registry. Coefficients are keyed by the names in TERMS;
+    missing terms are zero. Restricting a model to species leaves it NaN for every other tree.
+    """
+    unknown = set(coefficients) - set(TERMS)
+    if unknown:
+        raise ValueError(f"Unknown allometric terms {sorted(unknown)}; expected a subset of {TERMS}")
+    ALLOMETRIC_MODELS[name] = {
+        'description': description,
+        'coefficients': dict(coefficients),
+        'zero_at_zero': zero_at_zero,
+        'species': None if species is None else list(species),
+        'residual_sd': residual_sd,
+    }
+
+
+def residual_sd(names: list) -> np.ndarray:
+    """Residual standard error of ln(AGB) of each named model."""
+    return np.array([ALLOMETRIC_MODELS[name].get('residual_sd') or ALLOMETRIC_RESIDUAL_SD for name in names])
+
+
+def log_design_matrix(ln_d, ln_h, ln_rho) -> np.ndarray:
+    """(trees x terms) matrix of the model terms from the logarithms of D, H and rho."""
+    ln_d = np.asarray(ln_d, dtype=np.float64)
+    ln_d2 = ln_d * ln_d
+    return np.column_stack([np.ones_like(ln_d), ln_rho, ln_d, ln_d2, ln_d2 * ln_d, ln_h])
+
+
+def design_matrix(dbh, height, wood_density) -> np.ndarray:
+    """(trees x terms) matrix of the model terms. Each logarithm is taken once and shared by every model."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ln_d = np.log(np.asarray(dbh, dtype=np.float64))
+        ln_rho = np.log(np.asarray(wood_density, dtype=np.float64))
+        ln_h = np.log(np.asarray(height, dtype=np.float64))
+    return log_design_matrix(ln_d, ln_h, ln_rho)
+
+
+def coefficient_matrix(names: list) -> np.ndarray:
+    """(models x terms) matrix of the coefficients of the named models."""
+    unknown = [name for name in names if name not in ALLOMETRIC_MODELS]
+    if unknown:
+        raise ValueError(f"Unknown allometric models {unknown}; registered: {sorted(ALLOMETRIC_MODELS)}")
+    return np.array([[ALLOMETRIC_MODELS[name]['coefficients'].get(term, 0.0) for term in TERMS] for name in names])
+
+
+def evaluate_terms(terms: np.ndarray, names: list, offset: np.ndarray = None) -> np.ndarray:
+    """
+    (trees x models) aboveground biomass (kg) from a design matrix, as one product with the
+    coefficient matrix followed by exp. An optional (trees x models) offset is added to
+    ln(AGB) before the exp (e.g. sampled model residuals).
+
+    Terms that are not finite (the log of a zero, missing or negative input) are zeroed in
+    the product and handled afterwards, only for the models that use them: a missing or
+    negative input gives NaN, and a zero input gives 0 for power-law models and NaN otherwise.
+    """
+    coefficients = coefficient_matrix(names)
+    finite = np.isfinite(terms)
+    all_finite = finite.all()
+    ln_agb = (terms if all_finite else np.where(finite, terms, 0.0)) @ coefficients.T
+    if offset is not None:
+        ln_agb += offset
+    with np.errstate(over='ignore'):
+        agb = np.exp(ln_agb)
+    if all_finite:
+        return agb
+    used = (coefficients != 0).astype(np.float64).T
+    missing = (np.isnan(terms).astype(np.float64) @ used) > 0
+    at_zero = ((~finite & ~np.isnan(terms)).astype(np.float64) @ used) > 0
+    zero_at_zero = np.array([ALLOMETRIC_MODELS[name]['zero_at_zero'] for name in names])
+    agb = np.where(at_zero, np.where(zero_at_zero, 0.0, np.nan), agb)
+    agb[missing] = np.nan
+    return agb
+
+
+def model_applies(names: list, species, n_trees: int) -> np.ndarray:
+    """(trees x models) mask of the trees each model applies to; species-restricted models need species names."""
+    applies = np.ones((n_trees, len(names)), dtype=bool)
+    for i, name in enumerate(names):
+        restricted = ALLOMETRIC_MODELS[name]['species']
+        if restricted is not None:
+            applies[:, i] = False if species is None else np.isin(np.asarray(species, dtype=object), restricted)
+    return applies
+
+
+def evaluate_models(dbh, height, wood_density, names: list = None, species=None) -> pd.DataFrame:
+    """
+    Aboveground biomass (kg) of every tree under every named model (the selected models by
+    default). Trees outside a species-restricted model's species get NaN for it.
+    """
+    names = list(ALLOMETRIC_MODELS_SELECTED if names is None else names)
+    agb = evaluate_terms(design_matrix(dbh, height, wood_density), names)
+    agb[~model_applies(names, species, len(agb))] = np.nan
+    return pd.DataFrame(agb, columns=names)
+
+
+def carbon_columns(df_trees: pd.DataFrame, names: list = None, species=None,
+                   expansion: float = BIOMASS_EXPANSION_FACTOR, carbon_fraction: float = CARBON_FRACTION) -> pd.DataFrame:
+    """
+    AGB_<model>_kg, Carbon_Stock_<model>_kg and CO2_Eq_<model>_kg for every selected model, in
+    that order per model. Carbon stock is AGB x expansion (below-ground biomass) x carbon fraction
+    and CO2 equivalent is carbon x 44/12.
+    """
+    names = list(ALLOMETRIC_MODELS_SELECTED if names is None else names)
+    agb = evaluate_models(df_trees['Effective_DBH_cm'], df_trees['Height_m'], df_trees['Wood_Density_g_cm3'], names, species)
+    carbon = agb.to_numpy() * expansion * carbon_fraction
+    columns = {}
+    for i, name in enumerate(names):
+        columns[f'AGB_{name}_kg'] = agb[name].to_numpy()
+        columns[f'Carbon_Stock_{name}_kg'] = carbon[:, i]
+        columns[f'CO2_Eq_{name}_kg'] = carbon[:, i] * CO2_PER_CARBON
+    return pd.DataFrame(columns, index=df_trees.index)
@@ -0,0 +1,159 @@
+import numpy as np
+import pandas as pd
+from app.core.config import CLEANED_VEG_FULL_PATH, BETA_DIVERSITY_BLOCK_ELEMENTS
+from app.infrastructure.persistence.dataset_cache import load_derived
+from app.services.ecological_analysis.community_matrix import CommunityMatrix, load_community_matrix
+
+# Bray-Curtis uses abundances; Jaccard and Sorensen use presence (at least one record of the species)
+BETA_METRICS = ('bray_curtis', 'jaccard', 'sorensen')
+
+
+def _check_metric(metric: str):
+    if metric not in BETA_METRICS:
+        raise ValueError(f"Unknown dissimilarity metric '{metric}'; expected one of {', '.join(BETA_METRICS)}")
+
+
+def _block_rows(n_cols: int, block_elements: int) -> int:
+    return max(1, block_elements // max(n_cols, 1))
+
+
+def _safe_ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """numerator / denominator, 0 where the denominator is 0."""
+    out = np.zeros(numerator.shape)
+    np.divide(numerator, denominator, out=out, where=denominator > 0)
+    return out
+
+
+def dissimilarity_blocks(matrix: CommunityMatrix, metric: str = 'bray_curtis',
+                         block_elements: int = BETA_DIVERSITY_BLOCK_ELEMENTS):
+    """
+    Yields (start, block) where block holds the dissimilarities between rows start..start+len(block)
+    and every row of the matrix. No temporary array grows past roughly block_elements values,
+    so the full n x n matrix never has to exist unless the caller assembles it.
+
+    - bray_curtis: sum |x - y| / (sum x + sum y) = 1 - 2 sum min(x, y) / (sum x + sum y)
+    - jaccard:     1 - a / (S_x + S_y - a), a = shared species
+    - sorensen:    1 - 2a / (S_x + S_y)
+    """
+    _check_metric(metric)
+    n_rows = matrix.shape[0]
+    if metric == 'bray_curtis':
+        # BC = 1 - 2 sum min(x, y) / (sum x + sum y); min(x, y) is non-zero only for species both
+        # plots hold, so the shared abundance is summed species by species over the plots that
+        # record it and the site x species matrix is never made dense.
+        columns = matrix.abundance.tocsc()
+        columns.sum_duplicates()
+        totals = matrix.totals()
+        step = _block_rows(n_rows, block_elements)
+        for start in range(0, n_rows, step):
+            stop = min(start + step, n_rows)
+            shared = np.zeros((stop - start, n_rows))
+            for species in np.unique(matrix.abundance[start:stop].indices):
+                sites = columns.indices[columns.indptr[species]:columns.indptr[species + 1]]
+                values = columns.data[columns.indptr[species]:columns.indptr[species + 1]]
+                first, last = np.searchsorted(sites, [start, stop])
+                shared[np.ix_(sites[first:last] - start, sites)] += np.minimum(values[first:last, None], values[None, :])
+            pair_totals = totals[start:stop, None] + totals[None, :]
+            yield start, _safe_ratio(pair_totals - 2 * shared, pair_totals)
+        return
+
+    presence = matrix.abundance.copy()
+    presence.data = np.ones_like(presence.data)
+    presence_t = presence.T.tocsr()
+    richness = matrix.richness().astype(np.float64)
+    for start in range(0, n_rows, _block_rows(n_rows, block_elements)):
+        stop = min(start + _block_rows(n_rows, block_elements), n_rows)
+        shared = (presence[start:stop] @ presence_t).toarray()
+        pair_richness = richness[start:stop, None] + richness[None, :]
+        if metric == 'jaccard':
+            similarity = _safe_ratio(shared, pair_richness - shared)
+        else:
+            similarity = _safe_ratio(2 * shared, pair_richness)
+        # Two plots without any species are identical
+        similarity[pair_richness == 0] = 1.0
+        yield start, 1 - similarity
+
+
+def pairwise_dissimilarity(matrix: CommunityMatrix, metric: str = 'bray_curtis',
+                           block_elements: int = BETA_DIVERSITY_BLOCK_ELEMENTS) -> np.ndarray:
+    """Full n x n dissimilarity matrix between the rows of a community matrix, assembled block by block."""
+    n_rows = matrix.shape[0]
+    result = np.empty((n_rows, n_rows))
+    for start, block in dissimilarity_blocks(matrix, metric, block_elements):
+        result[start:start + len(block)] = block
+    np.fill_diagonal(result, 0.0)
+    return result
+
+
+def nearest_rows(matrix: CommunityMatrix, metric: str = 'bray_curtis', k: int = 5,
+                 block_elements: int = BETA_DIVERSITY_BLOCK_ELEMENTS) -> dict:
+    """
+    The k most similar other rows of every row, keyed by row label, as lists of
+    {"plot_id", "dissimilarity"} in increasing dissimilarity (ties by plot id). Only one block
+    of the matrix is held at a time.
+    """
+    labels = [str(label) for label in matrix.rows]
+    n_rows = len(labels)
+    k = max(0, min(k, n_rows - 1))
+    result = {}
+    for start, block in dissimilarity_blocks(matrix, metric, block_elements):
+        block = block.copy()
+        block[np.arange(len(block)), np.arange(start, start + len(block))] = np.inf
+        if k == 0:
+            result.update({labels[start + offset]: [] for offset in range(len(block))})
+            continue
+        # k-th smallest value per row; everything up to it (ties included) is a candidate
+        thresholds = np.partition(block, k - 1, axis=1)[:, k - 1]
+        for offset, threshold in enumerate(thresholds):
+            row_candidates = np.flatnonzero(block[offset] <= threshold)
+            values = block[offset, row_candidates]
+            order = np.lexsort((row_candidates, values))[:k]
+            result[labels[start + offset]] = [
+                {"plot_id": labels[j], "dissimilarity": float(values[i])}
+                for i, j in zip(order, row_candidates[order])
+            ]
+    return result
+
+
+def load_beta_diversity(metric: str = 'bray_curtis', path=CLEANED_VEG_FULL_PATH) -> pd.DataFrame:
+    """
+    Plot x plot dissimilarity matrix of the cleaned dataset, computed once per dataset version.
+    Raises FileNotFoundError if the dataset does not exist and ValueError for an unknown metric.
+    """
+    _check_metric(metric)
+    matrix = load_community_matrix(path)
+    values = load_derived(path, ('beta_diversity', metric), lambda df: pairwise_dissimilarity(matrix, metric))
+    labels = pd.Index([str(label) for label in matrix.rows], name='Plot')
+    return pd.DataFrame(values, index=labels, columns=labels)
+
+
+def load_nearest_plots(metric: str = 'bray_curtis', k: int = 5, path=CLEANED_VEG_FULL_PATH) -> dict:
+    """
+    Top-k nearest plots of every plot. The lists are computed blockwise once per dataset version
+    for k rounded up to a power of two and cut to k, so nearby values of k share one cached
+    result (the order is total, so the first k of a longer list are the k nearest).
+    """
+    _check_metric(metric)
+    k = int(k)
+    computed = 1 << max(k - 1, 0).bit_length()
+    nearest = load_derived(
+        path, ('beta_nearest', metric, computed), lambda df: nearest_rows(load_community_matrix(path), metric, computed)
+    )
+    return {plot_id: neighbours[:k] for plot_id, neighbours in nearest.items()}
+
+
+def get_beta_diversity(metric: str = 'bray_curtis', plot_ids: list = None, top_k: int = None) -> dict:
+    """
+    API payload: the dissimilarity matrix between the requested plots (all plots by default),
+    or with top_k the k nearest plots (among all plots) of each requested plot.
+    """
+    if top_k is not None:
+        nearest = load_nearest_plots(metric, top_k)
+        plot_ids = sorted(nearest) if plot_ids is None else [str(plot_id) for plot_id in plot_ids]
+        return {"metric": metric, "top_k": int(top_k), "nearest": {plot_id: nearest.get(plot_id, []) for plot_id in plot_ids}}
+
+    frame = load_beta_diversity(metric)
+    if plot_ids is not None:
+        plot_ids = [str(plot_id) for plot_id in plot_ids if str(plot_id) in frame.index]
+        frame = frame.loc[plot_ids, plot_ids]
+    return {"metric": metric, "plots": frame.index.tolist(), "matrix": frame.to_numpy().round(6).tolist()}
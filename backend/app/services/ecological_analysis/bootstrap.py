@@ -0,0 +1,128 @@
+import numpy as np
+import pandas as pd
+from app.core.config import CLEANED_VEG_FULL_PATH, BOOTSTRAP_RESAMPLES, BOOTSTRAP_MAX_ELEMENTS
+from app.services.ecological_analysis.community_matrix import CommunityMatrix, load_community_matrix
+
+# Species with at most this many individuals are 'rare' in the ACE estimator
+ACE_RARE_THRESHOLD = 10
+
+
+def _packed_counts(matrix: CommunityMatrix, rows: np.ndarray) -> np.ndarray:
+    """
+    Integer abundances of the selected rows as a dense (rows x max richness) array, each row's
+    species packed to the left. Species identity does not matter to the estimators, and this
+    keeps the array as narrow as the richest plot instead of the whole species list.
+    """
+    sub = matrix.abundance[rows]
+    richness = np.diff(sub.indptr)
+    packed = np.zeros((len(rows), max(int(richness.max()) if len(rows) else 0, 1)), dtype=np.int64)
+    entry_rows = np.repeat(np.arange(len(rows)), richness)
+    positions = np.arange(sub.nnz) - sub.indptr[entry_rows]
+    packed[entry_rows, positions] = np.rint(sub.data).astype(np.int64)
+    return packed
+
+
+def _indices(counts: np.ndarray) -> tuple:
+    """Shannon, Simpson and Pielou evenness along the last axis of an abundance array."""
+    totals = counts.sum(axis=-1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p = counts / totals
+        shannon = -np.where(p > 0, p * np.log(p), 0.0).sum(axis=-1)
+        simpson = 1 - (p ** 2).sum(axis=-1)
+        richness = (counts > 0).sum(axis=-1)
+        evenness = np.where(richness > 1, shannon / np.log(np.maximum(richness, 2)), 0.0)
+    return shannon, simpson, evenness
+
+
+def richness_estimators(counts: np.ndarray) -> pd.DataFrame:
+    """
+    Chao1 (bias-corrected, S + (N-1)/N F1(F1 - 1) / (2(F2 + 1))) and ACE richness estimates
+    for every row of a (plots x species) integer abundance array, from the singleton/doubleton
+    and rare-species frequency counts.
+    """
+    counts = np.asarray(counts)
+    observed = (counts > 0).sum(axis=1)
+    f1 = (counts == 1).sum(axis=1)
+    f2 = (counts == 2).sum(axis=1)
+    total = counts.sum(axis=1)
+    correction = np.where(total > 0, (total - 1) / np.maximum(total, 1), 0.0)
+    chao1 = observed + correction * f1 * (f1 - 1) / (2 * (f2 + 1))
+
+    rare = (counts > 0) & (counts <= ACE_RARE_THRESHOLD)
+    s_rare = rare.sum(axis=1)
+    s_abundant = observed - s_rare
+    n_rare = np.where(rare, counts, 0).sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        coverage = 1 - f1 / n_rare
+        # sum_i i(i-1) F_i over the rare species equals sum n(n-1) over them
+        pairs = np.where(rare, counts * (counts - 1), 0).sum(axis=1)
+        gamma_sq = np.maximum(s_rare / coverage * pairs / (n_rare * (n_rare - 1)) - 1, 0)
+        ace = s_abundant + s_rare / coverage + f1 / coverage * gamma_sq
+    # Without rare species ACE is the observed richness; with only singletons it is undefined, so use Chao1
+    ace = np.where(s_rare == 0, observed, np.where((coverage > 0) & np.isfinite(ace), ace, chao1))
+    return pd.DataFrame({'observed': observed, 'chao1': chao1, 'ace': ace})
+
+
+def bootstrap_diversity(counts: np.ndarray, resamples: int = BOOTSTRAP_RESAMPLES, ci: float = 0.95,
+                        seed: int = None, max_elements: int = BOOTSTRAP_MAX_ELEMENTS) -> pd.DataFrame:
+    """
+    Percentile bootstrap intervals of Shannon, Simpson and Pielou evenness for every row of a
+    (plots x species) integer abundance array. Each resample redraws a plot's N individuals
+    from its observed proportions: a chunk of resamples for all plots is a single multinomial
+    draw of shape (chunk, plots, species), reduced along the species axis. The chunk size keeps
+    that array under max_elements values. Chao1 and ACE come from the same counts.
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    n_plots, n_species = counts.shape
+    totals = counts.sum(axis=1)
+    # Plots without individuals draw nothing; give them a valid probability row
+    pvals = np.zeros(counts.shape)
+    np.divide(counts, totals[:, None], out=pvals, where=totals[:, None] > 0)
+    pvals[totals == 0, 0] = 1.0
+
+    rng = np.random.default_rng(seed)
+    samples = np.empty((3, resamples, n_plots))
+    chunk = max(1, max_elements // max(n_plots * n_species, 1))
+    for start in range(0, resamples, chunk):
+        size = min(chunk, resamples - start)
+        draws = rng.multinomial(totals, pvals, size=(size, n_plots))
+        samples[:, start:start + size] = _indices(draws)
+
+    tail = (1 - ci) / 2 * 100
+    lower, upper = np.percentile(samples, [tail, 100 - tail], axis=1)
+    shannon, simpson, evenness = _indices(counts)
+    result = richness_estimators(counts)
+    for i, name in enumerate(('shannon', 'simpson', 'evenness')):
+        result[name] = (shannon, simpson, evenness)[i]
+        result[f'{name}_lower'] = lower[i]
+        result[f'{name}_upper'] = upper[i]
+    result['total'] = totals
+    return result
+
+
+def get_diversity_intervals(plot_ids: list = None, resamples: int = BOOTSTRAP_RESAMPLES, ci: float = 0.95,
+                            seed: int = None) -> dict:
+    """
+    Bootstrap intervals and richness estimators of the requested plots (all plots by default),
+    keyed by plot ID. Unknown plots and plots without individuals are left out.
+    """
+    matrix = load_community_matrix(CLEANED_VEG_FULL_PATH)
+    labels = [str(label) for label in matrix.rows] if plot_ids is None else [str(plot_id) for plot_id in plot_ids]
+    positions = {label: matrix.row_position(label) for label in labels}
+    labels = [label for label in labels if positions[label] is not None]
+    table = bootstrap_diversity(_packed_counts(matrix, np.array([positions[label] for label in labels], dtype=np.int64)),
+                                resamples, ci, seed)
+    result = {}
+    for label, row in zip(labels, table.itertuples(index=False)):
+        if row.total == 0:
+            continue
+        result[label] = {
+            "resamples": int(resamples),
+            "confidence_level": ci,
+            "shannon_ci": [round(row.shannon_lower, 3), round(row.shannon_upper, 3)],
+            "simpson_ci": [round(row.simpson_lower, 3), round(row.simpson_upper, 3)],
+            "pielou_evenness_ci": [round(row.evenness_lower, 3), round(row.evenness_upper, 3)],
+            "chao1": round(float(row.chao1), 3),
+            "ace": round(float(row.ace), 3),
+        }
+    return result
@@ -0,0 +1,138 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from app.core.config import (
+    ECO_RESULTS_PATH, ALLOMETRIC_MODELS_SELECTED, BIOMASS_EXPANSION_FACTOR, CARBON_FRACTION, CO2_PER_CARBON,
+    UNCERTAINTY_DRAWS, UNCERTAINTY_MAX_ELEMENTS, UNCERTAINTY_DBH_ERROR, UNCERTAINTY_HEIGHT_ERROR,
+    UNCERTAINTY_WOOD_DENSITY_ERROR,
+)
+from app.infrastructure.persistence.dataset_cache import load_dataset
+from app.services.data_processing.species_normalizer import normalize_species
+from app.services.ecological_analysis.allometry import log_design_matrix, evaluate_terms, model_applies, residual_sd
+
+# Levels the draws can be summarised at, and the columns that identify a unit at each
+LEVELS = {
+    'tree': ['Plot', 'Quadrant', 'ID'],
+    'quadrant': ['Plot', 'Quadrant'],
+    'plot': ['Plot'],
+}
+# Summaries of AGB carried over to carbon stock and CO2 equivalent, which are fixed multiples of it
+MEASURES = {
+    'AGB': 1.0,
+    'Carbon_Stock': BIOMASS_EXPANSION_FACTOR * CARBON_FRACTION,
+    'CO2_Eq': BIOMASS_EXPANSION_FACTOR * CARBON_FRACTION * CO2_PER_CARBON,
+}
+
+
+def _summarise(draws: np.ndarray, ci: float) -> dict:
+    """Mean, standard deviation and central ci interval along axis 1 of a (units x draws x models) array."""
+    tail = (1 - ci) / 2 * 100
+    lower, upper = np.percentile(draws, [tail, 100 - tail], axis=1)
+    return {
+        'mean': draws.mean(axis=1),
+        'sd': draws.std(axis=1, ddof=1) if draws.shape[1] > 1 else np.zeros(draws.shape[::2]),
+        'lower': lower,
+        'upper': upper,
+    }
+
+
+def simulate_agb(dbh, height, wood_density, density_error, names: list = None, species=None, groups=None,
+                 draws: int = UNCERTAINTY_DRAWS, seed: int = None, ci: float = 0.95,
+                 max_elements: int = UNCERTAINTY_MAX_ELEMENTS) -> dict:
+    """
+    Monte Carlo propagation of measurement, wood density and model error to aboveground biomass.
+
+    Every tree gets `draws` samples of D, H and rho with log-normal errors centred on the
+    measured values (relative SDs UNCERTAINTY_DBH_ERROR, UNCERTAINTY_HEIGHT_ERROR and the
+    per-tree density_error), and each model's AGB is multiplied by exp(residual_sd x N(0, 1)).
+    Trees are processed in chunks of (trees x draws) arrays of at most max_elements samples;
+    the random stream is consumed tree by tree, so results do not depend on the chunk size.
+
+    groups: optional integer group code per tree (e.g. a plot or quadrant). Draws are summed
+    per group within each draw, so group intervals account for the errors of all their trees.
+    Returns {'trees': summary, 'groups': summary or None}, each summary a dict of
+    (units x models) arrays 'mean', 'sd', 'lower' and 'upper'.
+    """
+    names = list(ALLOMETRIC_MODELS_SELECTED if names is None else names)
+    density_error = np.asarray(density_error, dtype=np.float64)
+    # Errors are additive on the log scale, so the logs are taken once per tree rather than per draw
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ln_d, ln_h, ln_rho = (np.log(np.asarray(values, dtype=np.float64)) for values in (dbh, height, wood_density))
+    n_trees, n_models = len(ln_d), len(names)
+    applies = model_applies(names, species, n_trees)
+    sigma = residual_sd(names)
+    rng = np.random.default_rng(seed)
+
+    if groups is not None:
+        groups = np.asarray(groups, dtype=np.int64)
+        n_groups = int(groups.max()) + 1 if n_trees else 0
+        group_totals = np.zeros((n_groups, draws * n_models))
+    tree_summary = {key: np.empty((n_trees, n_models)) for key in ('mean', 'sd', 'lower', 'upper')}
+
+    chunk = max(1, max_elements // max(draws, 1))
+    for start in range(0, n_trees, chunk):
+        stop = min(start + chunk, n_trees)
+        size = stop - start
+        noise = rng.standard_normal((size, draws, 3 + n_models))
+        terms = log_design_matrix(
+            (ln_d[start:stop, None] + UNCERTAINTY_DBH_ERROR * noise[..., 0]).ravel(),
+            (ln_h[start:stop, None] + UNCERTAINTY_HEIGHT_ERROR * noise[..., 1]).ravel(),
+            (ln_rho[start:stop, None] + density_error[start:stop, None] * noise[..., 2]).ravel(),
+        )
+        residuals = (sigma * noise[..., 3:]).reshape(-1, n_models)
+        agb = evaluate_terms(terms, names, residuals).reshape(size, draws, n_models)
+        agb[~np.broadcast_to(applies[start:stop, None, :], agb.shape)] = np.nan
+
+        for key, values in _summarise(agb, ci).items():
+            tree_summary[key][start:stop] = values
+        if groups is not None:
+            # Missing biomass counts as zero in the group totals, as in the point estimates
+            indicator = sparse.csr_matrix((np.ones(size), (groups[start:stop], np.arange(size))), shape=(n_groups, size))
+            group_totals += indicator @ np.nan_to_num(agb.reshape(size, -1))
+
+    group_summary = None
+    if groups is not None:
+        group_summary = _summarise(group_totals.reshape(n_groups, draws, n_models), ci)
+    return {'trees': tree_summary, 'groups': group_summary}
+
+
+def summary_table(summary: dict, names: list, index: pd.Index) -> pd.DataFrame:
+    """Columns <measure>_<model>_kg_<statistic> for AGB, carbon stock and CO2 equivalent."""
+    columns = {}
+    for measure, factor in MEASURES.items():
+        for i, name in enumerate(names):
+            for statistic in ('mean', 'sd', 'lower', 'upper'):
+                columns[f'{measure}_{name}_kg_{statistic}'] = summary[statistic][:, i] * factor
+    return pd.DataFrame(columns, index=index)
+
+
+def get_carbon_uncertainty(level: str = 'plot', plot_ids: list = None, draws: int = UNCERTAINTY_DRAWS,
+                           seed: int = None, ci: float = 0.95, names: list = None) -> pd.DataFrame:
+    """
+    Monte Carlo mean, SD and ci interval of AGB, carbon stock and CO2 equivalent of the trees
+    in the ecological results (of the requested plots, all by default), per tree, quadrant or plot.
+    Wood density errors follow how each tree's density was matched in the reference table.
+    """
+    if level not in LEVELS:
+        raise ValueError(f"Unknown level '{level}'; expected one of {', '.join(LEVELS)}")
+    names = list(ALLOMETRIC_MODELS_SELECTED if names is None else names)
+    trees = load_dataset(ECO_RESULTS_PATH)
+    if plot_ids is not None:
+        trees = trees[trees['Plot'].astype(str).isin([str(plot_id) for plot_id in plot_ids])]
+
+    match = trees['Wood_Density_Match'] if 'Wood_Density_Match' in trees.columns else pd.Series('default', index=trees.index)
+    density_error = match.astype(object).map(UNCERTAINTY_WOOD_DENSITY_ERROR).fillna(UNCERTAINTY_WOOD_DENSITY_ERROR['default'])
+    keys = trees[LEVELS[level]].astype(str)
+    if level == 'tree':
+        groups, index = None, pd.MultiIndex.from_frame(keys)
+    else:
+        groups, index = pd.MultiIndex.from_frame(keys).factorize()
+        index = index.set_names(LEVELS[level])
+    result = simulate_agb(
+        trees['Effective_DBH_cm'], trees['Height_m'], trees['Wood_Density_g_cm3'], density_error, names,
+        species=normalize_species(trees['Species'].astype(object)).to_numpy(), groups=groups,
+        draws=draws, seed=seed, ci=ci,
+    )
+    summary = result['trees'] if groups is None else result['groups']
+    table = summary_table(summary, names, index)
+    return table.sort_index() if level != 'tree' else table
@@ -0,0 +1,151 @@
+import logging
+from datetime import date
+import numpy as np
+import pandas as pd
+from app.core.config import ALLOMETRIC_MODELS_SELECTED, CO2_PER_CARBON
+from app.infrastructure.persistence.census_store import get_census, load_census
+
+logger = logging.getLogger(__name__)
+
+# A stem is the same individual in two censuses when these match
+STEM_KEYS = ['Plot', 'Quadrant', 'ID']
+# Levels the stem changes can be summarised at
+LEVELS = {
+    'quadrant': ['Plot', 'Quadrant'],
+    'plot': ['Plot'],
+}
+DAYS_PER_YEAR = 365.25
+
+
+def _alive(df: pd.DataFrame) -> pd.DataFrame:
+    """Rows not recorded as dead (a missing Condition counts as alive)."""
+    if 'Condition' not in df.columns:
+        return df
+    return df[~df['Condition'].astype(str).str.strip().str.casefold().eq('dead')]
+
+
+def _stem_index(df: pd.DataFrame) -> pd.MultiIndex:
+    return pd.MultiIndex.from_frame(df[STEM_KEYS].astype(str))
+
+
+def match_stems(earlier: pd.DataFrame, later: pd.DataFrame) -> np.ndarray:
+    """
+    Position in earlier of every row of later with the same (Plot, Quadrant, ID), or -1.
+    The earlier keys are put in a hash table once and probed once per later row, so the
+    join is linear in the number of stems. A key recorded twice matches through its first
+    record in either census; later repeats of it are left unmatched, as recruits.
+    """
+    keys, later_keys = _stem_index(earlier), _stem_index(later)
+    duplicated = keys.duplicated()
+    if duplicated.any():
+        logger.warning(f"{int(duplicated.sum())} stems share a (Plot, Quadrant, ID) key; matching their first record.")
+        first = np.flatnonzero(~duplicated)
+        found = keys[first].get_indexer(later_keys)
+        position = np.where(found >= 0, first[found], -1)
+    else:
+        position = keys.get_indexer(later_keys)
+    repeated = later_keys.duplicated()
+    if repeated.any():
+        logger.warning(f"{int(repeated.sum())} stems of the later census share a (Plot, Quadrant, ID) key; "
+                       f"matching their first record and counting the rest as recruits.")
+        position = np.where(repeated, -1, position)
+    return position
+
+
+def stem_changes(earlier: pd.DataFrame, later: pd.DataFrame, years: float, model: str = None) -> pd.DataFrame:
+    """
+    One row per stem alive in either census, with its status between them: 'survivor' (alive
+    in both), 'dead' (alive in the earlier census and dead or missing in the later one) or
+    'recruit' (alive in the later census only). Survivors get annual DBH and height increments.
+    Carbon stocks are those of the given allometric model (the first selected one by default).
+    """
+    if years <= 0:
+        raise ValueError("The later census must be dated after the earlier one")
+    model = model or ALLOMETRIC_MODELS_SELECTED[0]
+    carbon = f'Carbon_Stock_{model}_kg'
+    earlier, later = _alive(earlier), _alive(later)
+    position = match_stems(earlier, later)
+    matched = position >= 0
+    survived = np.zeros(len(earlier), dtype=bool)
+    survived[position[matched]] = True
+
+    def measures(df: pd.DataFrame, suffix: str) -> pd.DataFrame:
+        columns = {'Effective_DBH_cm': f'DBH_{suffix}_cm', 'Height_m': f'Height_{suffix}_m', carbon: f'Carbon_{suffix}_kg'}
+        return df.reindex(columns=list(columns)).rename(columns=columns).astype(np.float64).reset_index(drop=True)
+
+    def identity(df: pd.DataFrame) -> pd.DataFrame:
+        return df.reindex(columns=STEM_KEYS + ['Species']).astype(object).reset_index(drop=True)
+
+    survivors = pd.concat([identity(later[matched]), measures(earlier.iloc[position[matched]], '0'),
+                           measures(later[matched], '1')], axis=1)
+    deaths = pd.concat([identity(earlier[~survived]), measures(earlier[~survived], '0')], axis=1)
+    recruits = pd.concat([identity(later[~matched]), measures(later[~matched], '1')], axis=1)
+    stems = pd.concat([survivors.assign(status='survivor'), deaths.assign(status='dead'),
+                       recruits.assign(status='recruit')], ignore_index=True)
+    stems['DBH_increment_cm_yr'] = (stems['DBH_1_cm'] - stems['DBH_0_cm']) / years
+    stems['Height_increment_m_yr'] = (stems['Height_1_m'] - stems['Height_0_m']) / years
+    return stems
+
+
+def dynamics_table(stems: pd.DataFrame, years: float, level: str = 'plot') -> pd.DataFrame:
+    """
+    Demography and carbon flux per plot or quadrant from stem_changes, in one grouped pass:
+    stem counts, annual mortality and recruitment rates (exponential model, Sheil et al. 1995:
+    m = 1 - (S/N0)^(1/t), r = 1 - (S/N1)^(1/t)), mean survivor DBH increment, and annual carbon
+    gains from growth and recruitment, losses to mortality, and net flux (also as CO2).
+    """
+    if level not in LEVELS:
+        raise ValueError(f"Unknown level '{level}'; expected stem, {', '.join(LEVELS)}")
+    survivor, dead, recruit = (stems['status'].eq(status) for status in ('survivor', 'dead', 'recruit'))
+    facts = stems[LEVELS[level]].astype(str).assign(
+        survivors=survivor.astype(int),
+        deaths=dead.astype(int),
+        recruits=recruit.astype(int),
+        dbh_increment=stems['DBH_increment_cm_yr'].where(survivor),
+        carbon_0=stems['Carbon_0_kg'].fillna(0.0),
+        carbon_1=stems['Carbon_1_kg'].fillna(0.0),
+        growth=(stems['Carbon_1_kg'] - stems['Carbon_0_kg']).where(survivor).fillna(0.0),
+        recruitment=stems['Carbon_1_kg'].where(recruit).fillna(0.0),
+        mortality=stems['Carbon_0_kg'].where(dead).fillna(0.0),
+    )
+    table = facts.groupby(LEVELS[level], observed=True).agg(
+        survivors=('survivors', 'sum'), deaths=('deaths', 'sum'), recruits=('recruits', 'sum'),
+        mean_dbh_increment_cm_yr=('dbh_increment', 'mean'),
+        carbon_stock_0_kg=('carbon_0', 'sum'), carbon_stock_1_kg=('carbon_1', 'sum'),
+        carbon_growth_kg=('growth', 'sum'), carbon_recruitment_kg=('recruitment', 'sum'),
+        carbon_mortality_kg=('mortality', 'sum'),
+    )
+    table.insert(0, 'stems_1', table['survivors'] + table['recruits'])
+    table.insert(0, 'stems_0', table['survivors'] + table['deaths'])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        table['mortality_rate_yr'] = 1 - (table['survivors'] / table['stems_0']) ** (1 / years)
+        table['recruitment_rate_yr'] = 1 - (table['survivors'] / table['stems_1']) ** (1 / years)
+    for flux in ('carbon_growth', 'carbon_recruitment', 'carbon_mortality'):
+        table[f'{flux}_kg_yr'] = table.pop(f'{flux}_kg') / years
+    table['net_carbon_flux_kg_yr'] = (table['carbon_stock_1_kg'] - table['carbon_stock_0_kg']) / years
+    table['net_co2_flux_kg_yr'] = table['net_carbon_flux_kg_yr'] * CO2_PER_CARBON
+    return table
+
+
+def census_interval(earlier_id: str, later_id: str) -> float:
+    """Years between the dates of two recorded censuses."""
+    start, end = (date.fromisoformat(get_census(census_id)['date']) for census_id in (earlier_id, later_id))
+    return (end - start).days / DAYS_PER_YEAR
+
+
+def get_census_dynamics(earlier_id: str, later_id: str, level: str = 'plot', plot_ids: list = None,
+                        model: str = None) -> pd.DataFrame:
+    """
+    Changes between two recorded censuses, per 'stem' or summarised per 'quadrant' or 'plot',
+    for the requested plots (all by default).
+    """
+    if level != 'stem' and level not in LEVELS:
+        raise ValueError(f"Unknown level '{level}'; expected stem, {', '.join(LEVELS)}")
+    years = census_interval(earlier_id, later_id)
+    earlier, later = load_census(earlier_id), load_census(later_id)
+    if plot_ids is not None:
+        plot_ids = [str(plot_id) for plot_id in plot_ids]
+        earlier = earlier[earlier['Plot'].astype(str).isin(plot_ids)]
+        later = later[later['Plot'].astype(str).isin(plot_ids)]
+    stems = stem_changes(earlier, later, years, model)
+    return stems if level == 'stem' else dynamics_table(stems, years, level)
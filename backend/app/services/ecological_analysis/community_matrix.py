@@ -0,0 +1,166 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from app.core.config import CLEANED_VEG_FULL_PATH
+from app.infrastructure.persistence.dataset_cache import load_derived
+
+
+class CommunityMatrix:
+    """
+    Sparse site x species abundance matrix. Rows are plots (or plot/quadrant pairs), columns are
+    species, both in the sorted order of their categories so positions are stable for a given
+    dataset version. Two CSR matrices share one sparsity pattern:
+
+    - abundance:   summed 'Number' per (site, species)
+    - occurrences: number of records per (site, species)
+
+    A species is present at a site when it has at least one record, even if its summed
+    abundance is zero, which is how the per-plot groupby counted species before.
+    Every community metric is a row-wise reduction over the stored entries.
+    """
+    def __init__(self, abundance: sparse.csr_matrix, occurrences: sparse.csr_matrix, rows: pd.Index,
+                 species: pd.Index, integer_counts: bool = False):
+        self.abundance = abundance
+        self.occurrences = occurrences
+        self.rows = rows
+        self.species = species
+        self.integer_counts = integer_counts
+        # Row of every stored entry, for bincount-based row reductions
+        self._entry_rows = np.repeat(np.arange(len(rows)), np.diff(abundance.indptr))
+        self._diversity = None
+
+    @property
+    def shape(self):
+        return self.abundance.shape
+
+    @property
+    def nbytes(self) -> int:
+        return int(sum(m.data.nbytes + m.indices.nbytes + m.indptr.nbytes for m in (self.abundance, self.occurrences))
+                   + self._entry_rows.nbytes)
+
+    def row_position(self, label):
+        """Position of a row label (a plot id, or a (plot, quadrant) tuple), or None if absent."""
+        if isinstance(label, tuple):
+            label = tuple(str(part) for part in label)
+        else:
+            label = str(label)
+        try:
+            position = self.rows.get_loc(label)
+        except KeyError:
+            return None
+        return position if isinstance(position, (int, np.integer)) else None
+
+    def _row_sum(self, values: np.ndarray) -> np.ndarray:
+        return np.bincount(self._entry_rows, weights=values, minlength=len(self.rows))
+
+    def totals(self) -> np.ndarray:
+        return self._row_sum(self.abundance.data)
+
+    def richness(self) -> np.ndarray:
+        return np.diff(self.abundance.indptr)
+
+    def proportions(self) -> np.ndarray:
+        """Relative abundance p_ij of every stored entry (NaN on rows whose total is zero)."""
+        totals = self.totals()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return self.abundance.data / totals[self._entry_rows]
+
+    def diversity_table(self) -> pd.DataFrame:
+        """
+        Per-row totals, richness (S), Shannon H' = -sum p ln p, Simpson 1 - sum p^2 and
+        Pielou J' = H' / ln S (0 when S <= 1). Computed once per matrix.
+        """
+        if self._diversity is not None:
+            return self._diversity
+        p = self.proportions()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            p_log_p = np.where(p > 0, p * np.log(p), 0.0)
+            shannon = -self._row_sum(p_log_p)
+            simpson = 1 - self._row_sum(np.nan_to_num(p) ** 2)
+            richness = self.richness()
+            evenness = np.where(richness > 1, shannon / np.log(np.maximum(richness, 1)), 0.0)
+        self._diversity = pd.DataFrame({
+            'total': self.totals(),
+            'richness': richness,
+            'shannon': shannon,
+            'simpson': simpson,
+            'evenness': evenness,
+        }, index=self.rows)
+        return self._diversity
+
+    def relative_abundance(self) -> sparse.csr_matrix:
+        """Matrix of relative abundances in percent, with the same sparsity pattern."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            data = self.proportions() * 100
+        return sparse.csr_matrix((data, self.abundance.indices, self.abundance.indptr), shape=self.shape)
+
+    def row_counts(self, label) -> pd.Series:
+        """Abundance of every species recorded at one site, in column order; empty if the site is unknown."""
+        position = self.row_position(label)
+        if position is None:
+            return pd.Series(dtype='int64' if self.integer_counts else 'float64', name='count')
+        start, stop = self.abundance.indptr[position], self.abundance.indptr[position + 1]
+        values = self.abundance.data[start:stop]
+        if self.integer_counts:
+            values = values.astype(np.int64)
+        return pd.Series(values, index=self.species[self.abundance.indices[start:stop]], name='count')
+
+
+def build_community_matrix(df: pd.DataFrame, by=('Plot',), value: str = 'Number') -> CommunityMatrix:
+    """
+    Builds the sparse site x species matrix from cleaned vegetation records. Sites are the
+    distinct combinations of the 'by' columns; records without a species or site are ignored.
+    Without a value column every record counts as one individual.
+    """
+    by = list(by)
+    records = df.dropna(subset=by + ['Species'])
+
+    site_codes, site_labels = [], []
+    for col in by:
+        codes, labels = pd.factorize(records[col].astype(str), sort=True)
+        site_codes.append(codes)
+        site_labels.append(labels)
+    species_codes, species = pd.factorize(records['Species'].astype(str), sort=True)
+
+    # Row ids in lexicographic order of the 'by' columns, then only the combinations present
+    combined = np.zeros(len(records), dtype=np.int64)
+    for codes, labels in zip(site_codes, site_labels):
+        combined = combined * len(labels) + codes
+    row_keys, row_codes = np.unique(combined, return_inverse=True)
+    if len(by) == 1:
+        rows = pd.Index(site_labels[0][row_keys], name=by[0])
+    else:
+        parts, remainder = [], row_keys
+        for labels in reversed(site_labels):
+            parts.append(labels[remainder % len(labels)])
+            remainder = remainder // len(labels)
+        rows = pd.MultiIndex.from_arrays(list(reversed(parts)), names=by)
+
+    if value in records.columns:
+        weights = pd.to_numeric(records[value], errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+        integer_counts = pd.api.types.is_integer_dtype(records[value])
+    else:
+        weights = np.ones(len(records))
+        integer_counts = True
+
+    # One entry per (site, species): np.unique on the flat key sorts by row then column, which is CSR order
+    n_species = len(species)
+    entry_keys, entry_codes = np.unique(row_codes.astype(np.int64) * n_species + species_codes, return_inverse=True)
+    abundance_data = np.bincount(entry_codes, weights=weights, minlength=len(entry_keys))
+    occurrence_data = np.bincount(entry_codes, minlength=len(entry_keys)).astype(np.float64)
+    indices = (entry_keys % max(n_species, 1)).astype(np.int32)
+    indptr = np.concatenate([[0], np.cumsum(np.bincount(entry_keys // max(n_species, 1), minlength=len(rows)))])
+    shape = (len(rows), n_species)
+    return CommunityMatrix(
+        sparse.csr_matrix((abundance_data, indices, indptr), shape=shape),
+        sparse.csr_matrix((occurrence_data, indices, indptr), shape=shape),
+        rows,
+        pd.Index(species, name='Species'),
+        integer_counts,
+    )
+
+
+def load_community_matrix(path=CLEANED_VEG_FULL_PATH, by=('Plot',)) -> CommunityMatrix:
+    """Community matrix of a cleaned dataset, built once per dataset version by the dataset cache."""
+    by = tuple(by)
+    return load_derived(path, ('community_matrix', by), lambda df: build_community_matrix(df, by))
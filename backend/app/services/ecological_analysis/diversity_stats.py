@@ -0,0 +1,195 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import numpy as np
+import pandas as pd
+from app.core.config import CLEANED_VEG_FULL_PATH, DIVERSITY_STATS_PATH
+from app.infrastructure.persistence.dataset_cache import dataset_version, load_dataset, load_plot_index
+from app.services.ecological_analysis.community_matrix import build_community_matrix
+
+logger = logging.getLogger(__name__)
+
+# Columns the diversity statistics are computed from; a plot is refreshed when these change
+COLUMNS = ['Plot', 'Species', 'Number']
+INDICES = ['total', 'richness', 'shannon', 'simpson', 'evenness']
+
+_state = {"version": None, "aggregator": None}
+_lock = threading.Lock()
+
+
+def _n_ln_n(n: float) -> float:
+    return n * np.log(n) if n > 0 else 0.0
+
+
+class DiversityAggregator:
+    """
+    Per-plot sufficient statistics of the diversity indices, updatable row by row.
+
+    For every plot it keeps each species' abundance n and record count, and the running sums
+    N = sum n, sum n ln n, sum n^2 and richness S (species with at least one record, as in the
+    community matrix). The indices follow from the sums alone:
+    Shannon H' = ln N - (sum n ln n) / N, Simpson 1 - (sum n^2) / N^2, Pielou J' = H' / ln S.
+    Adding or removing rows touches only their (plot, species) cells, so an update costs
+    O(changed rows) whatever the size of the dataset.
+    """
+    def __init__(self):
+        self.plots = {}
+
+    @staticmethod
+    def _empty() -> dict:
+        return {"N": 0.0, "sum_n_ln_n": 0.0, "sum_n2": 0.0, "richness": 0, "species": {}}
+
+    @staticmethod
+    def _cells(rows: pd.DataFrame) -> pd.DataFrame:
+        """Abundance and record count per (Plot, Species) of some rows, like build_community_matrix counts them."""
+        rows = rows.dropna(subset=['Plot', 'Species'])
+        cells = pd.DataFrame({
+            'Plot': rows['Plot'].astype(str).to_numpy(),
+            'Species': rows['Species'].astype(str).to_numpy(),
+            'n': pd.to_numeric(rows['Number'], errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+            if 'Number' in rows.columns else np.ones(len(rows)),
+            'records': 1,
+        })
+        return cells.groupby(['Plot', 'Species'], sort=False).sum()
+
+    def _apply(self, rows: pd.DataFrame, sign: int):
+        for (plot, species), n, records in self._cells(rows).itertuples(name=None):
+            stats = self.plots.setdefault(plot, self._empty())
+            old_n, old_records = stats["species"].get(species, (0.0, 0))
+            new_n, new_records = old_n + sign * n, old_records + sign * int(records)
+            if new_records < 0:
+                raise ValueError(f"Cannot remove more records of '{species}' than plot {plot} holds")
+            stats["N"] += new_n - old_n
+            stats["sum_n_ln_n"] += _n_ln_n(new_n) - _n_ln_n(old_n)
+            stats["sum_n2"] += new_n * new_n - old_n * old_n
+            stats["richness"] += int(new_records > 0) - int(old_records > 0)
+            if new_records > 0:
+                stats["species"][species] = (new_n, new_records)
+            else:
+                stats["species"].pop(species, None)
+            if not stats["species"]:
+                # Reset rather than keep rounding residue for a plot that emptied out
+                del self.plots[plot]
+
+    def update(self, added: pd.DataFrame = None, removed: pd.DataFrame = None) -> 'DiversityAggregator':
+        """Applies an upsert: rows removed from (old versions of updated rows) and rows added to the dataset."""
+        if removed is not None and len(removed):
+            self._apply(removed, -1)
+        if added is not None and len(added):
+            self._apply(added, +1)
+        return self
+
+    def replace_plot(self, plot: str, rows: pd.DataFrame):
+        """Replaces one plot's statistics by those of its current rows (O(rows of the plot))."""
+        self.plots.pop(str(plot), None)
+        self.update(added=rows)
+
+    @classmethod
+    def from_records(cls, df: pd.DataFrame) -> 'DiversityAggregator':
+        """Full computation from every row of a cleaned dataset."""
+        return cls().update(added=df)
+
+    def indices(self, plot_ids: list = None) -> pd.DataFrame:
+        """total, richness, shannon, simpson and evenness per plot, from the sufficient statistics."""
+        plot_ids = sorted(self.plots) if plot_ids is None else [str(plot_id) for plot_id in plot_ids]
+        sums = pd.DataFrame(
+            [(self.plots[plot]["N"], self.plots[plot]["richness"], self.plots[plot]["sum_n_ln_n"], self.plots[plot]["sum_n2"])
+             if plot in self.plots else (0.0, 0, 0.0, 0.0) for plot in plot_ids],
+            columns=['total', 'richness', 'sum_n_ln_n', 'sum_n2'], index=pd.Index(plot_ids, name='Plot'),
+        )
+        total, richness = sums['total'].to_numpy(), sums['richness'].to_numpy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            shannon = np.where(total > 0, np.log(total) - sums['sum_n_ln_n'].to_numpy() / total, 0.0)
+            simpson = np.where(total > 0, 1 - sums['sum_n2'].to_numpy() / total ** 2, 0.0)
+            evenness = np.where(richness > 1, shannon / np.log(np.maximum(richness, 1)), 0.0)
+        return pd.DataFrame({'total': total, 'richness': richness, 'shannon': shannon, 'simpson': simpson,
+                             'evenness': evenness}, index=sums.index)
+
+    def to_dict(self) -> dict:
+        return {plot: {**stats, "species": {species: list(cell) for species, cell in stats["species"].items()}}
+                for plot, stats in self.plots.items()}
+
+    @classmethod
+    def from_dict(cls, plots: dict) -> 'DiversityAggregator':
+        aggregator = cls()
+        aggregator.plots = {plot: {**stats, "species": {species: (float(n), int(records))
+                                                        for species, (n, records) in stats["species"].items()}}
+                            for plot, stats in plots.items()}
+        return aggregator
+
+
+def _fingerprint(rows: pd.DataFrame) -> str:
+    if rows.empty:
+        return ""
+    frame = rows.reindex(columns=COLUMNS).astype(str)
+    return hashlib.blake2b(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes(), digest_size=16).hexdigest()
+
+
+def _write_store(version: str, fingerprints: dict, aggregator: DiversityAggregator):
+    os.makedirs(os.path.dirname(DIVERSITY_STATS_PATH), exist_ok=True)
+    tmp_path = f"{DIVERSITY_STATS_PATH}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({"source_version": version, "fingerprints": fingerprints, "plots": aggregator.to_dict()}, f)
+    os.replace(tmp_path, DIVERSITY_STATS_PATH)
+
+
+def _read_store():
+    try:
+        with open(DIVERSITY_STATS_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def refresh_diversity_stats() -> DiversityAggregator:
+    """
+    Brings the persisted statistics up to date with the cleaned dataset. They are reused while
+    the dataset version matches. When it changes, each plot's rows are fingerprinted and only
+    plots whose rows changed are recounted; removed plots are dropped. The statistics are then
+    written back with the new version.
+    Raises FileNotFoundError if the cleaned dataset does not exist.
+    """
+    with _lock:
+        version = dataset_version(CLEANED_VEG_FULL_PATH)
+        if _state["version"] == version:
+            return _state["aggregator"]
+        store = _read_store() or {"source_version": None, "fingerprints": {}, "plots": {}}
+        aggregator = DiversityAggregator.from_dict(store["plots"])
+        if store["source_version"] != version:
+            index = load_plot_index(CLEANED_VEG_FULL_PATH)
+            fingerprints = {plot: _fingerprint(rows) for plot, rows in index.items()}
+            changed = [plot for plot in fingerprints if store["fingerprints"].get(plot) != fingerprints[plot]]
+            for plot in changed:
+                aggregator.replace_plot(plot, index.get(plot))
+            for plot in set(store["fingerprints"]) - set(fingerprints):
+                aggregator.plots.pop(plot, None)
+            _write_store(version, fingerprints, aggregator)
+            logger.info(f"Diversity statistics refreshed: {len(changed)} of {len(fingerprints)} plots recounted.")
+        _state.update(version=version, aggregator=aggregator)
+        return aggregator
+
+
+def get_diversity_stats(plot_ids: list = None) -> pd.DataFrame:
+    """Diversity indices of the requested plots (all by default) from the incremental statistics."""
+    return refresh_diversity_stats().indices(plot_ids)
+
+
+def verify_diversity_stats(tolerance: float = 1e-9) -> dict:
+    """
+    Recomputes the indices of every plot from scratch through the community matrix and compares
+    them with the incremental statistics. Returns the largest absolute difference per index and
+    the plots that differ by more than tolerance.
+    """
+    incremental = get_diversity_stats()
+    matrix = build_community_matrix(load_dataset(CLEANED_VEG_FULL_PATH))
+    full = matrix.diversity_table()
+    full = full.set_axis(pd.Index([str(plot) for plot in full.index], name='Plot'))[INDICES]
+    plots = sorted(set(full.index) | set(incremental.index))
+    difference = (incremental.reindex(plots).fillna(0.0) - full.reindex(plots).fillna(0.0)).abs()
+    return {
+        "plots": len(plots),
+        "max_difference": {index: float(difference[index].max()) if plots else 0.0 for index in INDICES},
+        "mismatched_plots": difference.index[(difference > tolerance).any(axis=1)].tolist(),
+    }
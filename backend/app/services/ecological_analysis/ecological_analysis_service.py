@@ -2,10 +2,20 @@ import pandas as pd
 import numpy as np
 import os
 import logging
-from app.core.config import CLEANED_VEG_TREES_PATH, ECO_RESULTS_PATH, CLEANED_VEG_FULL_PATH
+from app.core.config import CLEANED_VEG_TREES_PATH, ECO_RESULTS_PATH, CLEANED_VEG_FULL_PATH, ALLOMETRIC_MODELS_SELECTED
+from app.infrastructure.persistence.dataset_cache import load_dataset, load_plot_index, store_dataset
+from app.services.data_processing.species_normalizer import normalize_species
+from app.services.ecological_analysis.community_matrix import load_community_matrix
+from app.services.ecological_analysis.bootstrap import get_diversity_intervals
+from app.services.ecological_analysis.diversity_stats import get_diversity_stats
+from app.services.ecological_analysis.allometry import carbon_columns
+from app.services.ecological_analysis.wood_density import load_wood_density_index
+from app.services.ecological_analysis.stand_structure import volume_columns
+from app.services.ecological_analysis.size_classes import HEIGHT_BINS, HEIGHT_LABELS, DBH_BINS, DBH_LABELS, class_counts
 
 logger = logging.getLogger(__name__)
 
+
 def get_cleaned_data(plot_id=None, data_type='trees'):
     """
     Helper to load cleaned data.
@@ -17,90 +27,72 @@ def get_cleaned_data(plot_id=None, data_type='trees'):
         logger.error(f"Data file not found at {path}")
         return pd.DataFrame()
         
-    df = pd.read_csv(path)
-    
     if plot_id:
-        # Ensure plot_id is string for comparison
-        df['Plot'] = df['Plot'].astype(str)
-        df = df[df['Plot'] == str(plot_id)]
-        
-    return df
+        # Contiguous slice of the plot from the cached per-plot index
+        return load_plot_index(path).get(plot_id)
+
+    return load_dataset(path)
+
+def _plot_species_counts(plot_id):
+    """Abundance per species of one plot from the cached plot x species matrix; None if there is no data."""
+    if not os.path.exists(CLEANED_VEG_FULL_PATH):
+        logger.error(f"Data file not found at {CLEANED_VEG_FULL_PATH}")
+        return None
+    counts = load_community_matrix(CLEANED_VEG_FULL_PATH).row_counts(plot_id)
+    return counts if not counts.empty else None
 
 def calculate_species_richness(plot_id):
     """
     Calculates species richness (number of unique species).
     """
-    df = get_cleaned_data(plot_id, data_type='full')
-    if df.empty:
+    counts = _plot_species_counts(plot_id)
+    if counts is None:
         return {"total_richness": 0, "species_list": []}
-        
-    # Filter out 'Unknown' or empty species if necessary
-    species_list = df['Species'].dropna().unique().tolist()
-    richness = len(species_list)
-    
+
+    # Matrix columns are sorted, so the recorded species already come in alphabetical order
+    species_list = counts.index.tolist()
     return {
         "plot_id": plot_id,
-        "total_richness": richness,
-        "species_list": sorted(species_list)
+        "total_richness": len(species_list),
+        "species_list": species_list
     }
 
-def calculate_diversity_indices(plot_id):
+def calculate_diversity_indices(plot_id, bootstrap=0, ci=0.95, seed=None):
     """
     Calculates Shannon and Simpson diversity indices.
+    With bootstrap > 0, adds percentile confidence intervals from that many resamples
+    and the Chao1/ACE richness estimates.
     """
-    df = get_cleaned_data(plot_id, data_type='full')
-    if df.empty:
+    if not os.path.exists(CLEANED_VEG_FULL_PATH):
         return {"shannon": 0, "simpson": 0, "evenness": 0}
-        
-    # Count individuals per species
-    # Assuming 'Number' column exists for counts, otherwise count rows
-    if 'Number' in df.columns:
-        counts = df.groupby('Species')['Number'].sum()
-    else:
-        counts = df['Species'].value_counts()
-        
-    total_individuals = counts.sum()
-    if total_individuals == 0:
+    # Shannon H' = -sum(pi * ln(pi)), Simpson 1 - sum(pi^2), Pielou J' = H' / ln(S), from the
+    # incrementally maintained per-plot sums, so an import only recounts the plots it changed
+    row = get_diversity_stats([plot_id]).iloc[0]
+    if row['total'] == 0:
         return {"shannon": 0, "simpson": 0, "evenness": 0}
-        
-    proportions = counts / total_individuals
-    
-    # Shannon Index (H') = -sum(pi * ln(pi))
-    shannon = -np.sum(proportions * np.log(proportions))
-    
-    # Simpson Index (D) = sum(pi^2)
-    # Simpson's Index of Diversity (1 - D)
-    simpson = 1 - np.sum(proportions ** 2)
-    
-    # Pielou's Evenness (J') = H' / ln(S)
-    S = len(counts)
-    evenness = shannon / np.log(S) if S > 1 else 0
-    
-    return {
+
+    result = {
         "plot_id": plot_id,
-        "shannon_index": round(shannon, 3),
-        "simpson_index": round(simpson, 3),
-        "pielou_evenness": round(evenness, 3)
+        "shannon_index": round(row['shannon'], 3),
+        "simpson_index": round(row['simpson'], 3),
+        "pielou_evenness": round(row['evenness'], 3)
     }
+    if bootstrap:
+        result.update(get_diversity_intervals([plot_id], bootstrap, ci, seed).get(str(plot_id), {}))
+    return result
 
 def calculate_dominance(plot_id):
     """
     Calculates dominance metrics (abundance rank).
     """
-    df = get_cleaned_data(plot_id, data_type='full')
-    if df.empty:
+    counts = _plot_species_counts(plot_id)
+    if counts is None:
         return []
-        
-    if 'Number' in df.columns:
-        counts = df.groupby('Species')['Number'].sum()
-    else:
-        counts = df['Species'].value_counts()
-        
-    total = counts.sum()
-    dominance_df = counts.reset_index(name='count')
-    dominance_df['relative_abundance'] = (dominance_df['count'] / total) * 100
-    dominance_df = dominance_df.sort_values('count', ascending=False)
-    
+
+    dominance_df = counts.rename_axis('Species').reset_index(name='count')
+    dominance_df['relative_abundance'] = (dominance_df['count'] / counts.sum()) * 100
+    dominance_df = dominance_df.sort_values('count', ascending=False, kind='stable')
+
     return dominance_df.to_dict(orient='records')
 
 def calculate_structural_metrics(plot_id):
@@ -111,34 +103,22 @@ def calculate_structural_metrics(plot_id):
     if df.empty:
         return {"height_dist": [], "dbh_dist": []}
         
-    # Height Distribution
-    # Create bins for height (e.g., 0-5, 5-10, etc.)
-    height_bins = [0, 2, 5, 10, 15, 20, 30, 50]
-    height_labels = ['0-2m', '2-5m', '5-10m', '10-15m', '15-20m', '20-30m', '>30m']
-    
-    if 'Height_m' in df.columns:
-        df['Height_Class'] = pd.cut(df['Height_m'], bins=height_bins, labels=height_labels, right=False)
-        height_dist = df['Height_Class'].value_counts().sort_index().reset_index()
-        height_dist.columns = ['range', 'count']
-    else:
-        height_dist = pd.DataFrame(columns=['range', 'count'])
-
-    # DBH Distribution
-    # Create bins for DBH (e.g., 0-10, 10-20, etc.)
-    dbh_bins = [0, 10, 20, 30, 50, 80, 100, 200]
-    dbh_labels = ['0-10cm', '10-20cm', '20-30cm', '30-50cm', '50-80cm', '80-100cm', '>100cm']
-    
-    if 'Effective_DBH_cm' in df.columns:
-        df['DBH_Class'] = pd.cut(df['Effective_DBH_cm'], bins=dbh_bins, labels=dbh_labels, right=False)
-        dbh_dist = df['DBH_Class'].value_counts().sort_index().reset_index()
-        dbh_dist.columns = ['range', 'count']
-    else:
-        dbh_dist = pd.DataFrame(columns=['range', 'count'])
-        
+    # Height and DBH distributions, one bincount each over the class index
+    distributions = {}
+    for key, column, bins, labels in (
+        ('height_distribution', 'Height_m', HEIGHT_BINS, HEIGHT_LABELS),
+        ('dbh_distribution', 'Effective_DBH_cm', DBH_BINS, DBH_LABELS),
+    ):
+        if column in df.columns:
+            counts = class_counts(np.zeros(len(df), dtype=np.int64), 1, df[column], bins)[0]
+            distributions[key] = [{"range": label, "count": int(count)} for label, count in zip(labels, counts)]
+        else:
+            distributions[key] = []
+
     return {
         "plot_id": plot_id,
-        "height_distribution": height_dist.to_dict(orient='records'),
-        "dbh_distribution": dbh_dist.to_dict(orient='records')
+        "height_distribution": distributions['height_distribution'],
+        "dbh_distribution": distributions['dbh_distribution']
     }
 
 def calculate_biomass_and_carbon():
@@ -149,38 +129,22 @@ def calculate_biomass_and_carbon():
     
     os.makedirs(os.path.dirname(ECO_RESULTS_PATH), exist_ok=True)
     
-    df_trees = pd.read_csv(CLEANED_VEG_TREES_PATH)
+    df_trees = load_dataset(CLEANED_VEG_TREES_PATH)
 
     # --- Ecological Calculations ---
-    wood_density_map = {
-        'Ficus racemosa': 0.48, 
-        'Pongamia pinnata': 0.65, 
-        'Indian drumstick': 0.45,
-        'Azadirachta indica': 0.58,
-        'Caesalpinia pulcherrima': 0.6, # Using a generic value for ornamental tree
-        'Hibiscus rosa-sinensis': 0.5, # Using a generic value for large shrub/small tree
-        'Neem': 0.58, # Synonym for Azadirachta indica
-        'default': 0.62
-    }
-    df_trees['Wood_Density_g_cm3'] = df_trees['Species'].map(wood_density_map).fillna(wood_density_map['default'])
-
-    # Method 1 (Height-Inclusive)
-    df_trees['AGB_M1_kg'] = 0.0673 * (df_trees['Wood_Density_g_cm3'] * df_trees['Effective_DBH_cm']**2 * df_trees['Height_m'])**0.976
-    df_trees['Carbon_Stock_M1_kg'] = (df_trees['AGB_M1_kg'] * 1.26) * 0.47
-    df_trees['CO2_Eq_M1_kg'] = df_trees['Carbon_Stock_M1_kg'] * (44/12)
-
-    # Method 2 (Height-Exclusive)
-    D = df_trees['Effective_DBH_cm']
-    rho = df_trees['Wood_Density_g_cm3']
-    # Ensure no log(0) or negative logs
-    D_safe = D.replace(0, np.nan).dropna()
-    rho_safe = rho.replace(0, np.nan).dropna()
-
-    df_trees['AGB_M2_kg'] = np.exp(-1.803 - 0.976 * np.log(rho_safe) + 2.673 * np.log(D_safe) - 0.0299 * (np.log(D_safe))**2)
-    df_trees['Carbon_Stock_M2_kg'] = (df_trees['AGB_M2_kg'] * 1.26) * 0.47
-    df_trees['CO2_Eq_M2_kg'] = df_trees['Carbon_Stock_M2_kg'] * (44/12)
+    # Wood density from the reference table, falling back from species to genus to family to the default
+    accepted_species = normalize_species(df_trees['Species'].astype(object))
+    df_trees[['Wood_Density_g_cm3', 'Wood_Density_Match']] = load_wood_density_index().lookup(accepted_species)
+
+    # Every selected allometric model (M1 height-inclusive, M2 height-exclusive, ...) in one pass
+    carbon = carbon_columns(df_trees, ALLOMETRIC_MODELS_SELECTED, species=accepted_species.to_numpy())
+    df_trees[carbon.columns] = carbon
+
+    # Basal area and stem volume (form factor and taper), summed per quadrant and plot by stand_structure
+    volumes = volume_columns(df_trees)
+    df_trees[volumes.columns] = volumes
     
-    df_trees.to_csv(ECO_RESULTS_PATH, index=False)
+    df_trees = store_dataset(df_trees, ECO_RESULTS_PATH)
     logging.info(f"Ecological calculations complete. Results saved to {ECO_RESULTS_PATH}")
     
     return df_trees
\ No newline at end of file
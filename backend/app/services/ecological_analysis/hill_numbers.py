@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from app.core.config import CLEANED_VEG_FULL_PATH, HILL_Q_MIN, HILL_Q_MAX, HILL_Q_STEP, HILL_MAX_ORDERS
+from app.infrastructure.persistence.dataset_cache import load_derived
+from app.services.ecological_analysis.community_matrix import CommunityMatrix, load_community_matrix
+
+
+def q_grid(q_min: float = HILL_Q_MIN, q_max: float = HILL_Q_MAX, q_step: float = HILL_Q_STEP) -> np.ndarray:
+    """
+    Orders q from q_min to q_max inclusive in steps of q_step, rounded so they make stable cache keys.
+    Raises ValueError for an empty grid or one with more than HILL_MAX_ORDERS orders.
+    """
+    if q_step <= 0 or q_max < q_min:
+        raise ValueError("The q grid needs q_step > 0 and q_max >= q_min")
+    if np.floor((q_max - q_min) / q_step + 0.5) + 1 > HILL_MAX_ORDERS:
+        raise ValueError(f"The q grid would have more than {HILL_MAX_ORDERS} orders; use a larger q_step")
+    return np.round(np.arange(q_min, q_max + q_step / 2, q_step), 6)
+
+
+def hill_profiles(matrix: CommunityMatrix, q) -> pd.DataFrame:
+    """
+    Hill numbers D_q = (sum_i p_i^q)^(1 / (1 - q)) of every row of the community matrix for
+    every order in q, with D_1 = exp(H') as the limit at q = 1. D_0 is the richness, D_1 the
+    exponential of Shannon and D_2 the inverse Simpson concentration.
+
+    p^q is evaluated once for all stored entries and all orders (entries x orders); a sparse
+    rows x entries indicator matrix then sums it per row in one product.
+    Rows without individuals get NaN.
+    """
+    q = np.asarray(q, dtype=np.float64)
+    p = np.nan_to_num(matrix.proportions())
+    present = p > 0
+    n_rows = matrix.shape[0]
+    indicator = sparse.csr_matrix(
+        (present.astype(np.float64), np.arange(p.size), matrix.abundance.indptr), shape=(n_rows, p.size)
+    )
+    with np.errstate(divide='ignore', invalid='ignore'):
+        powers = np.where(present[:, None], np.power(p[:, None], q[None, :]), 0.0)
+        sums = indicator @ powers
+        shannon = -(indicator @ np.where(present, p * np.log(np.where(present, p, 1.0)), 0.0))
+        exponent = np.where(q == 1, 0.0, 1 / (1 - np.where(q == 1, 0.0, q)))
+        profiles = np.where(q[None, :] == 1, np.exp(shannon)[:, None], sums ** exponent[None, :])
+    empty = matrix.totals() <= 0
+    profiles[empty] = np.nan
+    return pd.DataFrame(profiles, index=[str(label) for label in matrix.rows], columns=q)
+
+
+def load_hill_profiles(q=None, path=CLEANED_VEG_FULL_PATH) -> pd.DataFrame:
+    """Hill profiles of every plot on the q grid (the default grid if None), computed once per dataset version."""
+    q = q_grid() if q is None else np.asarray(q, dtype=np.float64)
+    return load_derived(path, ('hill_profiles', tuple(q.tolist())), lambda df: hill_profiles(load_community_matrix(path), q))
+
+
+def get_hill_profiles(plot_ids: list = None, q_min: float = HILL_Q_MIN, q_max: float = HILL_Q_MAX,
+                      q_step: float = HILL_Q_STEP) -> dict:
+    """
+    API payload: the q grid and each requested plot's Hill numbers along it (all plots by default).
+    Unknown plots and plots without individuals get an empty profile.
+    """
+    profiles = load_hill_profiles(q_grid(q_min, q_max, q_step))
+    plot_ids = profiles.index.tolist() if plot_ids is None else [str(plot_id) for plot_id in plot_ids]
+    result = {}
+    for plot_id in plot_ids:
+        if plot_id in profiles.index and not profiles.loc[plot_id].isna().any():
+            result[plot_id] = profiles.loc[plot_id].round(3).tolist()
+        else:
+            result[plot_id] = []
+    return {"q": profiles.columns.tolist(), "profiles": result}
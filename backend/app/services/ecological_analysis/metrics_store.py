@@ -0,0 +1,213 @@
+import os
+import json
+import logging
+import threading
+import numpy as np
+import pandas as pd
+from app.core.config import CLEANED_VEG_FULL_PATH, CLEANED_VEG_TREES_PATH, PLOT_METRICS_PATH
+from app.infrastructure.persistence.dataset_cache import load_dataset, dataset_version
+from app.services.ecological_analysis.size_classes import HEIGHT_BINS, HEIGHT_LABELS, DBH_BINS, DBH_LABELS, class_counts
+from app.services.ecological_analysis.community_matrix import CommunityMatrix, build_community_matrix
+from app.services.ecological_analysis.diversity_stats import refresh_diversity_stats
+
+logger = logging.getLogger(__name__)
+
+METRICS = ['richness', 'diversity', 'dominance', 'structure']
+
+# Responses for plots without data, identical to the per-request calculate_* functions
+EMPTY_METRICS = {
+    'richness': {"total_richness": 0, "species_list": []},
+    'diversity': {"shannon": 0, "simpson": 0, "evenness": 0},
+    'dominance': [],
+    'structure': {"height_dist": [], "dbh_dist": []},
+}
+
+_memo = {"source_versions": None, "plots": {}}
+_lock = threading.Lock()
+
+
+def _source_versions() -> dict:
+    return {
+        "cleaned_full": dataset_version(CLEANED_VEG_FULL_PATH),
+        "cleaned_trees": dataset_version(CLEANED_VEG_TREES_PATH),
+    }
+
+
+def _richness(matrix: CommunityMatrix, plots: list) -> dict:
+    result = {}
+    for plot in plots:
+        species_list = matrix.row_counts(plot).index.tolist()
+        result[plot] = {"plot_id": plot, "total_richness": len(species_list), "species_list": species_list}
+    return result
+
+
+def _diversity(matrix: CommunityMatrix, plots: list) -> dict:
+    per_plot = matrix.diversity_table()
+    result = {}
+    for plot in plots:
+        if plot not in per_plot.index or per_plot.at[plot, 'total'] == 0:
+            result[plot] = dict(EMPTY_METRICS['diversity'])
+            continue
+        row = per_plot.loc[plot]
+        result[plot] = {
+            "plot_id": plot,
+            "shannon_index": round(float(row['shannon']), 3),
+            "simpson_index": round(float(row['simpson']), 3),
+            "pielou_evenness": round(float(row['evenness']), 3),
+        }
+    return result
+
+
+def _dominance(matrix: CommunityMatrix, plots: list) -> dict:
+    relative = matrix.relative_abundance()
+    result = {}
+    for plot in plots:
+        counts = matrix.row_counts(plot)
+        if counts.empty:
+            result[plot] = []
+            continue
+        position = matrix.row_position(plot)
+        shares = relative.data[relative.indptr[position]:relative.indptr[position + 1]]
+        order = np.argsort(-counts.to_numpy(), kind='stable')
+        result[plot] = [
+            {"Species": species, "count": count, "relative_abundance": share}
+            for species, count, share in zip(
+                counts.index[order].tolist(), counts.to_numpy()[order].tolist(), shares[order].tolist()
+            )
+        ]
+    return result
+
+
+def _structure(df_trees: pd.DataFrame) -> dict:
+    if df_trees.empty:
+        return {}
+    plot_codes, plot_ids = pd.factorize(df_trees['Plot'].astype(str), sort=True)
+    distributions = {}
+    for key, column, bins, labels in (
+        ('height_distribution', 'Height_m', HEIGHT_BINS, HEIGHT_LABELS),
+        ('dbh_distribution', 'Effective_DBH_cm', DBH_BINS, DBH_LABELS),
+    ):
+        if column in df_trees.columns:
+            distributions[key] = class_counts(plot_codes, len(plot_ids), df_trees[column], bins)
+        else:
+            distributions[key] = None
+
+    result = {}
+    for i, plot in enumerate(plot_ids):
+        entry = {"plot_id": plot}
+        for key, labels in (('height_distribution', HEIGHT_LABELS), ('dbh_distribution', DBH_LABELS)):
+            matrix = distributions[key]
+            entry[key] = [] if matrix is None else [
+                {"range": label, "count": int(count)} for label, count in zip(labels, matrix[i])
+            ]
+        result[plot] = entry
+    return result
+
+
+def compute_plot_metrics(df_full: pd.DataFrame, df_trees: pd.DataFrame) -> dict:
+    """
+    Computes richness, diversity, dominance and structure for every plot: the community metrics
+    as row reductions over the plot x species matrix, structure as one histogram pass. The
+    values match the per-request calculate_* functions of the ecological analysis service.
+    """
+    plots = sorted(df_full['Plot'].dropna().astype(str).unique().tolist())
+    matrix = build_community_matrix(df_full)
+    richness = _richness(matrix, plots)
+    diversity = _diversity(matrix, plots)
+    dominance = _dominance(matrix, plots)
+    structure = _structure(df_trees)
+    return {
+        plot: {
+            'richness': richness[plot],
+            'diversity': diversity[plot],
+            'dominance': dominance[plot],
+            'structure': structure.get(plot, dict(EMPTY_METRICS['structure'])),
+        }
+        for plot in plots
+    }
+
+
+def _write_store(store: dict):
+    os.makedirs(os.path.dirname(PLOT_METRICS_PATH), exist_ok=True)
+    tmp_path = f"{PLOT_METRICS_PATH}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(store, f)
+    os.replace(tmp_path, PLOT_METRICS_PATH)
+
+
+def _read_store():
+    try:
+        with open(PLOT_METRICS_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def materialize_plot_metrics() -> dict:
+    """
+    Pipeline step: computes the metrics of every plot from the cleaned datasets and writes them,
+    stamped with the versions of those datasets, to the plot metrics store.
+    """
+    logging.info(f"Computing plot metrics from {CLEANED_VEG_FULL_PATH} and {CLEANED_VEG_TREES_PATH}")
+    with _lock:
+        versions = _source_versions()
+        store = {
+            "source_versions": versions,
+            "plots": compute_plot_metrics(load_dataset(CLEANED_VEG_FULL_PATH), load_dataset(CLEANED_VEG_TREES_PATH)),
+        }
+        _write_store(store)
+        _memo.update(store)
+    logging.info(f"Plot metrics for {len(store['plots'])} plots saved to {PLOT_METRICS_PATH}")
+    # Keep the incremental diversity statistics in step with the imported data
+    refresh_diversity_stats()
+    return store
+
+
+def load_plot_metrics() -> dict:
+    """
+    Returns the metrics of all plots keyed by plot id. The store is reused while the cleaned
+    datasets are unchanged and recomputed (and rewritten) when their versions no longer match.
+    """
+    try:
+        versions = _source_versions()
+    except FileNotFoundError as e:
+        logger.error(f"Data file not found: {e.filename}")
+        return {}
+    with _lock:
+        if _memo["source_versions"] == versions:
+            return _memo["plots"]
+        store = _read_store()
+        if store is not None and store.get("source_versions") == versions:
+            _memo.update(store)
+            return _memo["plots"]
+    logger.info("Plot metrics store is missing or out of date; recomputing.")
+    return materialize_plot_metrics()["plots"]
+
+
+def _metric(plots: dict, plot_id: str, metric: str):
+    """One metric of one plot from an already loaded store, or the empty value for unknown plots."""
+    plot = plots.get(str(plot_id))
+    if plot is None:
+        empty = EMPTY_METRICS[metric]
+        return list(empty) if isinstance(empty, list) else dict(empty)
+    return plot[metric]
+
+
+def get_plot_metric(plot_id: str, metric: str):
+    """One metric ('richness', 'diversity', 'dominance' or 'structure') of one plot from the store."""
+    return _metric(load_plot_metrics(), plot_id, metric)
+
+
+def get_plot_metrics_batch(plot_ids: list = None, metrics: list = None) -> dict:
+    """
+    Metrics of many plots in one call, keyed by plot id. plot_ids defaults to every plot in the
+    store and metrics to all of METRICS; a single metric name returns its value per plot directly.
+    Unknown plots get the same empty values as the per-plot lookups. The store is loaded once
+    and then only indexed.
+    """
+    plots = load_plot_metrics()
+    plot_ids = sorted(plots) if plot_ids is None else [str(plot_id) for plot_id in plot_ids]
+    if isinstance(metrics, str):
+        return {plot_id: _metric(plots, plot_id, metrics) for plot_id in plot_ids}
+    metrics = METRICS if metrics is None else metrics
+    return {plot_id: {metric: _metric(plots, plot_id, metric) for metric in metrics} for plot_id in plot_ids}
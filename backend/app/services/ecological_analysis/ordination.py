@@ -0,0 +1,266 @@
+import logging
+import numpy as np
+import pandas as pd
+from scipy.cluster.hierarchy import linkage, fcluster
+from scipy.cluster.vq import kmeans2
+from scipy.linalg import eigh
+from scipy.spatial.distance import pdist, squareform
+from app.core.config import (
+    CLEANED_VEG_FULL_PATH, ECO_RESULTS_PATH, CANOPY_RESULTS_PATH, ALLOMETRIC_MODELS_SELECTED,
+    ORDINATION_FEATURES, CLUSTER_COUNT, CLUSTER_LINKAGE,
+)
+from app.infrastructure.persistence.dataset_cache import load_dataset, load_derived
+from app.services.ecological_analysis.beta_diversity import BETA_METRICS, load_beta_diversity
+from app.services.ecological_analysis.community_matrix import load_community_matrix
+from app.services.ecological_analysis.stand_structure import load_stand_tables
+
+logger = logging.getLogger(__name__)
+
+FEATURE_GROUPS = ('species', 'diversity', 'structure', 'canopy', 'carbon')
+CLUSTER_METHODS = ('hierarchical', 'kmeans')
+LINKAGES = ('average', 'complete', 'single', 'ward')
+ORDINATIONS = ('pca', 'pcoa')
+# Dissimilarities between plots: Euclidean over the feature matrix, or a beta-diversity metric
+# over the species composition alone
+METRICS = ('euclidean',) + BETA_METRICS
+CANOPY_FEATURES = ['canopy_cover_percent', 'estimated_lai', 'gap_fraction']
+
+
+def _species_features() -> pd.DataFrame:
+    """Hellinger-transformed abundances (square root of relative abundance) per plot and species."""
+    matrix = load_community_matrix(CLEANED_VEG_FULL_PATH)
+    relative = matrix.relative_abundance().toarray() / 100
+    labels = pd.Index([str(label) for label in matrix.rows], name='Plot')
+    return pd.DataFrame(np.sqrt(np.nan_to_num(relative)), index=labels,
+                        columns=[f'species:{species}' for species in matrix.species])
+
+
+def _diversity_features() -> pd.DataFrame:
+    table = load_community_matrix(CLEANED_VEG_FULL_PATH).diversity_table()
+    labels = pd.Index([str(label) for label in table.index], name='Plot')
+    return table[['richness', 'shannon', 'simpson', 'evenness']].set_axis(labels).astype(np.float64)
+
+
+def _structure_features() -> pd.DataFrame:
+    plots = load_stand_tables()['plot']
+    features = plots[['stems_per_ha', 'basal_area_m2_per_ha', 'volume_taper_m3_per_ha']].copy()
+    trees = load_dataset(ECO_RESULTS_PATH)
+    means = trees.assign(Plot=trees['Plot'].astype(str)).groupby('Plot')[['Height_m', 'Effective_DBH_cm']].mean()
+    features[['mean_height_m', 'mean_dbh_cm']] = means.reindex(features.index)
+    return features
+
+
+def _canopy_features() -> pd.DataFrame:
+    try:
+        canopy = load_dataset(CANOPY_RESULTS_PATH)
+    except FileNotFoundError:
+        logger.warning(f"No canopy results at {CANOPY_RESULTS_PATH}; canopy features are left out.")
+        return pd.DataFrame(index=pd.Index([], name='Plot'))
+    return canopy.assign(Plot=canopy['plot_id'].astype(str)).groupby('Plot')[CANOPY_FEATURES].mean()
+
+
+def _carbon_features() -> pd.DataFrame:
+    carbon = f'Carbon_Stock_{ALLOMETRIC_MODELS_SELECTED[0]}_kg'
+    trees = load_dataset(ECO_RESULTS_PATH)
+    totals = trees.assign(Plot=trees['Plot'].astype(str)).groupby('Plot')[carbon].sum()
+    area = load_stand_tables()['plot']['area_ha'].reindex(totals.index)
+    return pd.DataFrame({'carbon_kg_per_ha': totals / area})
+
+
+FEATURE_BUILDERS = {
+    'species': _species_features,
+    'diversity': _diversity_features,
+    'structure': _structure_features,
+    'canopy': _canopy_features,
+    'carbon': _carbon_features,
+}
+
+
+def _check_features(features) -> tuple:
+    features = tuple(ORDINATION_FEATURES if features is None else features)
+    unknown = [group for group in features if group not in FEATURE_GROUPS]
+    if unknown or not features:
+        raise ValueError(f"Unknown feature groups {unknown}; expected some of {', '.join(FEATURE_GROUPS)}")
+    # Order-independent, so one selection has one cache entry
+    return tuple(group for group in FEATURE_GROUPS if group in features)
+
+
+def standardise(features: pd.DataFrame) -> pd.DataFrame:
+    """
+    Feature matrix ready for Euclidean methods: species columns (already Hellinger-transformed)
+    are kept, other columns are z-scored. Missing values get the column mean (0 after scaling)
+    and constant or empty columns are dropped.
+    """
+    species = features.columns.str.startswith('species:')
+    other = features.loc[:, ~species].astype(np.float64)
+    spread = other.std(ddof=0)
+    other = other.loc[:, spread > 0]
+    scaled = ((other - other.mean()) / spread[other.columns]).fillna(0.0)
+    return pd.concat([features.loc[:, species].fillna(0.0), scaled], axis=1)
+
+
+def plot_features(features=None) -> pd.DataFrame:
+    """Plot x feature table of the selected feature groups (all plots of any group), in their own units."""
+    features = _check_features(features)
+    frames = [FEATURE_BUILDERS[group]() for group in features]
+    table = pd.concat(frames, axis=1, join='outer').sort_index()
+    table.index.name = 'Plot'
+    return table
+
+
+def build_feature_matrix(features=None) -> pd.DataFrame:
+    """plot_features of the selected feature groups, standardised."""
+    return standardise(plot_features(features))
+
+
+# Results the features come from besides the cleaned data; cached features are rebuilt when they change
+SOURCE_PATHS = (ECO_RESULTS_PATH, CANOPY_RESULTS_PATH)
+
+
+def load_feature_matrix(features=None) -> pd.DataFrame:
+    """build_feature_matrix, cached per version of the cleaned data, ecological and canopy results."""
+    features = _check_features(features)
+    return load_derived(CLEANED_VEG_FULL_PATH, ('ordination_features', features),
+                        lambda df: build_feature_matrix(features), SOURCE_PATHS)
+
+
+def pca(matrix: np.ndarray, n_components: int = 2) -> dict:
+    """Principal components of the centred matrix by SVD: plot scores, loadings and explained variance ratios."""
+    if len(matrix) == 0:
+        return {'coordinates': np.zeros((0, n_components)), 'loadings': np.zeros((0, matrix.shape[1])), 'explained': []}
+    centred = matrix - matrix.mean(axis=0)
+    u, s, vt = np.linalg.svd(centred, full_matrices=False)
+    variance = s ** 2
+    total = variance.sum()
+    scores = np.zeros((len(matrix), n_components))
+    k = min(n_components, len(s))
+    scores[:, :k] = u[:, :k] * s[:k]
+    return {
+        'coordinates': scores,
+        'loadings': vt[:n_components],
+        'explained': (variance[:n_components] / total if total > 0 else np.zeros(k)).tolist(),
+    }
+
+
+def pcoa(distances: np.ndarray, n_components: int = 2) -> dict:
+    """
+    Principal coordinates (classical scaling) of a square dissimilarity matrix: the top
+    eigenvectors of the double-centred -D^2 / 2, scaled by the square root of their eigenvalues.
+    Only the requested eigenpairs are computed, and explained variance is relative to the trace.
+    Negative eigenvalues (from non-Euclidean dissimilarities) give zero coordinates.
+    """
+    n = len(distances)
+    coordinates = np.zeros((n, n_components))
+    if n == 0:
+        return {'coordinates': coordinates, 'explained': []}
+    squared = distances ** 2
+    centred = -0.5 * (squared - squared.mean(axis=0) - squared.mean(axis=1)[:, None] + squared.mean())
+    k = min(n_components, n)
+    values, vectors = eigh(centred, subset_by_index=[n - k, n - 1])
+    values, vectors = values[::-1], vectors[:, ::-1]
+    coordinates[:, :k] = vectors * np.sqrt(np.maximum(values, 0.0))
+    # The trace is the sum of all eigenvalues, which are all non-negative for Euclidean distances
+    total = np.trace(centred)
+    return {'coordinates': coordinates, 'explained': (np.maximum(values, 0.0) / total if total > 0 else np.zeros(k)).tolist()}
+
+
+def _selection(matrix: pd.DataFrame, plot_ids: list = None) -> pd.DataFrame:
+    if plot_ids is None:
+        return matrix
+    return matrix.loc[[plot_id for plot_id in (str(p) for p in plot_ids) if plot_id in matrix.index]]
+
+
+def _dissimilarity(features: tuple, metric: str, plot_ids: tuple) -> pd.DataFrame:
+    if metric == 'euclidean':
+        matrix = _selection(load_feature_matrix(features), plot_ids)
+        # squareform reads the empty condensed matrix of no plots as a single plot
+        distances = squareform(pdist(matrix.to_numpy())) if len(matrix) else np.zeros((0, 0))
+        return pd.DataFrame(distances, index=matrix.index, columns=matrix.index)
+    if features != ('species',):
+        raise ValueError(f"The {metric} dissimilarity only applies to the species feature group")
+    frame = load_beta_diversity(metric)
+    selected = _selection(frame, plot_ids).index
+    return frame.loc[selected, selected]
+
+
+def load_plot_ordination(features=None, metric: str = 'euclidean', ordination: str = 'pca',
+                         plot_ids: list = None) -> dict:
+    """
+    Dissimilarity matrix and 2-D ordination of the requested plots (all by default). The
+    all-plots result is cached per dataset versions, feature selection, metric and ordination;
+    subsets are computed from the cached feature and dissimilarity matrices on each request.
+    PCA works on the feature matrix and so needs the Euclidean metric; PCoA takes any metric.
+    """
+    features = _check_features(features)
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric '{metric}'; expected one of {', '.join(METRICS)}")
+    if ordination not in ORDINATIONS:
+        raise ValueError(f"Unknown ordination '{ordination}'; expected one of {', '.join(ORDINATIONS)}")
+    if ordination == 'pca' and metric != 'euclidean':
+        raise ValueError("PCA needs the euclidean metric; use pcoa for other dissimilarities")
+    plot_ids = None if plot_ids is None else tuple(sorted(str(plot_id) for plot_id in plot_ids))
+
+    def build(df=None):
+        distances = _dissimilarity(features, metric, plot_ids)
+        if ordination == 'pca':
+            result = pca(_selection(load_feature_matrix(features), plot_ids).to_numpy())
+        else:
+            result = pcoa(distances.to_numpy())
+        return {'distances': distances, **result}
+
+    if plot_ids is not None:
+        return build()
+    return load_derived(CLEANED_VEG_FULL_PATH, ('plot_ordination', features, metric, ordination), build, SOURCE_PATHS)
+
+
+def cluster_labels(ordination: dict, features: tuple, plot_ids: tuple, method: str, k: int,
+                   linkage_method: str, seed: int = None) -> np.ndarray:
+    """Cluster number (1..k) of every plot by hierarchical clustering of the dissimilarities or by k-means."""
+    distances = ordination['distances']
+    n = len(distances)
+    if n == 0:
+        return np.zeros(0, dtype=int)
+    k = min(k, n)
+    if method == 'hierarchical':
+        if n == 1:
+            return np.ones(1, dtype=int)
+        tree = linkage(squareform(distances.to_numpy(), checks=False), method=linkage_method)
+        return fcluster(tree, t=k, criterion='maxclust')
+    matrix = _selection(load_feature_matrix(features), plot_ids).to_numpy()
+    _, labels = kmeans2(matrix, k, minit='++', seed=seed)
+    return labels + 1
+
+
+def get_plot_clusters(features=None, method: str = 'hierarchical', k: int = CLUSTER_COUNT,
+                      linkage_method: str = CLUSTER_LINKAGE, metric: str = 'euclidean', ordination: str = 'pca',
+                      plot_ids: list = None, seed: int = None) -> dict:
+    """
+    API payload: cluster label and 2-D ordination coordinates of every requested plot, with the
+    variance explained by the two axes. Ward linkage and k-means work in feature space, so they
+    need the Euclidean metric.
+    """
+    features = _check_features(features)
+    if method not in CLUSTER_METHODS:
+        raise ValueError(f"Unknown clustering method '{method}'; expected one of {', '.join(CLUSTER_METHODS)}")
+    if method == 'hierarchical' and linkage_method not in LINKAGES:
+        raise ValueError(f"Unknown linkage '{linkage_method}'; expected one of {', '.join(LINKAGES)}")
+    if (method == 'kmeans' or linkage_method == 'ward') and metric != 'euclidean':
+        raise ValueError(f"{'k-means' if method == 'kmeans' else 'Ward linkage'} needs the euclidean metric")
+    if k < 1:
+        raise ValueError("The number of clusters must be at least 1")
+    result = load_plot_ordination(features, metric, ordination, plot_ids)
+    selected = None if plot_ids is None else tuple(sorted(str(plot_id) for plot_id in plot_ids))
+    labels = cluster_labels(result, features, selected, method, k, linkage_method, seed)
+    plots = result['distances'].index.tolist()
+    coordinates = result['coordinates']
+    return {
+        "features": list(features),
+        "metric": metric,
+        "method": method,
+        "ordination": ordination,
+        "explained_variance": [round(float(value), 6) for value in result['explained']],
+        "plots": [
+            {"plot_id": plot, "cluster": int(label), "x": round(float(x), 6), "y": round(float(y), 6)}
+            for plot, label, (x, y) in zip(plots, labels, coordinates)
+        ],
+    }
@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+from app.core.config import CLEANED_VEG_TREES_PATH, SIZE_CLASS_MAX_CLASSES
+from app.infrastructure.persistence.dataset_cache import load_derived
+
+# Height and DBH classes of the structural metrics (lower bound inclusive). The last class is
+# open-ended, so no tree falls outside the distribution however large it is.
+HEIGHT_BINS = [0, 2, 5, 10, 15, 20, 30, np.inf]
+HEIGHT_LABELS = ['0-2m', '2-5m', '5-10m', '10-15m', '15-20m', '20-30m', '>30m']
+DBH_BINS = [0, 10, 20, 30, 50, 80, 100, np.inf]
+DBH_LABELS = ['0-10cm', '10-20cm', '20-30cm', '30-50cm', '50-80cm', '80-100cm', '>100cm']
+
+# Variables with a size-class distribution: tree column, unit, default edges and labels
+SIZE_VARIABLES = {
+    'height': ('Height_m', 'm', HEIGHT_BINS, HEIGHT_LABELS),
+    'dbh': ('Effective_DBH_cm', 'cm', DBH_BINS, DBH_LABELS),
+}
+
+
+def class_edges(edges=None, width: float = None, maximum: float = 0.0) -> np.ndarray:
+    """
+    Class edges from explicit edges, or from a class width starting at 0 and covering maximum.
+    Either way the last class is made open-ended, and at most SIZE_CLASS_MAX_CLASSES classes
+    are allowed.
+    """
+    if edges is not None:
+        edges = np.asarray(edges, dtype=np.float64)
+        if edges.size and not (np.isfinite(edges[:-1]).all() and (np.isfinite(edges[-1]) or edges[-1] == np.inf)):
+            raise ValueError("Size class edges must be finite numbers (only the last may be inf)")
+        if edges.size < 1 or np.any(np.diff(edges) <= 0):
+            raise ValueError("Size class edges must be strictly increasing")
+        if edges.size > SIZE_CLASS_MAX_CLASSES:
+            raise ValueError(f"At most {SIZE_CLASS_MAX_CLASSES} size classes are allowed")
+    elif width is not None:
+        if not np.isfinite(width) or width <= 0:
+            raise ValueError("The size class width must be a positive number")
+        if np.floor(max(float(maximum), 0.0) / width) + 1 > SIZE_CLASS_MAX_CLASSES:
+            raise ValueError(f"A class width of {width:g} gives more than {SIZE_CLASS_MAX_CLASSES} size classes; use a larger width")
+        edges = np.arange(0.0, max(float(maximum), 0.0) + width, width)
+    else:
+        raise ValueError("Give either size class edges or a class width")
+    return edges if np.isinf(edges[-1]) else np.append(edges, np.inf)
+
+
+def class_labels(edges: np.ndarray, unit: str) -> list:
+    """'a-b<unit>' per closed class and '>a<unit>' for the open last class."""
+    return [f">{lower:g}{unit}" if np.isinf(upper) else f"{lower:g}-{upper:g}{unit}"
+            for lower, upper in zip(edges[:-1], edges[1:])]
+
+
+def class_counts(plot_codes: np.ndarray, n_plots: int, values, edges) -> np.ndarray:
+    """
+    (n_plots x n_classes) histogram of values, classes closed on the left like pd.cut(right=False),
+    as one bincount over plot code x class index. Missing values and values below the first
+    edge are left out.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    edges = np.asarray(edges, dtype=np.float64)
+    n_classes = len(edges) - 1
+    class_codes = np.searchsorted(edges, values, side='right') - 1
+    valid = (class_codes >= 0) & (class_codes < n_classes) & ~np.isnan(values) & (plot_codes >= 0)
+    flat = plot_codes[valid] * n_classes + class_codes[valid]
+    return np.bincount(flat, minlength=n_plots * n_classes).reshape(n_plots, n_classes)
+
+
+def size_class_table(df_trees: pd.DataFrame, variable: str, edges=None, width: float = None) -> pd.DataFrame:
+    """Counts of trees per plot (rows) and size class (columns) of 'height' or 'dbh', for all plots in one pass."""
+    if variable not in SIZE_VARIABLES:
+        raise ValueError(f"Unknown size variable '{variable}'; expected one of {', '.join(SIZE_VARIABLES)}")
+    column, unit, default_edges, default_labels = SIZE_VARIABLES[variable]
+    values = df_trees[column] if column in df_trees.columns else pd.Series(np.nan, index=df_trees.index)
+    if edges is None and width is None:
+        edges, labels = np.asarray(default_edges, dtype=np.float64), default_labels
+    else:
+        edges = class_edges(edges, width, np.nanmax(values) if values.notna().any() else 0.0)
+        labels = class_labels(edges, unit)
+    plot_codes, plot_ids = pd.factorize(df_trees['Plot'].astype(str), sort=True)
+    counts = class_counts(plot_codes, len(plot_ids), values, edges)
+    table = pd.DataFrame(counts, index=pd.Index(plot_ids, name='Plot'), columns=labels)
+    table.attrs['edges'] = edges.tolist()
+    return table
+
+
+def load_size_class_table(variable: str, edges=None, width: float = None, path=CLEANED_VEG_TREES_PATH) -> pd.DataFrame:
+    """size_class_table of the cleaned trees, cached per dataset version and class specification."""
+    edges = None if edges is None else tuple(float(edge) for edge in edges)
+    key = ('size_classes', variable, edges, width)
+    return load_derived(path, key, lambda df: size_class_table(df, variable, edges, width))
+
+
+def get_size_classes(variable: str = 'dbh', edges=None, width: float = None, plot_ids: list = None) -> dict:
+    """
+    API payload: the class edges and labels, and each requested plot's distribution (all plots
+    by default) as [{"range", "count"}]. Plots without trees get an empty distribution.
+    """
+    table = load_size_class_table(variable, edges, width)
+    plot_ids = table.index.tolist() if plot_ids is None else [str(plot_id) for plot_id in plot_ids]
+    distributions = {}
+    for plot_id in plot_ids:
+        if plot_id in table.index:
+            distributions[plot_id] = [{"range": label, "count": int(count)}
+                                      for label, count in zip(table.columns, table.loc[plot_id])]
+        else:
+            distributions[plot_id] = []
+    return {
+        "variable": variable,
+        "edges": [edge if np.isfinite(edge) else None for edge in table.attrs['edges']],
+        "labels": table.columns.tolist(),
+        "distributions": distributions,
+    }
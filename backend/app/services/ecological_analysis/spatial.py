@@ -0,0 +1,247 @@
+import logging
+import re
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+from app.core.config import (
+    ECO_RESULTS_PATH, STEM_X_COLUMN, STEM_Y_COLUMN, STEM_POSITION_SEED, HEGYI_RADIUS_M, RIPLEY_RADII_M,
+)
+from app.domain.entities import PlotConfiguration
+from app.infrastructure.persistence.dataset_cache import load_derived
+from app.services.ecological_analysis.stand_structure import DEFAULT_PLOT_CONFIGURATION, UNIT_METRES
+
+logger = logging.getLogger(__name__)
+
+POSITION_SOURCES = ['measured', 'derived']
+# Standard error constant of the Clark-Evans mean nearest-neighbour distance under randomness
+CLARK_EVANS_SE = 0.26136
+
+
+def _metres(configuration: PlotConfiguration) -> float:
+    unit = configuration.dimensions.unit
+    if unit not in UNIT_METRES:
+        raise ValueError(f"Unknown plot dimension unit '{unit}'; expected one of {', '.join(UNIT_METRES)}")
+    return UNIT_METRES[unit]
+
+
+def plot_extent(configuration: PlotConfiguration = DEFAULT_PLOT_CONFIGURATION) -> tuple:
+    """(width, height) of the plot in metres."""
+    metres = _metres(configuration)
+    return configuration.dimensions.width * metres, configuration.dimensions.height * metres
+
+
+def quadrant_bounds(configuration: PlotConfiguration, quadrant: str) -> tuple:
+    """
+    (x, y, width, height) in metres of a quadrant, from the plot's south-west corner. A quadrant
+    defined in the configuration's subdivisions uses its position and dimensions. Otherwise
+    Q<n> is the n-th cell of the grid, numbered down the first column from the north-west
+    corner, then up the next and so on (Q1 NW, Q2 SW, Q3 SE, Q4 NE on a 2 x 2 grid). An
+    unknown quadrant spans the whole plot.
+    """
+    for subdivision in configuration.subdivisions:
+        if subdivision.type == 'quadrant' and subdivision.id == quadrant:
+            metres = UNIT_METRES.get(subdivision.dimensions.unit, 1.0)
+            return (subdivision.position_x * _metres(configuration), subdivision.position_y * _metres(configuration),
+                    subdivision.dimensions.width * metres, subdivision.dimensions.height * metres)
+    width, height = plot_extent(configuration)
+    rows, cols = configuration.grid.rows, configuration.grid.cols
+    number = re.search(r'(\d+)$', str(quadrant))
+    if number is None or not 1 <= int(number.group(1)) <= rows * cols:
+        return 0.0, 0.0, width, height
+    col, row = divmod(int(number.group(1)) - 1, rows)
+    row_from_top = row if col % 2 == 0 else rows - 1 - row
+    cell_width, cell_height = width / cols, height / rows
+    return col * cell_width, height - (row_from_top + 1) * cell_height, cell_width, cell_height
+
+
+def stem_positions(df: pd.DataFrame, configurations: dict = None, seed: int = STEM_POSITION_SEED,
+                   margin: float = 0.0) -> pd.DataFrame:
+    """
+    X_m, Y_m and Position_Source of every stem. Stems with both coordinate columns
+    (STEM_X_COLUMN, STEM_Y_COLUMN) filled are 'measured'; the others are 'derived': drawn
+    uniformly inside their quadrant (less margin on every side), from one seeded stream in row
+    order. configurations maps plot ID -> PlotConfiguration (DEFAULT_PLOT_CONFIGURATION otherwise).
+    """
+    configurations = configurations or {}
+    n = len(df)
+    x = pd.to_numeric(df[STEM_X_COLUMN], errors='coerce').to_numpy(dtype=np.float64, copy=True) \
+        if STEM_X_COLUMN in df.columns else np.full(n, np.nan)
+    y = pd.to_numeric(df[STEM_Y_COLUMN], errors='coerce').to_numpy(dtype=np.float64, copy=True) \
+        if STEM_Y_COLUMN in df.columns else np.full(n, np.nan)
+    derived = np.isnan(x) | np.isnan(y)
+
+    if derived.any():
+        cells = df.loc[derived].reindex(columns=['Plot', 'Quadrant']).astype(str)
+        codes, uniques = pd.MultiIndex.from_frame(cells).factorize()
+        bounds = np.array([quadrant_bounds(configurations.get(plot, DEFAULT_PLOT_CONFIGURATION), quadrant)
+                           for plot, quadrant in uniques], dtype=np.float64).reshape(-1, 4)[codes]
+        inner = np.maximum(bounds[:, 2:] - 2 * margin, 0.0)
+        offsets = np.random.default_rng(seed).uniform(size=(len(codes), 2))
+        x[derived] = bounds[:, 0] + (bounds[:, 2] - inner[:, 0]) / 2 + offsets[:, 0] * inner[:, 0]
+        y[derived] = bounds[:, 1] + (bounds[:, 3] - inner[:, 1]) / 2 + offsets[:, 1] * inner[:, 1]
+
+    return pd.DataFrame({
+        'X_m': x,
+        'Y_m': y,
+        'Position_Source': pd.Categorical.from_codes(derived.astype(np.int8), categories=POSITION_SOURCES),
+    }, index=df.index)
+
+
+def nearest_neighbour_distances(tree: cKDTree) -> np.ndarray:
+    """Distance from every point of the tree to its nearest other point (NaN for a single point)."""
+    if tree.n < 2:
+        return np.full(tree.n, np.nan)
+    distances, _ = tree.query(tree.data, k=2)
+    return distances[:, 1]
+
+
+def clark_evans(nn_distances: np.ndarray, area: float) -> dict:
+    """
+    Clark-Evans aggregation index R = mean nearest-neighbour distance / its expectation under
+    complete spatial randomness, 0.5 / sqrt(n / area), with the z score of the difference.
+    R < 1 indicates clustering and R > 1 regularity. No edge correction is applied.
+    """
+    n = len(nn_distances)
+    if n < 2:
+        return {'stems': n, 'mean_nn_distance_m': np.nan, 'expected_nn_distance_m': np.nan,
+                'clark_evans_r': np.nan, 'clark_evans_z': np.nan}
+    observed = float(np.mean(nn_distances))
+    expected = 0.5 / np.sqrt(n / area)
+    return {
+        'stems': n,
+        'mean_nn_distance_m': observed,
+        'expected_nn_distance_m': expected,
+        'clark_evans_r': observed / expected,
+        'clark_evans_z': (observed - expected) / (CLARK_EVANS_SE / np.sqrt(n * n / area)),
+    }
+
+
+def ripley_k(tree: cKDTree, width: float, height: float, radii) -> pd.DataFrame:
+    """
+    Ripley's K(r) and L(r) = sqrt(K / pi) of the points in a width x height rectangle, with
+    translation edge correction: each pair at offset (dx, dy) is weighted by the plot area over
+    (width - |dx|)(height - |dy|). Only pairs within the largest radius are visited, through
+    the tree, and K is read off their cumulative weights at every radius.
+    """
+    radii = np.asarray(radii, dtype=np.float64)
+    n, area = tree.n, width * height
+    if n < 2 or radii.size == 0:
+        k = np.full(radii.size, np.nan)
+    else:
+        pairs = tree.query_pairs(float(radii.max()), output_type='ndarray')
+        offsets = np.abs(tree.data[pairs[:, 0]] - tree.data[pairs[:, 1]])
+        distances = np.hypot(offsets[:, 0], offsets[:, 1])
+        weights = area / ((width - offsets[:, 0]) * (height - offsets[:, 1]))
+        order = np.argsort(distances, kind='stable')
+        cumulative = np.concatenate([[0.0], np.cumsum(weights[order])])
+        within = np.searchsorted(distances[order], radii, side='right')
+        # Every unordered pair stands for the ordered pairs (i, j) and (j, i)
+        k = 2 * area * cumulative[within] / (n * (n - 1))
+    l = np.sqrt(k / np.pi)
+    return pd.DataFrame({'radius_m': radii, 'ripley_k': k, 'ripley_l': l, 'ripley_l_minus_r': l - radii})
+
+
+def hegyi_index(tree: cKDTree, dbh, radius: float) -> np.ndarray:
+    """
+    Hegyi competition index of every stem: sum over neighbours j within radius of
+    (DBH_j / DBH_i) / distance_ij, from one radius query over the tree. Coincident stems are
+    left out; stems without a positive DBH get NaN.
+    """
+    dbh = np.asarray(dbh, dtype=np.float64)
+    pairs = tree.query_pairs(radius, output_type='ndarray')
+    i, j = pairs[:, 0], pairs[:, 1]
+    distances = np.hypot(*(tree.data[i] - tree.data[j]).T)
+    valid = (distances > 0) & (dbh[i] > 0) & (dbh[j] > 0)
+    i, j, distances = i[valid], j[valid], distances[valid]
+    index = (np.bincount(i, weights=dbh[j] / dbh[i] / distances, minlength=tree.n)
+             + np.bincount(j, weights=dbh[i] / dbh[j] / distances, minlength=tree.n))
+    return np.where(dbh > 0, index, np.nan)
+
+
+def spatial_tables(df_trees: pd.DataFrame, configurations: dict = None, include_derived: bool = False,
+                   hegyi_radius: float = HEGYI_RADIUS_M, radii=RIPLEY_RADII_M, seed: int = STEM_POSITION_SEED) -> dict:
+    """
+    Stem map statistics of every plot from one KD-tree per plot: per-stem position,
+    nearest-neighbour distance and Hegyi index ('stems'), the Clark-Evans index per plot
+    ('plots') and Ripley's K/L per plot and radius ('ripley').
+
+    Only stems with measured coordinates inside the plot enter the statistics, unless
+    include_derived also admits the positions drawn inside their quadrant (which are random,
+    so their pattern statistics only describe the drawing).
+    """
+    configurations = configurations or {}
+    positions = stem_positions(df_trees, configurations, seed)
+    stems = df_trees.reindex(columns=['Plot', 'Quadrant', 'ID', 'Species']).astype(object).join(positions)
+    stems['Effective_DBH_cm'] = df_trees['Effective_DBH_cm'].to_numpy(dtype=np.float64) \
+        if 'Effective_DBH_cm' in df_trees.columns else np.nan
+    stems['nn_distance_m'] = np.nan
+    stems['hegyi_index'] = np.nan
+
+    plot_rows, ripley_tables = [], []
+    usable = positions['Position_Source'].eq('measured') | include_derived
+    plots = stems['Plot'].astype(str)
+    for plot in sorted(plots.unique()):
+        width, height = plot_extent(configurations.get(plot, DEFAULT_PLOT_CONFIGURATION))
+        in_plot = plots.eq(plot)
+        inside = stems['X_m'].between(0, width) & stems['Y_m'].between(0, height)
+        if (in_plot & usable & ~inside).any():
+            logger.warning(f"{int((in_plot & usable & ~inside).sum())} stems of plot {plot} lie outside it and are left out.")
+        rows = np.flatnonzero(in_plot & usable & inside)
+        tree = cKDTree(stems[['X_m', 'Y_m']].to_numpy()[rows])
+        nn = nearest_neighbour_distances(tree)
+        stems.iloc[rows, stems.columns.get_loc('nn_distance_m')] = nn
+        if len(rows):
+            stems.iloc[rows, stems.columns.get_loc('hegyi_index')] = hegyi_index(
+                tree, stems['Effective_DBH_cm'].to_numpy()[rows], hegyi_radius)
+        plot_rows.append({'Plot': plot, 'area_m2': width * height, **clark_evans(nn, width * height)})
+        ripley_tables.append(ripley_k(tree, width, height, radii).assign(Plot=plot))
+
+    ripley_columns = ['Plot', 'radius_m', 'ripley_k', 'ripley_l', 'ripley_l_minus_r']
+    ripley = pd.concat(ripley_tables, ignore_index=True) if ripley_tables else pd.DataFrame(columns=ripley_columns)
+    return {
+        'stems': stems,
+        'plots': pd.DataFrame(plot_rows, columns=None if plot_rows else ['Plot']).set_index('Plot'),
+        'ripley': ripley[ripley_columns].set_index(['Plot', 'radius_m']),
+    }
+
+
+def load_spatial_tables(include_derived: bool = False, hegyi_radius: float = HEGYI_RADIUS_M, radii=None,
+                        path=ECO_RESULTS_PATH) -> dict:
+    """spatial_tables of the ecological results, computed once per dataset version and parameters."""
+    radii = tuple(float(radius) for radius in (RIPLEY_RADII_M if radii is None else radii))
+    key = ('spatial', include_derived, float(hegyi_radius), radii)
+    return load_derived(path, key, lambda df: spatial_tables(df, None, include_derived, hegyi_radius, radii))
+
+
+def _select_plots(table: pd.DataFrame, plot_ids: list = None) -> pd.DataFrame:
+    if plot_ids is None:
+        return table
+    plots = table.index.get_level_values('Plot') if 'Plot' in table.index.names else table['Plot']
+    return table[plots.astype(str).isin([str(plot_id) for plot_id in plot_ids])]
+
+
+def get_stem_neighbourhoods(plot_ids: list = None, include_derived: bool = False,
+                            hegyi_radius: float = HEGYI_RADIUS_M) -> pd.DataFrame:
+    """Position, nearest-neighbour distance and Hegyi competition index of every stem of the requested plots."""
+    if hegyi_radius <= 0:
+        raise ValueError("The competition radius must be positive")
+    return _select_plots(load_spatial_tables(include_derived, hegyi_radius)['stems'], plot_ids)
+
+
+def get_spatial_pattern(plot_ids: list = None, include_derived: bool = False, radii=None) -> dict:
+    """API payload: per plot, the Clark-Evans index and the Ripley's K/L curve."""
+    if radii is not None and (len(radii) == 0 or min(radii) <= 0):
+        raise ValueError("Ripley radii must be positive")
+    tables = load_spatial_tables(include_derived, radii=radii)
+    plots = _select_plots(tables['plots'], plot_ids)
+    ripley = tables['ripley']
+    result = {}
+    for plot, row in plots.iterrows():
+        curve = ripley.loc[plot].reset_index()
+        result[plot] = {
+            **{key: (None if pd.isna(value) else float(value)) for key, value in row.items()},
+            'stems': int(row['stems']),
+            'ripley': [{key: (None if pd.isna(value) else round(float(value), 6)) for key, value in point.items()}
+                       for point in curve.to_dict(orient='records')],
+        }
+    return result
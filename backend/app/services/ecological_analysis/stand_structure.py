@@ -0,0 +1,178 @@
+import numpy as np
+import pandas as pd
+from app.core.config import CLEANED_VEG_FULL_PATH, ECO_RESULTS_PATH, PLOT_DIMENSIONS, QUADRANT_GRID, FORM_FACTOR, TAPER_EXPONENT
+from app.domain.entities import PlotConfiguration, PlotDimensions, GridConfiguration
+from app.infrastructure.persistence.dataset_cache import load_dataset, load_derived
+from app.services.data_processing.species_normalizer import normalize_species
+
+DEFAULT_PLOT_CONFIGURATION = PlotConfiguration(
+    dimensions=PlotDimensions(**PLOT_DIMENSIONS),
+    grid=GridConfiguration(**QUADRANT_GRID),
+)
+
+# Length units accepted in plot dimensions, in metres
+UNIT_METRES = {'m': 1.0, 'cm': 0.01, 'ft': 0.3048}
+BREAST_HEIGHT_M = 1.3
+SQUARE_METRES_PER_HA = 10000.0
+
+# Per-tree columns summed by the grouped stand computation
+STAND_MEASURES = {
+    'stems': None,
+    'basal_area_m2': 'Basal_Area_m2',
+    'volume_ff_m3': 'Volume_FF_m3',
+    'volume_taper_m3': 'Volume_Taper_m3',
+}
+
+
+def basal_area(dbh) -> np.ndarray:
+    """Basal area (m2) from DBH (cm): pi/4 * (DBH in m)^2."""
+    return np.square(np.asarray(dbh, dtype=np.float64)) * (np.pi / 40000)
+
+
+def form_factor_volume(basal_area_m2, height, form_factor: float = FORM_FACTOR) -> np.ndarray:
+    """Stem volume (m3) as basal area x height x a breast-height form factor."""
+    return np.asarray(basal_area_m2, dtype=np.float64) * np.asarray(height, dtype=np.float64) * form_factor
+
+
+def taper_volume(basal_area_m2, height, exponent: float = TAPER_EXPONENT) -> np.ndarray:
+    """
+    Stem volume (m3) integrated along a taper profile: a cylinder of the breast-height section
+    up to 1.3 m, then d(h) = D ((H - h) / (H - 1.3))^p up to the top, whose cross-section
+    integrates to basal area x (H - 1.3) / (2p + 1). Stems shorter than 1.3 m are cylinders.
+    """
+    basal_area_m2 = np.asarray(basal_area_m2, dtype=np.float64)
+    height = np.asarray(height, dtype=np.float64)
+    above = np.maximum(height - BREAST_HEIGHT_M, 0.0)
+    return basal_area_m2 * (np.minimum(height, BREAST_HEIGHT_M) + above / (2 * exponent + 1))
+
+
+def volume_columns(df_trees: pd.DataFrame) -> pd.DataFrame:
+    """Basal_Area_m2 (kept if already derived from the stems), Volume_FF_m3 and Volume_Taper_m3 of every tree."""
+    ba = df_trees['Basal_Area_m2'].to_numpy(dtype=np.float64) if 'Basal_Area_m2' in df_trees.columns \
+        else basal_area(df_trees['Effective_DBH_cm'])
+    height = df_trees['Height_m'].to_numpy(dtype=np.float64)
+    return pd.DataFrame({
+        'Basal_Area_m2': ba,
+        'Volume_FF_m3': form_factor_volume(ba, height),
+        'Volume_Taper_m3': taper_volume(ba, height),
+    }, index=df_trees.index)
+
+
+def _area_ha(dimensions: PlotDimensions) -> float:
+    if dimensions.unit not in UNIT_METRES:
+        raise ValueError(f"Unknown plot dimension unit '{dimensions.unit}'; expected one of {', '.join(UNIT_METRES)}")
+    metres = UNIT_METRES[dimensions.unit]
+    return dimensions.width * metres * dimensions.height * metres / SQUARE_METRES_PER_HA
+
+
+def plot_area_ha(configuration: PlotConfiguration) -> float:
+    return _area_ha(configuration.dimensions)
+
+
+def quadrant_area_ha(configuration: PlotConfiguration, quadrant: str) -> float:
+    """A quadrant's own dimensions if the configuration defines it, else an equal share of the plot grid."""
+    for subdivision in configuration.subdivisions:
+        if subdivision.type == 'quadrant' and subdivision.id == quadrant:
+            return _area_ha(subdivision.dimensions)
+    return plot_area_ha(configuration) / (configuration.grid.rows * configuration.grid.cols)
+
+
+def stand_tables(df_trees: pd.DataFrame, configurations: dict = None, sampled: pd.MultiIndex = None) -> dict:
+    """
+    Stand structure of every quadrant and plot and the Importance Value Index of every species
+    in every plot, from one groupby of the trees by (Plot, Quadrant, Species).
+
+    Stems, basal area and volumes are summed per quadrant and per plot from that table and
+    scaled per hectare by the area of each unit, taken from the plot's configuration in
+    `configurations` (plot ID -> PlotConfiguration) or DEFAULT_PLOT_CONFIGURATION.
+    IVI = relative density (stems) + relative frequency (quadrants holding the species) +
+    relative dominance (basal area), each in percent of the plot total, so it sums to 300.
+    `sampled` lists every surveyed (Plot, Quadrant); those without trees, and plots without
+    any, get rows of zero stems, basal area and volume.
+    """
+    configurations = configurations or {}
+    if not {column for column in STAND_MEASURES.values() if column} <= set(df_trees.columns):
+        # Results written before the volume columns were added
+        df_trees = df_trees.assign(**volume_columns(df_trees))
+    facts = df_trees.reindex(columns=['Plot', 'Quadrant']).astype(str)
+    facts['Species'] = normalize_species(df_trees['Species'].astype(object))
+    for measure, column in STAND_MEASURES.items():
+        facts[measure] = 1 if column is None else df_trees[column].to_numpy(dtype=np.float64)
+    measures = list(STAND_MEASURES)
+    cells = facts.groupby(['Plot', 'Quadrant', 'Species'], observed=True)[measures].sum()
+
+    def per_ha(table: pd.DataFrame, areas: np.ndarray) -> pd.DataFrame:
+        table = table.copy()
+        table['area_ha'] = areas
+        table['stems_per_ha'] = table['stems'] / areas
+        for measure in measures[1:]:
+            table[f'{measure}_per_ha'] = table[measure] / areas
+        return table
+
+    def configuration(plot: str) -> PlotConfiguration:
+        return configurations.get(plot, DEFAULT_PLOT_CONFIGURATION)
+
+    quadrants = cells.groupby(level=['Plot', 'Quadrant']).sum()
+    plots = cells.groupby(level='Plot').sum()
+    if sampled is not None:
+        quadrants = quadrants.reindex(quadrants.index.union(sampled), fill_value=0)
+        plots = plots.reindex(plots.index.union(sampled.unique(level='Plot')), fill_value=0)
+    quadrant_areas = np.array([quadrant_area_ha(configuration(plot), quadrant) for plot, quadrant in quadrants.index])
+    plot_areas = np.array([plot_area_ha(configuration(plot)) for plot in plots.index])
+
+    species = cells.groupby(level=['Plot', 'Species']).agg(
+        stems=('stems', 'sum'), basal_area_m2=('basal_area_m2', 'sum'), quadrants=('stems', 'size'),
+    )
+    plot_totals = species.groupby(level='Plot').transform('sum')
+    importance = species.copy()
+    importance['relative_density'] = species['stems'] / plot_totals['stems'] * 100
+    importance['relative_frequency'] = species['quadrants'] / plot_totals['quadrants'] * 100
+    importance['relative_dominance'] = species['basal_area_m2'] / plot_totals['basal_area_m2'] * 100
+    importance['ivi'] = importance[['relative_density', 'relative_frequency', 'relative_dominance']].sum(axis=1)
+    importance = importance.sort_values(['Plot', 'ivi'], ascending=[True, False], kind='stable')
+
+    return {
+        'quadrant': per_ha(quadrants, quadrant_areas),
+        'plot': per_ha(plots, plot_areas),
+        'importance': importance,
+    }
+
+
+def sampled_quadrants(path=CLEANED_VEG_FULL_PATH) -> pd.MultiIndex:
+    """Every (Plot, Quadrant) with at least one record in the cleaned survey data, trees or not."""
+    df = load_dataset(path)
+    pairs = df[['Plot', 'Quadrant']].dropna().astype(str).drop_duplicates()
+    return pd.MultiIndex.from_frame(pairs).sort_values()
+
+
+def load_stand_tables(path=ECO_RESULTS_PATH) -> dict:
+    """
+    Stand tables of the ecological results (default plot configuration) over every sampled
+    quadrant of the cleaned data, computed once per version of both datasets.
+    """
+    def build(df):
+        try:
+            sampled = sampled_quadrants()
+        except FileNotFoundError:
+            sampled = None
+        return stand_tables(df, sampled=sampled)
+
+    return load_derived(path, ('stand_tables',), build, (CLEANED_VEG_FULL_PATH,))
+
+
+def _select_plots(table: pd.DataFrame, plot_ids: list = None) -> pd.DataFrame:
+    if plot_ids is None:
+        return table
+    return table[table.index.get_level_values('Plot').isin([str(plot_id) for plot_id in plot_ids])]
+
+
+def get_stand_structure(level: str = 'plot', plot_ids: list = None) -> pd.DataFrame:
+    """Stems, basal area and volumes (totals and per hectare) per 'plot' or 'quadrant' of the requested plots."""
+    if level not in ('plot', 'quadrant'):
+        raise ValueError(f"Unknown level '{level}'; expected plot or quadrant")
+    return _select_plots(load_stand_tables()[level], plot_ids)
+
+
+def get_importance_values(plot_ids: list = None) -> pd.DataFrame:
+    """Importance Value Index of every species of the requested plots, highest first within each plot."""
+    return _select_plots(load_stand_tables()['importance'], plot_ids)
@@ -0,0 +1,235 @@
+import re
+import numpy as np
+import pandas as pd
+from scipy import sparse, stats
+from app.core.config import (
+    CLEANED_VEG_FULL_PATH, ECO_RESULTS_PATH, CANOPY_RESULTS_PATH, ALLOMETRIC_MODELS_SELECTED, CORRELATION_FEATURES,
+)
+from app.infrastructure.persistence.dataset_cache import load_derived
+from app.services.ecological_analysis.ordination import CANOPY_FEATURES, SOURCE_PATHS, plot_features
+from app.services.ecological_analysis.stand_structure import load_stand_tables
+
+TESTS = ('anova', 'kruskal')
+CORRELATION_METHODS = ('pearson', 'spearman')
+
+
+def _quadrant_observations(df_trees: pd.DataFrame) -> pd.DataFrame:
+    """Per-hectare stand structure, carbon and CO2 of every sampled quadrant, zero where it holds no trees."""
+    model = ALLOMETRIC_MODELS_SELECTED[0]
+    quadrants = load_stand_tables()['quadrant']
+    keys = df_trees[['Plot', 'Quadrant']].astype(str)
+    sums = df_trees[[f'Carbon_Stock_{model}_kg', f'CO2_Eq_{model}_kg']].set_axis(['carbon', 'co2'], axis=1)
+    sums = sums.join(keys).groupby(['Plot', 'Quadrant']).sum().reindex(quadrants.index, fill_value=0)
+    table = quadrants[['stems_per_ha', 'basal_area_m2_per_ha', 'volume_ff_m3_per_ha', 'volume_taper_m3_per_ha']].copy()
+    table['carbon_kg_per_ha'] = sums['carbon'] / quadrants['area_ha']
+    table['co2_kg_per_ha'] = sums['co2'] / quadrants['area_ha']
+    return table.reset_index()
+
+
+def _canopy_observations(df_canopy: pd.DataFrame) -> pd.DataFrame:
+    """Canopy image results with Plot and the Quadrant read from the image name (quadrantN -> QN, else Centre)."""
+    quadrants = [f"Q{match.group(1)}" if match else 'Centre'
+                 for match in (re.search(r'quadrant\s*(\d+)', str(name), re.IGNORECASE) for name in df_canopy['filename'])]
+    return pd.DataFrame({'Plot': df_canopy['plot_id'].astype(str).to_numpy(), 'Quadrant': quadrants,
+                         **{column: df_canopy[column].to_numpy(dtype=np.float64) for column in CANOPY_FEATURES}})
+
+
+# Observation tables a test can run on: dataset, builder, grouping factors and default variables
+SOURCES = {
+    'trees': (ECO_RESULTS_PATH, lambda df: df, ('Plot', 'Quadrant', 'Species'),
+              ['Effective_DBH_cm', 'Height_m', 'Basal_Area_m2', f'CO2_Eq_{ALLOMETRIC_MODELS_SELECTED[0]}_kg']),
+    'quadrants': (ECO_RESULTS_PATH, _quadrant_observations, ('Plot', 'Quadrant'),
+                  ['stems_per_ha', 'basal_area_m2_per_ha', 'carbon_kg_per_ha', 'co2_kg_per_ha']),
+    'canopy': (CANOPY_RESULTS_PATH, _canopy_observations, ('Plot', 'Quadrant'), CANOPY_FEATURES),
+}
+# Further files a source's observations are built from (the sampled quadrants of the cleaned data)
+SOURCE_DEPENDS = {'quadrants': (CLEANED_VEG_FULL_PATH,)}
+
+
+def group_tests(values: np.ndarray, groups, tests=TESTS) -> dict:
+    """
+    One-way ANOVA and Kruskal-Wallis of every column of values (observations x variables)
+    across groups, from per-group sums in one pass: a sparse group indicator times the values,
+    their squares and their ranks gives every group's n, sum, sum of squares and rank sum for
+    all variables at once. Missing values are left out of each variable's test; a variable
+    with data in fewer than two groups gets NaN statistics and degrees of freedom.
+
+    Returns {'groups': labels, 'n', 'mean', 'sd' (groups x variables), 'anova': {...},
+    'kruskal': {...}}, each test a dict of per-variable arrays.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim == 1:
+        values = values[:, None]
+    codes, labels = pd.factorize(pd.Series(groups).astype(str), sort=True)
+    n_groups, n_obs = len(labels), len(codes)
+    indicator = sparse.csr_matrix((np.ones(n_obs), (codes, np.arange(n_obs))), shape=(n_groups, n_obs))
+
+    valid = ~np.isnan(values)
+    # Centring on the variable mean keeps the sums of squares accurate for large values
+    centre = np.where(valid, values, 0.0).sum(axis=0) / np.maximum(valid.sum(axis=0), 1)
+    centred = np.where(valid, values - centre, 0.0)
+    n = indicator @ valid.astype(np.float64)
+    sums = indicator @ centred
+    squares = indicator @ (centred ** 2)
+    total_n = n.sum(axis=0)
+    k = (n > 0).sum(axis=0)
+    df_groups = np.where(k >= 2, k - 1, np.nan)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        group_means = sums / n
+        between = np.nansum(sums ** 2 / np.where(n > 0, n, np.nan), axis=0) - sums.sum(axis=0) ** 2 / total_n
+        total = squares.sum(axis=0) - sums.sum(axis=0) ** 2 / total_n
+        within = total - between
+        result = {
+            'groups': labels.tolist(),
+            'n': n.astype(int),
+            'mean': group_means + centre,
+            'sd': np.sqrt(np.maximum(squares - sums ** 2 / n, 0.0) / (n - 1)),
+        }
+
+        if 'anova' in tests:
+            df_between, df_within = df_groups, np.where(k >= 2, total_n - k, np.nan)
+            f = (between / df_between) / (within / df_within)
+            result['anova'] = {
+                'f': f, 'p': stats.f.sf(f, df_between, df_within),
+                'df_between': df_between, 'df_within': df_within, 'eta_squared': np.where(k >= 2, between / total, np.nan),
+            }
+        if 'kruskal' in tests:
+            ranks = np.nan_to_num(stats.rankdata(values, axis=0, nan_policy='omit'))
+            rank_sums = indicator @ ranks
+            h = 12 / (total_n * (total_n + 1)) * np.nansum(rank_sums ** 2 / np.where(n > 0, n, np.nan), axis=0) \
+                - 3 * (total_n + 1)
+            # Tie correction 1 - sum(t^3 - t) / (N^3 - N) per variable
+            ties = np.array([np.sum(counts ** 3 - counts) for counts in
+                             (np.unique(column[~np.isnan(column)], return_counts=True)[1].astype(np.float64)
+                              for column in values.T)])
+            h = h / (1 - ties / (total_n ** 3 - total_n))
+            h = np.where(k >= 2, h, np.nan)
+            result['kruskal'] = {'h': h, 'p': stats.chi2.sf(h, df_groups), 'df': df_groups}
+    return result
+
+
+def _finite(value):
+    value = float(value)
+    return value if np.isfinite(value) else None
+
+
+def _check_source(source: str, by: str):
+    if source not in SOURCES:
+        raise ValueError(f"Unknown source '{source}'; expected one of {', '.join(SOURCES)}")
+    if by not in SOURCES[source][2]:
+        raise ValueError(f"Cannot group {source} by '{by}'; expected one of {', '.join(SOURCES[source][2])}")
+
+
+def load_observations(source: str) -> pd.DataFrame:
+    """Observation table of a source, built once per version of its dataset."""
+    path, builder, _, _ = SOURCES[source]
+    return load_derived(path, ('statistics_observations', source), builder, SOURCE_DEPENDS.get(source, ()))
+
+
+def compare_groups(source: str = 'quadrants', by: str = 'Plot', variables: list = None, tests=TESTS,
+                   plot_ids: list = None) -> dict:
+    """
+    API payload: for every variable, the ANOVA and/or Kruskal-Wallis test of its differences
+    across the groups of `by` and each group's n, mean and SD, among observations of the
+    requested plots (all by default). All-plots results are cached per dataset version and
+    query; plot subsets are tested from the cached observation table on each request.
+    """
+    _check_source(source, by)
+    tests = tuple(test for test in TESTS if test in tests)
+    if not tests:
+        raise ValueError(f"Expected at least one test of {', '.join(TESTS)}")
+    path = SOURCES[source][0]
+    plot_ids = None if plot_ids is None else tuple(sorted(str(plot_id) for plot_id in plot_ids))
+    variables = None if variables is None else tuple(variables)
+
+    def build(df=None):
+        observations = load_observations(source)
+        selected = list(variables) if variables is not None else \
+            [column for column in SOURCES[source][3] if column in observations.columns]
+        missing = [column for column in selected if column not in observations.columns]
+        if missing:
+            raise ValueError(f"Unknown variables for {source}: {', '.join(missing)}")
+        if plot_ids is not None:
+            observations = observations[observations['Plot'].astype(str).isin(plot_ids)]
+        values = observations[selected].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64)
+        result = group_tests(values, observations[by], tests)
+        report = []
+        for j, variable in enumerate(selected):
+            entry = {"variable": variable, "n": int(result['n'][:, j].sum())}
+            if 'anova' in result:
+                entry['anova'] = {key: _finite(values_[j]) for key, values_ in result['anova'].items()}
+            if 'kruskal' in result:
+                entry['kruskal'] = {key: _finite(values_[j]) for key, values_ in result['kruskal'].items()}
+            entry['groups'] = [
+                {"group": group, "n": int(result['n'][i, j]), "mean": _finite(result['mean'][i, j]),
+                 "sd": _finite(result['sd'][i, j])}
+                for i, group in enumerate(result['groups']) if result['n'][i, j] > 0
+            ]
+            report.append(entry)
+        return {"source": source, "by": by, "tests": list(tests), "variables": report}
+
+    if plot_ids is not None:
+        return build()
+    return load_derived(path, ('statistics_groups', source, by, variables, tests), build,
+                        SOURCE_DEPENDS.get(source, ()))
+
+
+def correlation_matrix(table: pd.DataFrame, method: str = 'pearson') -> dict:
+    """
+    Pairwise Pearson or Spearman correlations between the columns of a table (each pair over
+    the rows where both are present), with the number of complete pairs and two-sided p-values
+    from t = r sqrt((n-2)/(1-r^2)). Pairs with fewer than three complete rows get NaN for r
+    and p, since two points always lie on a line.
+    """
+    if method not in CORRELATION_METHODS:
+        raise ValueError(f"Unknown correlation method '{method}'; expected one of {', '.join(CORRELATION_METHODS)}")
+    table = table.astype(np.float64)
+    r = table.corr(method=method).to_numpy(copy=True)
+    valid = table.notna().to_numpy(dtype=np.float64)
+    n = valid.T @ valid
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = r * np.sqrt((n - 2) / (1 - r ** 2))
+        p = 2 * stats.t.sf(np.abs(t), n - 2)
+    p[np.isclose(np.abs(r), 1.0)] = 0.0
+    r[n < 3] = np.nan
+    p[n < 3] = np.nan
+    return {'r': r, 'p': p, 'n': n.astype(int)}
+
+
+def _correlation_payload(table: pd.DataFrame, method: str) -> dict:
+    result = correlation_matrix(table, method)
+    rounded = {key: [[_finite(round(float(value), 6)) for value in row] for row in result[key]] for key in ('r', 'p')}
+    return {"method": method, "variables": table.columns.tolist(), "plots": int(len(table)),
+            "matrix": rounded['r'], "p_values": rounded['p'], "n": result['n'].tolist()}
+
+
+def get_correlation_matrix(method: str = 'pearson', variables: list = None, plot_ids: list = None) -> dict:
+    """
+    API payload: correlation matrix across the per-plot metrics table (diversity, stand
+    structure, canopy and carbon per plot), optionally restricted to some variables and plots.
+    Each pair is correlated on its own complete rows, so the all-plots matrix is cached once per
+    dataset versions and method and sliced to the requested variables; plot subsets are
+    correlated from the cached metrics table on each request.
+    """
+    if method not in CORRELATION_METHODS:
+        raise ValueError(f"Unknown correlation method '{method}'; expected one of {', '.join(CORRELATION_METHODS)}")
+    table = load_derived(CLEANED_VEG_FULL_PATH, ('statistics_plot_features', tuple(CORRELATION_FEATURES)),
+                         lambda df: plot_features(CORRELATION_FEATURES), SOURCE_PATHS)
+    if variables is not None:
+        variables = list(variables)
+        missing = [column for column in variables if column not in table.columns]
+        if missing:
+            raise ValueError(f"Unknown plot metrics: {', '.join(missing)}")
+    if plot_ids is not None:
+        plot_ids = [str(plot_id) for plot_id in plot_ids]
+        selected = table[table.index.isin(plot_ids)]
+        return _correlation_payload(selected if variables is None else selected[variables], method)
+
+    payload = load_derived(CLEANED_VEG_FULL_PATH, ('statistics_correlation', method),
+                           lambda df: _correlation_payload(table, method), SOURCE_PATHS)
+    if variables is None:
+        return payload
+    positions = [payload["variables"].index(column) for column in variables]
+    return {**payload, "variables": variables,
+            **{key: [[payload[key][i][j] for j in positions] for i in positions] for key in ('matrix', 'p_values', 'n')}}
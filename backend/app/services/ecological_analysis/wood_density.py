@@ -0,0 +1,94 @@
+import logging
+from functools import lru_cache
+from pathlib import Path
+from typing import Union
+import numpy as np
+import pandas as pd
+from app.core.config import WOOD_DENSITY_REFERENCE_PATH, WOOD_DENSITY_DEFAULT
+from app.services.data_processing.species_normalizer import SpeciesIndex, load_species_index, name_key
+
+logger = logging.getLogger(__name__)
+
+# Match levels reported for every looked-up species, in order of precedence
+MATCH_LEVELS = ['species', 'genus', 'family', 'default']
+
+# Columns of a Global Wood Density Database export
+GWDD_FAMILY = 'Family'
+GWDD_BINOMIAL = 'Binomial'
+GWDD_DENSITY_PREFIX = 'Wood density'
+
+
+def _genus(key: str) -> str:
+    return key.split(' ', 1)[0]
+
+
+class WoodDensityIndex:
+    """
+    Wood density lookup over a reference table in Global Wood Density Database format. Records
+    are averaged per species (binomials resolved to accepted names through the species index);
+    genus and family values are the means of their species means. A species missing from the
+    table falls back to its genus, then its family, then the default density.
+    """
+    def __init__(self, reference: pd.DataFrame, species_index: SpeciesIndex = None, default: float = WOOD_DENSITY_DEFAULT):
+        self.species_index = species_index if species_index is not None else load_species_index()
+        self.default = default
+        density_column = next(column for column in reference.columns if str(column).startswith(GWDD_DENSITY_PREFIX))
+
+        records = pd.DataFrame({
+            'binomial': reference[GWDD_BINOMIAL].astype(str).str.strip(),
+            'family': reference[GWDD_FAMILY].astype(str).str.strip().str.casefold(),
+            'density': pd.to_numeric(reference[density_column], errors='coerce'),
+        }).dropna(subset=['density'])
+        # Each distinct binomial is resolved once, so GWDD synonyms join their accepted species
+        binomials = records['binomial'].drop_duplicates()
+        accepted = {}
+        for binomial in binomials:
+            hit = self.species_index.exact(binomial)
+            accepted[binomial] = name_key(hit[0] if hit is not None else binomial)
+        records['key'] = records['binomial'].map(accepted)
+
+        per_species = records.groupby('key').agg(density=('density', 'mean'), family=('family', 'first'))
+        self.species = per_species['density'].to_dict()
+        self.genera = per_species['density'].groupby(per_species.index.map(_genus)).mean().to_dict()
+        self.families = per_species.groupby('family')['density'].mean().to_dict()
+
+    def resolve(self, name: str, family: str = None):
+        """Returns (wood density, match level) for one accepted species name and its family."""
+        if isinstance(name, str) and name.strip():
+            key = name_key(name)
+            if key in self.species:
+                return self.species[key], 'species'
+            if _genus(key) in self.genera:
+                return self.genera[_genus(key)], 'genus'
+        if isinstance(family, str) and family.strip().casefold() in self.families:
+            return self.families[family.strip().casefold()], 'family'
+        return self.default, 'default'
+
+    def lookup(self, species: pd.Series) -> pd.DataFrame:
+        """
+        Wood_Density_g_cm3 and Wood_Density_Match of every row of a series of accepted names.
+        Each distinct species is resolved once (families from the species index) and the result
+        is broadcast back to the rows through its factor code; missing species get the default.
+        """
+        codes, uniques = pd.factorize(species)
+        resolved = [self.resolve(name, self.species_index.families.get(name)) for name in uniques]
+        densities = np.array([density for density, _ in resolved] + [self.default], dtype=np.float64)
+        levels = pd.Categorical([level for _, level in resolved] + ['default'], categories=MATCH_LEVELS)
+        # Code -1 (missing) picks the trailing default
+        return pd.DataFrame({
+            'Wood_Density_g_cm3': densities[codes],
+            'Wood_Density_Match': levels[codes],
+        }, index=species.index)
+
+
+@lru_cache(maxsize=4)
+def _load_wood_density_index(path: str) -> WoodDensityIndex:
+    reference = pd.read_csv(path)
+    index = WoodDensityIndex(reference)
+    logger.info(f"Compiled wood density index from {path} ({len(reference)} records, {len(index.species)} species).")
+    return index
+
+
+def load_wood_density_index(path: Union[str, Path] = None) -> WoodDensityIndex:
+    """Builds (once per process) the wood density index for a reference table, by default the bundled one."""
+    return _load_wood_density_index(str(path if path is not None else WOOD_DENSITY_REFERENCE_PATH))
@@ -15,6 +15,7 @@ from app.core.config import (
     CANOPY_ANALYSIS_SCRIPT_PATH,
     ECOLOGICAL_ANALYSIS_SCRIPT_PATH,
 )
+from app.infrastructure.persistence.dataset_cache import load_dataset
 
 logger = logging.getLogger(__name__)
 
@@ -43,9 +44,9 @@ def generate_report():
     os.makedirs(REPORTS_DIR, exist_ok=True)
 
     try:
-        df_full = pd.read_csv(CLEANED_VEG_FULL_PATH)
-        df_trees = pd.read_csv(ECO_RESULTS_PATH)
-        df_canopy = pd.read_csv(CANOPY_RESULTS_PATH)
+        df_full = load_dataset(CLEANED_VEG_FULL_PATH)
+        df_trees = load_dataset(ECO_RESULTS_PATH)
+        df_canopy = load_dataset(CANOPY_RESULTS_PATH)
     except FileNotFoundError as e:
         logging.error(f"Error loading data files for report generation: {e}")
         return
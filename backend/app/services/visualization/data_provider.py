@@ -5,13 +5,15 @@ from app.core.config import (
     ECO_RESULTS_PATH,
     CANOPY_RESULTS_PATH,
 )
+from app.infrastructure.persistence.dataset_cache import load_dataset, load_plot_index
+from app.infrastructure.persistence.aggregation_cube import get_plot_aggregate
 
 logger = logging.getLogger(__name__)
 
 def get_full_cleaned_data():
     """Loads and returns the full cleaned vegetation data."""
     try:
-        return pd.read_csv(CLEANED_VEG_FULL_PATH)
+        return load_dataset(CLEANED_VEG_FULL_PATH)
     except FileNotFoundError:
         logger.error(f"Data file not found: {CLEANED_VEG_FULL_PATH}")
         return None
@@ -19,7 +21,7 @@ def get_full_cleaned_data():
 def get_eco_results_data():
     """Loads and returns the ecological analysis results."""
     try:
-        return pd.read_csv(ECO_RESULTS_PATH)
+        return load_dataset(ECO_RESULTS_PATH)
     except FileNotFoundError:
         logger.error(f"Data file not found: {ECO_RESULTS_PATH}")
         return None
@@ -27,107 +29,101 @@ def get_eco_results_data():
 def get_canopy_results_data():
     """Loads and returns the canopy analysis results."""
     try:
-        return pd.read_csv(CANOPY_RESULTS_PATH)
+        return load_dataset(CANOPY_RESULTS_PATH)
     except FileNotFoundError:
         logger.error(f"Data file not found: {CANOPY_RESULTS_PATH}")
         return None
 
+def _get_plot_rows(path, plot_id: str, column: str = 'Plot'):
+    """Rows of one plot through the cached per-plot index; None if the dataset is unavailable."""
+    try:
+        return load_plot_index(path, column).get(plot_id)
+    except FileNotFoundError:
+        logger.error(f"Data file not found: {path}")
+        return None
+    except KeyError:
+        logger.error(f"Column '{column}' not found in {path}")
+        return None
+
+def _get_aggregate(plot_id: str, level: str, by: tuple = ()):
+    """Rollup of one plot from the aggregation cube; None if the datasets are unavailable."""
+    try:
+        return get_plot_aggregate(plot_id, level, by)
+    except FileNotFoundError as e:
+        logger.error(f"Data file not found: {e.filename}")
+        return None
+
+def _get_tree_quadrants(plot_id: str):
+    """Quadrant rollup of a plot's ecological results, restricted to quadrants with trees."""
+    by_quadrant = _get_aggregate(plot_id, 'quadrant')
+    if by_quadrant is None or 'trees' not in by_quadrant.columns:
+        return None
+    by_quadrant = by_quadrant[by_quadrant['trees'] > 0]
+    return by_quadrant if not by_quadrant.empty else None
+
 def get_data_for_plant_composition(plot_id: str):
     """Prepares data for the plant composition plot (Fig 2)."""
-    df_cleaned = get_full_cleaned_data()
-    if df_cleaned is None or 'Plot' not in df_cleaned.columns:
+    composition = _get_aggregate(plot_id, 'quadrant', ('Type',))
+    if composition is None or composition.empty:
         return None
-    
-    df_plot = df_cleaned[df_cleaned['Plot'] == plot_id]
-    if df_plot.empty:
-        return None
-        
-    return df_plot.groupby(['Quadrant', 'Type'])['Number'].sum().unstack(fill_value=0).reindex(['Q1','Q2','Q3','Q4'])
+
+    return composition['number'].unstack(fill_value=0).reindex(['Q1','Q2','Q3','Q4'])
 
 def get_data_for_schematic_distribution(plot_id: str):
     """Prepares data for the schematic plant distribution plot (Fig 3)."""
-    df_cleaned = get_full_cleaned_data()
-    df_trees = get_eco_results_data()
-    if df_cleaned is None or df_trees is None or 'Plot' not in df_cleaned.columns:
-        return None
-
-    df_cleaned_plot = df_cleaned[df_cleaned['Plot'] == plot_id]
-    df_trees_plot = df_trees[df_trees['Plot'] == plot_id]
-    if df_cleaned_plot.empty:
+    df_cleaned_plot = _get_plot_rows(CLEANED_VEG_FULL_PATH, plot_id)
+    df_trees_plot = _get_plot_rows(ECO_RESULTS_PATH, plot_id)
+    if df_cleaned_plot is None or df_trees_plot is None or df_cleaned_plot.empty:
         return None
 
     return pd.merge(df_cleaned_plot, df_trees_plot[['Quadrant', 'ID', 'Effective_DBH_cm']], on=['Quadrant', 'ID'], how='left')
 
 def get_data_for_species_distribution(plot_id: str):
     """Prepares data for the woody species distribution plot (Fig 4)."""
-    df_cleaned = get_full_cleaned_data()
-    if df_cleaned is None or 'Plot' not in df_cleaned.columns:
+    by_species = _get_aggregate(plot_id, 'plot', ('Type', 'Species'))
+    if by_species is None or by_species.empty:
         return None
 
-    df_plot = df_cleaned[df_cleaned['Plot'] == plot_id]
-    if df_plot.empty:
-        return None
-
-    woody_df = df_plot[df_plot['Type'].isin(['Tree', 'Sapling'])].copy()
-    return woody_df.dropna(subset=['Species']).groupby('Species')['Number'].sum().sort_values(ascending=False).reset_index()
+    woody = by_species[by_species.index.get_level_values('Type').isin(['Tree', 'Sapling'])]
+    return woody['number'].groupby(level='Species', observed=True).sum().rename('Number').sort_values(ascending=False).reset_index()
 
 def get_data_for_co2_by_quadrant(plot_id: str):
     """Prepares data for the CO2 sequestered by quadrant plots (Fig 5 & 7)."""
-    df_trees = get_eco_results_data()
-    if df_trees is None or 'Plot' not in df_trees.columns:
-        return None
-    
-    df_plot = df_trees[df_trees['Plot'] == plot_id]
-    if df_plot.empty:
+    by_quadrant = _get_tree_quadrants(plot_id)
+    if by_quadrant is None:
         return None
 
-    summary_m1 = df_plot.groupby('Quadrant')['CO2_Eq_M1_kg'].sum().reset_index()
-    summary_m2 = df_plot.groupby('Quadrant')['CO2_Eq_M2_kg'].sum().reset_index()
+    summary_m1 = by_quadrant['co2_m1_kg'].rename('CO2_Eq_M1_kg').reset_index()
+    summary_m2 = by_quadrant['co2_m2_kg'].rename('CO2_Eq_M2_kg').reset_index()
     return summary_m1, summary_m2
 
 def get_data_for_tree_contribution(plot_id: str):
     """Prepares data for the tree contribution to carbon stock plots (Fig 6 & 8)."""
-    df_trees = get_eco_results_data()
-    if df_trees is None or 'Plot' not in df_trees.columns:
-        return None
-
-    df_plot = df_trees[df_trees['Plot'] == plot_id]
-    if df_plot.empty:
+    df_plot = _get_plot_rows(ECO_RESULTS_PATH, plot_id)
+    if df_plot is None or df_plot.empty:
         return None
     
-    df_plot['Tree_Label'] = df_plot['Quadrant'] + " - ID " + df_plot['ID'].astype(str)
+    df_plot['Tree_Label'] = df_plot['Quadrant'].astype(str) + " - ID " + df_plot['ID'].astype(str)
     return df_plot
 
 def get_data_for_co2_comparison(plot_id: str):
     """Prepares data for the CO2 comparison plot (Fig 9)."""
-    df_trees = get_eco_results_data()
-    if df_trees is None or 'Plot' not in df_trees.columns:
+    by_quadrant = _get_tree_quadrants(plot_id)
+    if by_quadrant is None:
         return None
 
-    df_plot = df_trees[df_trees['Plot'] == plot_id]
-    if df_plot.empty:
-        return None
-
-    plot_summary_comp = df_plot.groupby('Quadrant').agg(CO2_M1=('CO2_Eq_M1_kg', 'sum'), CO2_M2=('CO2_Eq_M2_kg', 'sum')).reset_index()
+    plot_summary_comp = by_quadrant[['co2_m1_kg', 'co2_m2_kg']].set_axis(['CO2_M1', 'CO2_M2'], axis=1).reset_index()
     plot_summary_melted = plot_summary_comp.melt(id_vars='Quadrant', var_name='Method', value_name='CO2_kg')
     plot_summary_melted['Method'] = plot_summary_melted['Method'].map({'CO2_M1': 'M1 (Height-Inclusive)', 'CO2_M2': 'M2 (Height-Exclusive)'})
     return plot_summary_melted
 
 def get_data_for_biomass_comparison(plot_id: str):
     """Prepares data for the biomass comparison plot (Fig 10)."""
-    df_trees = get_eco_results_data()
-    if df_trees is None or 'Plot' not in df_trees.columns:
-        return None
-    
-    df_plot = df_trees[df_trees['Plot'] == plot_id]
-    return df_plot if not df_plot.empty else None
+    df_plot = _get_plot_rows(ECO_RESULTS_PATH, plot_id)
+    return df_plot if df_plot is not None and not df_plot.empty else None
 
 def get_data_for_canopy_summary(plot_id: str):
     """Prepares data for the canopy cover and LAI summary plots (Fig 11 & 12)."""
-    df_canopy = get_canopy_results_data()
-    if df_canopy is None or 'plot_id' not in df_canopy.columns:
-        return None
-        
     # Map frontend plot_id to backend plot_id format if needed
     # e.g., "Plot_1" -> "Plot-P01"
     if '_' in plot_id and not plot_id.startswith("Plot-P"):
@@ -141,8 +137,9 @@ def get_data_for_canopy_summary(plot_id: str):
     else:
         backend_plot_id = plot_id
 
-    df_plot = df_canopy[df_canopy['plot_id'] == backend_plot_id]
-    
+    df_plot = _get_plot_rows(CANOPY_RESULTS_PATH, backend_plot_id, column='plot_id')
+    if df_plot is None:
+        return None
     if df_plot.empty:
         logger.warning(f"No canopy data found for original plot_id '{plot_id}' (mapped to '{backend_plot_id}').")
         return None
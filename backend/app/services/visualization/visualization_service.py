@@ -11,6 +11,9 @@ from app.core.config import (
     CANOPY_RESULTS_PATH,
     IMAGE_DIR,
 )
+from app.infrastructure.persistence.dataset_cache import load_dataset, load_plot_index
+from app.services.ecological_analysis.spatial import quadrant_bounds, stem_positions
+from app.services.ecological_analysis.stand_structure import DEFAULT_PLOT_CONFIGURATION
 
 logger = logging.getLogger(__name__)
 
@@ -45,7 +48,7 @@ def plot_nested_sampling_design(output_path):
     logging.info(f"Generated plot: {output_path}")
 
 def plot_plant_composition(df_cleaned, output_path, plot_no, custom_title_suffix=""):
-    counts_per_plot = df_cleaned.groupby(['Quadrant', 'Type'])['Number'].sum().unstack(fill_value=0).reindex(['Q1','Q2','Q3','Q4'])
+    counts_per_plot = df_cleaned.groupby(['Quadrant', 'Type'], observed=True)['Number'].sum().unstack(fill_value=0).reindex(['Q1','Q2','Q3','Q4'])
     fig, ax = plt.subplots(figsize=(10, 7))
     counts_per_plot.plot(kind='bar', stacked=True, ax=ax, width=0.7)
     
@@ -71,7 +74,7 @@ def plot_schematic_plant_distribution(df_cleaned, df_trees, output_path, plot_no
     ax.set_xlabel("West-East Direction (meters)", fontsize=12); ax.set_ylabel("South-North Direction (meters)", fontsize=12)
 
     # Define quadrant boundaries and 1x1m subplot centers
-    quadrant_boundaries = {"Q1": (0, 5, 5, 5), "Q2": (0, 0, 5, 5), "Q3": (5, 0, 5, 5), "Q4": (5, 5, 5, 5)} # x, y, width, height
+    quadrant_boundaries = {name: quadrant_bounds(DEFAULT_PLOT_CONFIGURATION, name) for name in ("Q1", "Q2", "Q3", "Q4")} # x, y, width, height
     subplot_1x1_centers = {"Q1": (0.5, 9.5), "Q2": (0.5, 0.5), "Q3": (9.5, 0.5), "Q4": (9.5, 9.5)} # Center of 1x1m subplot
 
     # Draw 5x5m quadrants and 1x1m subplots
@@ -89,6 +92,8 @@ def plot_schematic_plant_distribution(df_cleaned, df_trees, output_path, plot_no
 
     # Filter for Tree/Sapling/Shrub types (distributed within 5x5m quadrants)
     tree_like_df = df_viz[df_viz['Type'].isin(['Tree', 'Sapling', 'Shrub'])].copy()
+    # Measured stem coordinates where recorded, otherwise a reproducible position inside the quadrant
+    tree_like_df[['X_m', 'Y_m']] = stem_positions(tree_like_df, margin=0.5)[['X_m', 'Y_m']]
     # Filter for Herb/Grass/Bare Soil/Litter types (located in 1x1m subplots)
     herb_like_df = df_viz[df_viz['Type'].isin(['Herb', 'Grass', 'Bare Soil', 'Litter'])].copy()
 
@@ -98,11 +103,8 @@ def plot_schematic_plant_distribution(df_cleaned, df_trees, output_path, plot_no
         num_items = len(quadrant_data)
         if num_items == 0: continue
 
-        # Distribute points within the 5x5m quadrant area
-        # Using a small random offset for better visual separation
         for i, (index, row) in enumerate(quadrant_data.iterrows()):
-            plot_x = qx + np.random.uniform(0.5, qw - 0.5)
-            plot_y = qy + np.random.uniform(0.5, qh - 0.5)
+            plot_x, plot_y = row['X_m'], row['Y_m']
 
             if row['Type'] == 'Tree' and pd.notna(row['Effective_DBH_cm']):
                 current_size = row['Effective_DBH_cm'] * 30
@@ -150,7 +152,7 @@ def plot_schematic_plant_distribution(df_cleaned, df_trees, output_path, plot_no
 
 def plot_species_distribution(df_cleaned, output_path, plot_no):
     woody_df = df_cleaned[df_cleaned['Type'].isin(['Tree', 'Sapling'])].copy()
-    species_counts = woody_df.dropna(subset=['Species']).groupby('Species')['Number'].sum().sort_values(ascending=False).reset_index()
+    species_counts = woody_df.dropna(subset=['Species']).groupby('Species', observed=True)['Number'].sum().sort_values(ascending=False).reset_index()
     fig_height = max(7, len(species_counts) * 0.5)
     fig, ax = plt.subplots(figsize=(10, fig_height))
     sns.barplot(x='Number', y='Species', data=species_counts, palette='viridis', ax=ax)
@@ -162,7 +164,7 @@ def plot_species_distribution(df_cleaned, output_path, plot_no):
     logging.info(f"Generated plot: {output_path}")
 
 def plot_co2_sequestered(df_trees, output_path_m1, output_path_m2, plot_no):
-    plot_summary_m1 = df_trees.groupby('Quadrant')['CO2_Eq_M1_kg'].sum().reset_index()
+    plot_summary_m1 = df_trees.groupby('Quadrant', observed=True)['CO2_Eq_M1_kg'].sum().reset_index()
     fig5, ax5 = plt.subplots(figsize=(10, 7))
     bars = sns.barplot(x='Quadrant', y='CO2_Eq_M1_kg', data=plot_summary_m1, palette='mako', ax=ax5, order=['Q1','Q2','Q3','Q4'])
     fig5.suptitle(f'Figure 5: CO₂ Sequestered by Quadrant (Method 1) (Plot {plot_no})', fontsize=18)
@@ -176,7 +178,7 @@ def plot_co2_sequestered(df_trees, output_path_m1, output_path_m2, plot_no):
     plt.close(fig5)
     logging.info(f"Generated plot: {output_path_m1}")
 
-    plot_summary_m2 = df_trees.groupby('Quadrant')['CO2_Eq_M2_kg'].sum().reset_index()
+    plot_summary_m2 = df_trees.groupby('Quadrant', observed=True)['CO2_Eq_M2_kg'].sum().reset_index()
     fig7, ax7 = plt.subplots(figsize=(10, 7))
     bars = sns.barplot(x='Quadrant', y='CO2_Eq_M2_kg', data=plot_summary_m2, palette='viridis', ax=ax7, order=['Q1','Q2','Q3','Q4'])
     fig7.suptitle(f'Figure 7: CO₂ Sequestered by Quadrant (Method 2) (Plot {plot_no})', fontsize=18)
@@ -191,7 +193,7 @@ def plot_co2_sequestered(df_trees, output_path_m1, output_path_m2, plot_no):
     logging.info(f"Generated plot: {output_path_m2}")
 
 def plot_tree_contribution(df_trees, output_path_m1, output_path_m2, plot_no):
-    df_trees['Tree_Label'] = df_trees['Quadrant'] + " - ID " + df_trees['ID'].astype(str)
+    df_trees['Tree_Label'] = df_trees['Quadrant'].astype(str) + " - ID " + df_trees['ID'].astype(str)
     fig6, ax6 = plt.subplots(figsize=(10, 8))
     df_m1 = df_trees.sort_values('Carbon_Stock_M1_kg', ascending=True)
     ax6.barh(df_m1['Tree_Label'], df_m1['Carbon_Stock_M1_kg'], color='skyblue')
@@ -215,7 +217,7 @@ def plot_tree_contribution(df_trees, output_path_m1, output_path_m2, plot_no):
     logging.info(f"Generated plot: {output_path_m2}")
 
 def plot_comparison_figures(df_trees, output_path_co2, output_path_biomass, plot_no):
-    plot_summary_comp = df_trees.groupby('Quadrant').agg(CO2_M1=('CO2_Eq_M1_kg', 'sum'), CO2_M2=('CO2_Eq_M2_kg', 'sum')).reset_index()
+    plot_summary_comp = df_trees.groupby('Quadrant', observed=True).agg(CO2_M1=('CO2_Eq_M1_kg', 'sum'), CO2_M2=('CO2_Eq_M2_kg', 'sum')).reset_index()
     plot_summary_melted = plot_summary_comp.melt(id_vars='Quadrant', var_name='Method', value_name='CO2_kg')
     plot_summary_melted['Method'] = plot_summary_melted['Method'].map({'CO2_M1': 'M1 (Height-Inclusive)', 'CO2_M2': 'M2 (Height-Exclusive)'})
     fig9, ax9 = plt.subplots(figsize=(12, 8))
@@ -269,9 +271,8 @@ def generate_all_plots():
     logging.info("Starting plot generation with per-plot categorized output.")
     setup_matplotlib()
     
-    df_cleaned_full = pd.read_csv(CLEANED_VEG_FULL_PATH)
-    df_trees_full = pd.read_csv(ECO_RESULTS_PATH)
-    df_canopy_full = pd.read_csv(CANOPY_RESULTS_PATH)
+    df_cleaned_full = load_dataset(CLEANED_VEG_FULL_PATH)
+    df_canopy_full = load_dataset(CANOPY_RESULTS_PATH)
 
     general_output_dir = os.path.join(IMAGE_DIR, '00_general_overview')
     os.makedirs(general_output_dir, exist_ok=True)
@@ -280,12 +281,9 @@ def generate_all_plots():
     if 'Plot' not in df_cleaned_full.columns:
         logging.error("'Plot' column not found. Cannot generate per-plot vegetation plots.")
     else:
-        df_cleaned_full['Plot'] = df_cleaned_full['Plot'].astype(str)
-        df_trees_full['Plot'] = df_trees_full['Plot'].astype(str)
-        df_canopy_full['plot_id'] = df_canopy_full['plot_id'].astype(str)
-
-        plot_numbers = df_cleaned_full['Plot'].unique()
-        for plot_no in sorted(plot_numbers):
+        cleaned_index = load_plot_index(CLEANED_VEG_FULL_PATH)
+        trees_index = load_plot_index(ECO_RESULTS_PATH)
+        for plot_no in sorted(cleaned_index.keys()):
             logging.info(f"--- Generating vegetation plots for Plot No. {plot_no} ---")
             
             plot_output_dir = os.path.join(IMAGE_DIR, plot_no)
@@ -294,8 +292,8 @@ def generate_all_plots():
             os.makedirs(general_dir, exist_ok=True)
             os.makedirs(carbon_dir, exist_ok=True)
 
-            df_cleaned = df_cleaned_full[df_cleaned_full['Plot'] == plot_no]
-            df_trees_with_eco = df_trees_full[df_trees_full['Plot'] == plot_no]
+            df_cleaned = cleaned_index.get(plot_no)
+            df_trees_with_eco = trees_index.get(plot_no)
 
             plot_plant_composition(df_cleaned, os.path.join(general_dir, 'figure_2_plant_composition_by_quadrant.png'), plot_no)
             plot_schematic_plant_distribution(df_cleaned, df_trees_with_eco, os.path.join(general_dir, 'figure_3_schematic_plant_distribution.png'), plot_no)
@@ -319,16 +317,14 @@ def generate_all_plots():
     if 'plot_id' not in df_canopy_full.columns:
         logging.error("'plot_id' column not found. Cannot generate per-plot canopy plots.")
     else:
-        canopy_plot_ids = df_canopy_full['plot_id'].unique()
-        for plot_id in canopy_plot_ids:
+        canopy_index = load_plot_index(CANOPY_RESULTS_PATH, 'plot_id')
+        for plot_id, df_canopy in canopy_index.items():
             logging.info(f"--- Generating canopy plots for {plot_id} ---")
             
             plot_output_dir = os.path.join(IMAGE_DIR, plot_id)
             canopy_dir = os.path.join(plot_output_dir, '03_canopy_analysis')
             os.makedirs(canopy_dir, exist_ok=True)
 
-            df_canopy = df_canopy_full[df_canopy_full['plot_id'] == plot_id]
-            
             plot_canopy_analysis(df_canopy,
                                  os.path.join(canopy_dir, 'figure_11_summary_of_canopy_cover.png'),
                                  os.path.join(canopy_dir, 'figure_12_summary_of_estimated_lai.png'),
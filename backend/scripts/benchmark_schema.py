@@ -0,0 +1,67 @@
+import sys
+import time
+import argparse
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+# Add backend directory to python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.infrastructure.persistence.dataset_io import apply_schema
+
+def build_inventory(n_rows: int, n_plots: int, seed: int = 0) -> pd.DataFrame:
+    """Synthesises a cleaned-vegetation-shaped frame as pd.read_csv would return it."""
+    rng = np.random.default_rng(seed)
+    species = [f"Species {i:03d}" for i in range(250)]
+    types = ['Tree', 'Sapling', 'Shrub', 'Herb', 'Grass', 'Litter', 'Bare Soil']
+    df = pd.DataFrame({
+        'Plot': [f"Plot-P{i:04d}" for i in rng.integers(0, n_plots, n_rows)],
+        'Quadrant': [f"Q{i}" for i in rng.integers(1, 5, n_rows)],
+        'ID': [f"T{i}" for i in rng.integers(0, 5000, n_rows)],
+        'Type': np.asarray(types, dtype=object)[rng.integers(0, len(types), n_rows)],
+        'Number': rng.integers(1, 60, n_rows),
+        'Species': np.asarray(species, dtype=object)[rng.integers(0, len(species), n_rows)],
+        'Girth_cm_Stem1': np.round(rng.uniform(10, 250, n_rows), 1),
+        'Girth_cm_Stem2': np.round(rng.uniform(0, 80, n_rows), 1),
+        'Girth_cm_Stem3': np.round(rng.uniform(0, 80, n_rows), 1),
+        'Height_m': np.round(rng.uniform(0.5, 30, n_rows), 1),
+    })
+    # Round-trip through CSV so the baseline has exactly the dtypes readers used to get
+    return pd.read_csv(pd.io.common.StringIO(df.to_csv(index=False)))
+
+def timed(func, repeat: int = 5) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def run(n_rows: int, n_plots: int):
+    before = build_inventory(n_rows, n_plots)
+    after = apply_schema(before)
+    plot_id = before['Plot'].iloc[0]
+
+    workloads = {
+        "groupby('Species') sum": lambda df: df.groupby('Species', observed=True)['Number'].sum(),
+        "groupby(['Quadrant','Type']) sum": lambda df: df.groupby(['Quadrant', 'Type'], observed=True)['Number'].sum(),
+        "df['Plot'] == plot_id filter": lambda df: df[df['Plot'] == plot_id],
+    }
+
+    mem_before = before.memory_usage(deep=True).sum() / 2**20
+    mem_after = after.memory_usage(deep=True).sum() / 2**20
+    print(f"Rows: {n_rows:,}  Plots: {n_plots:,}  pandas {pd.__version__}")
+    print(f"{'':38s}{'before':>12s}{'after':>12s}{'ratio':>9s}")
+    print(f"{'memory (MiB)':38s}{mem_before:12.1f}{mem_after:12.1f}{mem_before / mem_after:8.1f}x")
+    for name, workload in workloads.items():
+        t_before = timed(lambda: workload(before)) * 1000
+        t_after = timed(lambda: workload(after)) * 1000
+        print(f"{name + ' (ms)':38s}{t_before:12.1f}{t_after:12.1f}{t_before / t_after:8.1f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare object/float64 frames against the canonical vegetation schema.")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--plots", type=int, default=500)
+    args = parser.parse_args()
+    run(args.rows, args.plots)
@@ -0,0 +1,31 @@
+import unittest
+from math import comb
+import numpy as np
+from app.services.ecological_analysis.accumulation import sample_accumulation, rarefaction
+
+class TestSpeciesAccumulation(unittest.TestCase):
+    def setUp(self):
+        self.presence = np.random.default_rng(0).random((10, 15)) < 0.25
+
+    def test_mean_curve_converges_to_exact_expectation(self):
+        curve = sample_accumulation(self.presence, permutations=20000, seed=1)
+        frequencies = self.presence.sum(axis=0)
+        n = len(self.presence)
+        exact = [sum(1 - comb(n - f, k) / comb(n, k) for f in frequencies if f) for k in range(1, n + 1)]
+        np.testing.assert_allclose(curve['richness_mean'], exact, atol=0.05)
+        self.assertEqual(curve['richness_mean'].iloc[-1], np.count_nonzero(frequencies))
+
+    def test_seed_is_reproducible_across_batch_sizes(self):
+        a = sample_accumulation(self.presence, permutations=64, seed=7)
+        b = sample_accumulation(self.presence, permutations=64, seed=7, batch_elements=40)
+        self.assertTrue(a.equals(b))
+
+class TestRarefaction(unittest.TestCase):
+    def test_hurlbert_expectation(self):
+        curve = rarefaction([5, 3, 1, 1, 0], [1, 2, 10, 11])
+        self.assertEqual(curve['individuals'].tolist(), [1, 2, 10])
+        expected_two = sum(1 - comb(10 - n, 2) / comb(10, 2) for n in (5, 3, 1, 1))
+        np.testing.assert_allclose(curve['expected_richness'], [1, expected_two, 4])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+import pandas as pd
+from app.infrastructure.persistence import aggregation_cube
+from app.infrastructure.persistence.dataset_io import write_dataset
+
+RECORDS = pd.DataFrame({
+    'Plot': ['P1', 'P1', 'P1', 'P2', 'P2'],
+    'Quadrant': ['Q1', 'Q1', 'Q2', 'Q1', 'Q1'],
+    'ID': ['T1', 'Herb_SP1', 'T2', 'T1', 'Grass_SP1'],
+    'Type': ['Tree', 'Herb', 'Tree', 'Tree', 'Grass'],
+    'Number': [1, 30, 2, 1, 40],
+    'Species': ['a', 'Mixed Herbs', 'b', 'a', 'Mixed Grasses'],
+    'Subplot_ID': [None, 'SP1', None, None, 'SP1'],
+})
+TREES = RECORDS[RECORDS['Type'] == 'Tree'].assign(CO2_Eq_M1_kg=[10.0, 5.0, 7.0], CO2_Eq_M2_kg=[20.0, 6.0, 8.0])
+
+class TestAggregationCube(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.full = Path(self.tmp.name) / "full.csv"
+        self.eco = Path(self.tmp.name) / "eco.csv"
+        write_dataset(RECORDS, self.full)
+        write_dataset(TREES, self.eco)
+        state = {"versions": None, "fingerprints": {}, "blocks": {}, "assembled": {}}
+        self.patches = [
+            patch.object(aggregation_cube, 'CLEANED_VEG_FULL_PATH', self.full),
+            patch.object(aggregation_cube, 'ECO_RESULTS_PATH', self.eco),
+            patch.object(aggregation_cube, '_state', state),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        self.tmp.cleanup()
+
+    def test_rollups_at_each_level(self):
+        quadrants = aggregation_cube.get_plot_aggregate('P1', 'quadrant')
+        self.assertEqual(quadrants['count'].tolist(), [1, 2])
+        self.assertEqual(quadrants['cover'].tolist(), [30, 0])
+        self.assertEqual(quadrants['co2_m1_kg'].tolist(), [10.0, 5.0])
+        subplots = aggregation_cube.get_plot_aggregate('P2', 'subplot')
+        self.assertEqual(subplots['number'].to_dict(), {('Q1', ''): 1, ('Q1', 'SP1'): 40})
+        by_type = aggregation_cube.get_aggregate('plot', 'Type')
+        self.assertEqual(by_type.loc[('P2', 'Tree'), 'co2_m2_kg'], 8.0)
+        self.assertTrue(aggregation_cube.get_plot_aggregate('missing', 'quadrant').empty)
+
+    def test_only_changed_plots_are_rebuilt(self):
+        blocks = aggregation_cube.refresh_cube()
+        untouched = blocks['P1']
+        changed = RECORDS.copy()
+        changed.loc[3, 'Number'] = 5
+        write_dataset(changed, self.full)
+        os.utime(self.full, ns=(1, 1))
+        blocks = aggregation_cube.refresh_cube()
+        self.assertIs(blocks['P1'], untouched)
+        self.assertEqual(blocks['P2'][('plot', ())]['count'].iloc[0], 5)
+
+if __name__ == '__main__':
+    unittest.main()
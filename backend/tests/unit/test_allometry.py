@@ -0,0 +1,51 @@
+import unittest
+import numpy as np
+import pandas as pd
+from app.services.ecological_analysis import allometry
+from app.services.ecological_analysis.allometry import carbon_columns, evaluate_models, register_model
+from app.services.ecological_analysis.carbon_uncertainty import simulate_agb
+
+class TestAllometricModels(unittest.TestCase):
+    def test_matches_closed_forms(self):
+        dbh = np.array([12.0, 35.5, 0.0, np.nan, 8.0])
+        height = np.array([9.0, 21.0, 4.0, 6.0, np.nan])
+        rho = np.array([0.6, 0.48, 0.6, 0.6, 0.62])
+        agb = evaluate_models(dbh, height, rho, ['M1', 'M2', 'chave2005_moist_h'])
+        np.testing.assert_allclose(agb['M1'], 0.0673 * (rho * dbh ** 2 * height) ** 0.976)
+        with np.errstate(divide='ignore'):
+            m2 = np.exp(-1.803 - 0.976 * np.log(rho) + 2.673 * np.log(dbh) - 0.0299 * np.log(dbh) ** 2)
+        # A zero diameter is outside the exponential model's domain
+        np.testing.assert_allclose(agb['M2'], np.where(dbh > 0, m2, np.nan))
+        np.testing.assert_allclose(agb['chave2005_moist_h'], 0.0509 * rho * dbh ** 2 * height)
+
+    def test_species_specific_model_and_carbon(self):
+        register_model('test_ficus', {'intercept': np.log(0.1), 'ln_d': 2.0}, species=['Ficus racemosa'])
+        try:
+            trees = pd.DataFrame({'Effective_DBH_cm': [10.0, 10.0], 'Height_m': [5.0, 5.0], 'Wood_Density_g_cm3': [0.5, 0.5]})
+            columns = carbon_columns(trees, ['test_ficus'], species=['Ficus racemosa', 'Moringa oleifera'])
+            self.assertEqual(columns.columns.tolist(), ['AGB_test_ficus_kg', 'Carbon_Stock_test_ficus_kg', 'CO2_Eq_test_ficus_kg'])
+            np.testing.assert_allclose(columns['AGB_test_ficus_kg'], [10.0, np.nan])
+            np.testing.assert_allclose(columns['CO2_Eq_test_ficus_kg'], [10.0 * 1.26 * 0.47 * 44 / 12, np.nan])
+        finally:
+            del allometry.ALLOMETRIC_MODELS['test_ficus']
+        with self.assertRaises(ValueError):
+            evaluate_models([1.0], [1.0], [1.0], ['unknown'])
+
+class TestCarbonUncertainty(unittest.TestCase):
+    def test_draws_are_chunk_independent_and_sum_per_group(self):
+        args = ([12.0, 35.5, 0.0, np.nan], [9.0, 21.0, 4.0, 6.0], [0.6, 0.48, 0.6, 0.6], [0.1, 0.2, 0.1, 0.1])
+        result = simulate_agb(*args, names=['M1', 'M2'], groups=[0, 0, 1, 1], draws=200, seed=7)
+        chunked = simulate_agb(*args, names=['M1', 'M2'], groups=[0, 0, 1, 1], draws=200, seed=7, max_elements=200)
+        for part in ('trees', 'groups'):
+            for statistic, values in result[part].items():
+                np.testing.assert_allclose(values, chunked[part][statistic], equal_nan=True)
+        trees = result['trees']
+        self.assertTrue((trees['lower'][:2] < trees['mean'][:2]).all() and (trees['mean'][:2] < trees['upper'][:2]).all())
+        # A zero diameter stays zero under multiplicative error; a missing one stays missing
+        self.assertEqual(trees['mean'][2, 0], 0.0)
+        self.assertTrue(np.isnan(trees['mean'][3]).all())
+        # The mean of the group totals is the sum of the tree means
+        np.testing.assert_allclose(result['groups']['mean'][0], trees['mean'][:2].sum(axis=0))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,27 @@
+import unittest
+import numpy as np
+from app.services.ecological_analysis.bootstrap import bootstrap_diversity, richness_estimators
+
+class TestRichnessEstimators(unittest.TestCase):
+    def test_chao1_and_ace(self):
+        estimates = richness_estimators(np.array([[5, 3, 1, 1, 2, 0], [1, 1, 1, 0, 0, 0], [20, 30, 0, 0, 0, 0]]))
+        self.assertEqual(estimates['observed'].tolist(), [5, 3, 2])
+        # Chao1 = S + (N - 1)/N F1(F1 - 1) / (2(F2 + 1))
+        np.testing.assert_allclose(estimates['chao1'], [5 + 11 / 12 * 2 / 4, 3 + 2 / 3 * 6 / 2, 2])
+        # ACE with C = 1 - 2/12 and gamma^2 = 5/C * 28/132 - 1
+        coverage = 1 - 2 / 12
+        ace = 5 / coverage + 2 / coverage * (5 / coverage * 28 / 132 - 1)
+        np.testing.assert_allclose(estimates['ace'], [ace, 5, 2])
+
+class TestBootstrapDiversity(unittest.TestCase):
+    def test_intervals_bracket_estimates_and_ignore_chunking(self):
+        counts = np.array([[40, 30, 20, 10], [5, 5, 0, 0], [0, 0, 0, 0]])
+        result = bootstrap_diversity(counts, resamples=400, seed=3)
+        self.assertTrue((result['shannon_lower'][:2] <= result['shannon'][:2]).all())
+        self.assertTrue((result['shannon'][:2] <= result['shannon_upper'][:2]).all())
+        self.assertEqual(result['total'].tolist(), [100, 10, 0])
+        chunked = bootstrap_diversity(counts, resamples=400, seed=3, max_elements=50)
+        self.assertTrue(result.equals(chunked))
+
+if __name__ == '__main__':
+    unittest.main()
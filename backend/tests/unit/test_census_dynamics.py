@@ -0,0 +1,61 @@
+import unittest
+import numpy as np
+import pandas as pd
+from app.services.ecological_analysis.census_dynamics import match_stems, stem_changes, dynamics_table
+
+EARLIER = pd.DataFrame({
+    'Plot': ['P1', 'P1', 'P1', 'P1', 'P2'],
+    'Quadrant': ['Q1', 'Q1', 'Q2', 'Q2', 'Q1'],
+    'ID': ['T1', 'T2', 'T3', 'T4', 'T1'],
+    'Species': ['a', 'b', 'c', 'd', 'e'],
+    'Condition': ['Live', 'Live', 'Live', 'Dead', 'Live'],
+    'Effective_DBH_cm': [10.0, 20.0, 30.0, 5.0, 40.0],
+    'Height_m': [5.0, 8.0, 10.0, 2.0, 12.0],
+    'Carbon_Stock_M1_kg': [10.0, 40.0, 90.0, 1.0, 200.0],
+})
+LATER = pd.DataFrame({
+    'Plot': ['P1', 'P1', 'P1', 'P2', 'P2'],
+    'Quadrant': ['Q1', 'Q2', 'Q2', 'Q1', 'Q1'],
+    'ID': ['T1', 'T3', 'T9', 'T1', 'T2'],
+    'Species': ['a', 'c', 'x', 'e', 'y'],
+    'Condition': ['Live', 'Dead', 'Live', 'Live', 'Live'],
+    'Effective_DBH_cm': [12.0, 31.0, 6.0, 44.0, 7.0],
+    'Height_m': [6.0, 10.0, 3.0, 13.0, 4.0],
+    'Carbon_Stock_M1_kg': [15.0, 95.0, 2.0, 240.0, 3.0],
+})
+
+class TestCensusDynamics(unittest.TestCase):
+    def test_stems_match_on_plot_quadrant_and_id(self):
+        np.testing.assert_array_equal(match_stems(EARLIER, LATER), [0, 2, -1, 4, -1])
+        stems = stem_changes(EARLIER, LATER, 2.0, 'M1').set_index(['Plot', 'ID'])
+        # T1 of P1 and of P2 are different stems; T2 died (missing), T3 died (recorded dead)
+        self.assertEqual(stems.loc[('P1', 'T1'), 'DBH_increment_cm_yr'], 1.0)
+        self.assertEqual(stems.loc[('P2', 'T1'), 'DBH_increment_cm_yr'], 2.0)
+        self.assertEqual(stems['status'].value_counts().to_dict(), {'survivor': 2, 'dead': 2, 'recruit': 2})
+        self.assertNotIn(('P1', 'T4'), stems.index)
+
+    def test_duplicate_keys_in_the_later_census(self):
+        later = pd.concat([LATER, LATER.iloc[[0]].assign(Species='z', Effective_DBH_cm=3.0)], ignore_index=True)
+        with self.assertLogs(level='WARNING'):
+            np.testing.assert_array_equal(match_stems(EARLIER, later), [0, 2, -1, 4, -1, -1])
+        stems = stem_changes(EARLIER, later, 2.0, 'M1')
+        self.assertEqual(stems['status'].value_counts().to_dict(), {'survivor': 2, 'dead': 2, 'recruit': 3})
+        repeat = stems[stems['Species'].eq('z')]
+        self.assertEqual(repeat['status'].tolist(), ['recruit'])
+        self.assertEqual(stems.loc[stems['Species'].eq('a'), 'DBH_increment_cm_yr'].tolist(), [1.0])
+
+    def test_rates_and_carbon_flux(self):
+        table = dynamics_table(stem_changes(EARLIER, LATER, 2.0, 'M1'), 2.0)
+        p1 = table.loc['P1']
+        self.assertEqual((p1['stems_0'], p1['survivors'], p1['deaths'], p1['recruits']), (3, 1, 2, 1))
+        self.assertAlmostEqual(p1['mortality_rate_yr'], 1 - (1 / 3) ** 0.5)
+        self.assertAlmostEqual(p1['recruitment_rate_yr'], 1 - (1 / 2) ** 0.5)
+        self.assertAlmostEqual(p1['carbon_mortality_kg_yr'], 65.0)
+        # Net flux is growth + recruitment - mortality
+        self.assertAlmostEqual(p1['net_carbon_flux_kg_yr'], 2.5 + 1.0 - 65.0)
+        self.assertEqual(table.loc['P2', 'deaths'], 0)
+        with self.assertRaises(ValueError):
+            stem_changes(EARLIER, LATER, 0.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import unittest
+import numpy as np
+import pandas as pd
+from app.core.config import HILL_MAX_ORDERS
+from app.services.ecological_analysis.community_matrix import build_community_matrix
+from app.services.ecological_analysis.beta_diversity import pairwise_dissimilarity, nearest_rows
+from app.services.ecological_analysis.hill_numbers import hill_profiles, q_grid
+
+class TestCommunityMatrix(unittest.TestCase):
+    def setUp(self):
+        self.df = pd.DataFrame({
+            'Plot': ['P2', 'P1', 'P1', 'P1', 'P2', 'P3', None],
+            'Quadrant': ['Q1', 'Q1', 'Q2', 'Q1', 'Q2', 'Q1', 'Q1'],
+            'Species': ['b', 'a', 'b', 'a', 'c', 'a', 'a'],
+            'Number': [4, 1, 3, 2, 0, 0, 9],
+        })
+
+    def test_rows_columns_and_counts(self):
+        matrix = build_community_matrix(self.df)
+        self.assertEqual(matrix.rows.tolist(), ['P1', 'P2', 'P3'])
+        self.assertEqual(matrix.species.tolist(), ['a', 'b', 'c'])
+        self.assertEqual(matrix.abundance.toarray().tolist(), [[3, 3, 0], [0, 4, 0], [0, 0, 0]])
+        # Zero-abundance records still make the species present
+        self.assertEqual(matrix.richness().tolist(), [2, 2, 1])
+        self.assertEqual(matrix.row_counts('P2').to_dict(), {'b': 4, 'c': 0})
+        self.assertTrue(matrix.row_counts('missing').empty)
+
+    def test_diversity_matches_direct_formulas(self):
+        table = build_community_matrix(self.df).diversity_table()
+        self.assertAlmostEqual(table.at['P1', 'shannon'], np.log(2))
+        self.assertAlmostEqual(table.at['P1', 'simpson'], 0.5)
+        self.assertAlmostEqual(table.at['P1', 'evenness'], 1.0)
+        self.assertAlmostEqual(table.at['P2', 'shannon'], 0.0)
+        self.assertEqual(table.at['P3', 'total'], 0)
+
+    def test_plot_quadrant_rows(self):
+        matrix = build_community_matrix(self.df, by=('Plot', 'Quadrant'))
+        self.assertEqual(matrix.rows.tolist(), [('P1', 'Q1'), ('P1', 'Q2'), ('P2', 'Q1'), ('P2', 'Q2'), ('P3', 'Q1')])
+        self.assertEqual(matrix.row_counts(('P1', 'Q1')).to_dict(), {'a': 3})
+
+class TestBetaDiversity(unittest.TestCase):
+    def setUp(self):
+        self.matrix = build_community_matrix(pd.DataFrame({
+            'Plot': ['P1', 'P1', 'P2', 'P2', 'P3', 'P4'],
+            'Species': ['a', 'b', 'a', 'c', 'c', 'd'],
+            'Number': [2, 2, 1, 3, 4, 5],
+        }))
+
+    def test_blocks_match_direct_formulas(self):
+        for block_elements in (1, 10**6):
+            bray = pairwise_dissimilarity(self.matrix, 'bray_curtis', block_elements)
+            self.assertAlmostEqual(bray[0, 1], (1 + 2 + 3) / (4 + 4))
+            self.assertAlmostEqual(bray[0, 3], 1.0)
+            jaccard = pairwise_dissimilarity(self.matrix, 'jaccard', block_elements)
+            self.assertAlmostEqual(jaccard[0, 1], 1 - 1 / 3)
+            sorensen = pairwise_dissimilarity(self.matrix, 'sorensen', block_elements)
+            self.assertAlmostEqual(sorensen[1, 2], 1 - 2 / 3)
+            np.testing.assert_allclose(jaccard, jaccard.T)
+
+    def test_bray_curtis_matches_dense_reference(self):
+        rng = np.random.default_rng(7)
+        matrix = build_community_matrix(pd.DataFrame({
+            'Plot': [f"P{i:02d}" for i in rng.integers(0, 40, 300)],
+            'Species': [f"s{i}" for i in rng.integers(0, 25, 300)],
+            'Number': rng.integers(0, 9, 300),
+        }))
+        dense = matrix.abundance.toarray()
+        totals = dense.sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            expected = np.nan_to_num(np.abs(dense[:, None, :] - dense[None, :, :]).sum(axis=2)
+                                     / (totals[:, None] + totals[None, :]))
+        for block_elements in (1, 100, 10**6):
+            np.testing.assert_allclose(pairwise_dissimilarity(matrix, 'bray_curtis', block_elements), expected, atol=1e-12)
+
+    def test_nearest_rows(self):
+        nearest = nearest_rows(self.matrix, 'jaccard', k=2, block_elements=3)
+        self.assertEqual([n['plot_id'] for n in nearest['P2']], ['P3', 'P1'])
+        # Ties are broken by plot id and a plot is never its own neighbour
+        self.assertEqual([n['plot_id'] for n in nearest['P4']], ['P1', 'P2'])
+
+class TestHillNumbers(unittest.TestCase):
+    def test_profiles_match_classic_indices(self):
+        matrix = build_community_matrix(pd.DataFrame({
+            'Plot': ['P1', 'P1', 'P1', 'P2', 'P3'],
+            'Species': ['a', 'b', 'c', 'a', 'b'],
+            'Number': [6, 3, 1, 4, 0],
+        }))
+        q = q_grid(0, 2, 0.5)
+        self.assertEqual(q.tolist(), [0, 0.5, 1, 1.5, 2])
+        profiles = hill_profiles(matrix, q)
+        p = np.array([0.6, 0.3, 0.1])
+        self.assertAlmostEqual(profiles.at['P1', 0.0], 3)
+        self.assertAlmostEqual(profiles.at['P1', 1.0], np.exp(-(p * np.log(p)).sum()))
+        self.assertAlmostEqual(profiles.at['P1', 2.0], 1 / (p ** 2).sum())
+        self.assertTrue((profiles.loc['P2'] == 1).all())
+        self.assertTrue(profiles.loc['P3'].isna().all())
+
+    def test_q_grid_size_is_capped(self):
+        self.assertEqual(len(q_grid(0, 1, 1 / (HILL_MAX_ORDERS - 1))), HILL_MAX_ORDERS)
+        with self.assertRaises(ValueError):
+            q_grid(0, 10, 1e-9)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+import numpy as np
+import pandas as pd
+from app.services.data_processing import data_processing_service
+
+WOODY_CSV = """Plot_ID,Location_Name,Quad_ID,Species_Scientific,Growth_Form,Tree_ID,Height_m,Condition,GBH_Stem1_cm,GBH_Stem2_cm,GBH_Stem3_cm,GBH_Stem4_cm,GBH_Stem5_cm,GBH_Stem6_cm,Remarks,Total_GBH_cm
+P01,Garden,Q1,Ficus racemosa,Tree,T1,13.9,Live,99.0,0.0,0.0,0.0,0,0,Live,99.1
+P01,Garden,,Pongamia pinnata,Tree,T2,8.3,Live,40.8,12.0,0.0,0.0,0,0,Live,52.8
+P01,Garden,Q2,Mangifera indica,Saplings,T3,2.0,Live,10.0,0.0,0.0,0.0,0,0,Live,10.0
+P02,Park,Q3,Tectona grandis,Tree,T4,abc,Live,60.0,0.0,0.0,0.0,0,0,Live,60.0
+P02,Park,,Ficus religiosa,Tree,T5,18.0,Live,199.0,0.0,0.0,0.0,0,0,Live,199.2
+"""
+
+HERB_CSV = """Plot_ID,Location_Name,Subplot_ID,Layer_Type,Species_or_Category,Count_or_Cover%,Avg_Height_cm,Notes
+P01,Garden,SP1,Herb,Mixed Herbs,28,20,Live
+P01,Garden,SP9,Grass,Mixed Grasses,28,6,Live
+P02,Park,SP3,Litter,Decomposing Matter,40,0,Live
+"""
+
+class TestStreamingCleaner(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+        (self.dir / "woody.csv").write_text(WOODY_CSV)
+        (self.dir / "herb.csv").write_text(HERB_CSV)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _run(self, func, suffix, **kwargs):
+        paths = {
+            'RAW_WOODY_DATA': self.dir / "woody.csv",
+            'RAW_HERB_DATA': self.dir / "herb.csv",
+            'CLEANED_VEG_FULL_PATH': self.dir / f"full_{suffix}.csv",
+            'CLEANED_VEG_TREES_PATH': self.dir / f"trees_{suffix}.csv",
+            'VALIDATION_REPORT_PATH': self.dir / f"report_{suffix}.csv",
+        }
+        with patch.multiple(data_processing_service, **paths):
+            func(**kwargs)
+        return paths
+
+    def test_streaming_matches_in_memory_output(self):
+        in_memory = self._run(data_processing_service.clean_vegetation_data, "memory")
+        streamed = self._run(data_processing_service.stream_clean_vegetation_data, "stream", chunksize=2)
+        for key in ('CLEANED_VEG_FULL_PATH', 'CLEANED_VEG_TREES_PATH', 'VALIDATION_REPORT_PATH'):
+            self.assertEqual(in_memory[key].read_text(), streamed[key].read_text(), key)
+
+    def test_quadrant_ffill_crosses_chunk_boundaries(self):
+        paths = self._run(data_processing_service.stream_clean_vegetation_data, "stream", chunksize=1)
+        df = pd.read_csv(paths['CLEANED_VEG_FULL_PATH'])
+        # T2 and T5 have blank quadrants and are the first row of their chunk
+        self.assertEqual(df.loc[df['ID'] == 'T2', 'Quadrant'].item(), 'Q1')
+        self.assertEqual(df.loc[df['ID'] == 'T5', 'Quadrant'].item(), 'Q3')
+        # An unmapped subplot inherits the previous row's quadrant, as in the in-memory cleaner
+        self.assertEqual(df.loc[df['ID'] == 'Grass_SP9', 'Quadrant'].item(), 'Q1')
+
+    def test_non_numeric_extra_stems_are_coerced(self):
+        woody = WOODY_CSV.replace("T1,13.9,Live,99.0,0.0,0.0,0.0,0,0", "T1,13.9,Live,99.0,0.0,0.0,12 cm,0,n/a")
+        (self.dir / "woody.csv").write_text(woody)
+        for func, suffix, kwargs in ((data_processing_service.clean_vegetation_data, "memory", {}),
+                                     (data_processing_service.stream_clean_vegetation_data, "stream", {"chunksize": 2})):
+            paths = self._run(func, suffix, **kwargs)
+            trees = pd.read_csv(paths['CLEANED_VEG_TREES_PATH'])
+            t1 = trees[trees['ID'] == 'T1'].iloc[0]
+            self.assertTrue(np.isnan(t1['Girth_cm_Stem4']))
+            self.assertTrue(np.isnan(t1['Girth_cm_Stem6']))
+            self.assertAlmostEqual(t1['Effective_DBH_cm'], 99.0 / np.pi, places=4)
+
+    def test_validation_without_saving_writes_nothing(self):
+        paths = {'RAW_WOODY_DATA': self.dir / "woody.csv", 'RAW_HERB_DATA': self.dir / "herb.csv",
+                 'VALIDATION_REPORT_PATH': self.dir / "report.csv"}
+        with patch.multiple(data_processing_service, **paths):
+            report, summary = data_processing_service.validate_raw_data(save=False)
+            self.assertFalse(paths['VALIDATION_REPORT_PATH'].exists())
+            self.assertEqual(summary["total_errors"], len(report))
+            self.assertGreater(len(report), 0)
+            data_processing_service.validate_raw_data()
+            self.assertTrue(paths['VALIDATION_REPORT_PATH'].exists())
+
+class TestStemMetrics(unittest.TestCase):
+    def test_effective_dbh_uses_every_stem(self):
+        girth = np.array([
+            [np.pi * 30, 0.0, np.pi * 40, np.nan],
+            [np.pi * 10, np.nan, np.nan, np.pi * 10],
+        ])
+        dbh, effective_dbh, basal_area, total_basal_area = data_processing_service.stem_metrics(girth)
+        np.testing.assert_allclose(dbh[0, :3], [30, 0, 40])
+        np.testing.assert_allclose(effective_dbh, [50, np.sqrt(200)])
+        np.testing.assert_allclose(basal_area[1, 0], np.pi / 4 * 0.1 ** 2)
+        # The basal area of the effective stem equals the summed basal area of all stems
+        np.testing.assert_allclose(total_basal_area, np.pi / 4 * (effective_dbh / 100) ** 2)
+
+    def test_extract_trees_reads_all_stem_columns(self):
+        df = pd.DataFrame({
+            'Type': ['Tree', 'Shrub'],
+            'Height_m': [10.0, 2.0],
+            'Girth_cm_Stem1': [np.pi * 30, 5.0],
+            'Girth_cm_Stem2': [0.0, 0.0],
+            'Girth_cm_Stem10': [np.pi * 40, 0.0],
+        })
+        trees = data_processing_service._extract_trees(df)
+        self.assertEqual(len(trees), 1)
+        self.assertIn('BA10_m2', trees.columns)
+        self.assertAlmostEqual(trees['Effective_DBH_cm'].item(), 50.0)
+
+if __name__ == '__main__':
+    unittest.main()
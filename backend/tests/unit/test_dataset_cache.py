@@ -0,0 +1,129 @@
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+import pandas as pd
+from app.infrastructure.persistence import dataset_cache
+from app.infrastructure.persistence.dataset_cache import DatasetCache, dataset_version
+from app.infrastructure.persistence.dataset_io import read_dataset, write_dataset
+from app.infrastructure.persistence.plot_index import PlotIndex
+
+class TestDatasetCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+        self.loads = []
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _loader(self, path):
+        self.loads.append(Path(path).name)
+        return read_dataset(path)
+
+    def _write(self, name, n_rows):
+        path = self.dir / name
+        write_dataset(pd.DataFrame({'Plot': ['Plot-P01'] * n_rows, 'Number': range(n_rows)}), path)
+        return path
+
+    def test_warm_reads_skip_the_loader_and_see_rewrites(self):
+        cache = DatasetCache(max_bytes=10**9, loader=self._loader)
+        path = self._write("full.csv", 3)
+        first = cache.get(path)
+        cache.get(path)
+        self.assertEqual(self.loads, ["full.csv"])
+
+        # Columns added by a caller stay out of the cached frame
+        first['Extra'] = 1
+        self.assertNotIn('Extra', cache.get(path).columns)
+        # and so do in-place edits of existing values
+        first.loc[0, 'Number'] = 99
+        self.assertEqual(cache.get(path)['Number'].tolist(), [0, 1, 2])
+
+        self._write("full.csv", 5)
+        os.utime(path, ns=(1, 1))
+        self.assertEqual(len(cache.get(path)), 5)
+        self.assertEqual(cache.version(path), dataset_version(path))
+        self.assertEqual(len(self.loads), 2)
+
+    def test_lru_eviction_respects_memory_cap(self):
+        a, b = self._write("a.csv", 1000), self._write("b.csv", 1000)
+        probe = DatasetCache(loader=self._loader)
+        probe.get(a)
+        cache = DatasetCache(max_bytes=int(probe.current_bytes * 1.5), loader=self._loader)
+        cache.get(a)
+        cache.get(b)
+        self.assertIsNone(cache.version(a))
+        self.assertIsNotNone(cache.version(b))
+
+    def test_store_dataset_invalidates(self):
+        path = self._write("eco.csv", 2)
+        cache = DatasetCache(loader=self._loader)
+        with patch.object(dataset_cache, 'dataset_cache', cache):
+            dataset_cache.load_dataset(path)
+            dataset_cache.store_dataset(pd.DataFrame({'Plot': ['Plot-P02'], 'Number': [1]}), path)
+            self.assertIsNone(cache.version(path))
+            self.assertEqual(dataset_cache.load_dataset(path)['Plot'].tolist(), ['Plot-P02'])
+
+    def test_derived_results_are_measured_and_bounded(self):
+        path = self._write("full.csv", 10)
+        cache = DatasetCache(loader=self._loader, max_derived=3)
+        table = pd.DataFrame({'label': [f"plot {i}" for i in range(1000)]})
+        cache.get_derived(path, 'table', lambda df: table)
+        cache.get_derived(path, 'payload', lambda df: {"plots": table['label'].tolist()})
+        entry = next(iter(cache.entries.values()))
+        # Frames count with their deep memory, plain payloads with that of everything they hold
+        self.assertEqual(entry["derived"]['table']["nbytes"], table.memory_usage(deep=True).sum())
+        self.assertGreater(entry["derived"]['payload']["nbytes"], 1000 * sys.getsizeof("plot 999"))
+
+        for q in range(5):
+            cache.get_derived(path, ('query', q), lambda df: q)
+        self.assertEqual(list(entry["derived"]), [('query', 2), ('query', 3), ('query', 4)])
+        self.assertEqual(cache.current_bytes, entry["frame"].memory_usage(deep=True).sum()
+                         + sum(record["nbytes"] for record in entry["derived"].values()))
+
+    def test_derived_results_follow_their_dependencies(self):
+        path, other = self._write("full.csv", 2), self._write("eco.csv", 2)
+        cache = DatasetCache(loader=self._loader)
+        builds = []
+        build = lambda df: builds.append(1) or len(builds)
+        self.assertEqual(cache.get_derived(path, 'features', build, (other,)), 1)
+        self.assertEqual(cache.get_derived(path, 'features', build, (other,)), 1)
+        self._write("eco.csv", 3)
+        os.utime(other, ns=(1, 1))
+        # Rebuilt in place rather than kept next to the stale result
+        self.assertEqual(cache.get_derived(path, 'features', build, (other,)), 2)
+        self.assertEqual(list(next(iter(cache.entries.values()))["derived"]), ['features'])
+
+    def test_same_size_edit_makes_the_schema_stale(self):
+        path = self._write("full.csv", 2)
+        stat = os.stat(path)
+        path.write_text(path.read_text().replace('Plot-P01', 'Plot-P02'))
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        self.assertEqual(os.path.getsize(path), stat.st_size)
+        self.assertEqual(read_dataset(path)['Plot'].tolist(), ['Plot-P02', 'Plot-P02'])
+
+class TestPlotIndex(unittest.TestCase):
+    def test_slices_match_boolean_selection(self):
+        df = pd.DataFrame({
+            'Plot': pd.Categorical(['P2', 'P1', None, 'P2', 'P3', 'P1'], categories=['P1', 'P2', 'P3', 'P4']),
+            'Number': [1, 2, 3, 4, 5, 6],
+        })
+        index = PlotIndex(df)
+        self.assertEqual(index.keys(), ['P1', 'P2', 'P3'])
+        for plot_id in ('P1', 'P2', 'P3', 'P4', 'missing'):
+            pd.testing.assert_frame_equal(index.get(plot_id), df[df['Plot'] == plot_id])
+
+    def test_index_is_built_once_per_version(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "eco.csv"
+            write_dataset(pd.DataFrame({'plot_id': ['b', 'a', 'b'], 'lai': [1.0, 2.0, 3.0]}), path)
+            cache = DatasetCache()
+            index = cache.get_index(path, 'plot_id')
+            self.assertIs(cache.get_index(path, 'plot_id'), index)
+            self.assertEqual(index.get('b')['lai'].tolist(), [1.0, 3.0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+import pandas as pd
+from app.services.ecological_analysis import diversity_stats
+from app.services.ecological_analysis.diversity_stats import DiversityAggregator, INDICES
+from app.services.ecological_analysis.community_matrix import build_community_matrix
+from app.infrastructure.persistence.dataset_io import write_dataset
+
+RECORDS = pd.DataFrame({
+    'Plot': ['P1', 'P1', 'P1', 'P2', 'P2', 'P2'],
+    'Species': ['a', 'b', 'a', 'a', 'c', 'd'],
+    'Number': [3, 5, 2, 1, 0, 4],
+})
+
+def full_indices(df: pd.DataFrame) -> pd.DataFrame:
+    table = build_community_matrix(df).diversity_table()[INDICES]
+    return table.set_axis(pd.Index([str(plot) for plot in table.index], name='Plot'))
+
+class TestDiversityStats(unittest.TestCase):
+    def test_upsert_matches_full_recompute(self):
+        aggregator = DiversityAggregator.from_records(RECORDS)
+        pd.testing.assert_frame_equal(aggregator.indices(), full_indices(RECORDS), check_dtype=False)
+        # Update one row of P1, drop P2's 'd' and add a new species to P2
+        removed = RECORDS.iloc[[1, 5]]
+        added = pd.DataFrame({'Plot': ['P1', 'P2'], 'Species': ['b', 'e'], 'Number': [7, 2]})
+        aggregator.update(added=added, removed=removed)
+        current = pd.concat([RECORDS.drop(index=[1, 5]), added], ignore_index=True)
+        pd.testing.assert_frame_equal(aggregator.indices(), full_indices(current), check_dtype=False)
+        # A species with records but zero abundance still counts towards richness
+        self.assertEqual(aggregator.indices(['P2']).loc['P2', 'richness'], 3)
+        with self.assertRaises(ValueError):
+            aggregator.update(removed=removed.iloc[[1]])
+
+    def test_refresh_recounts_only_changed_plots(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            full, store = Path(tmp) / "full.csv", Path(tmp) / "diversity_stats.json"
+            write_dataset(RECORDS, full)
+            with patch.object(diversity_stats, 'CLEANED_VEG_FULL_PATH', full), \
+                    patch.object(diversity_stats, 'DIVERSITY_STATS_PATH', store), \
+                    patch.object(diversity_stats, '_state', {"version": None, "aggregator": None}):
+                diversity_stats.refresh_diversity_stats()
+                changed = RECORDS.assign(Number=[3, 5, 2, 9, 0, 4])
+                write_dataset(changed, full)
+                os.utime(full, ns=(1, 1))
+                with patch.object(DiversityAggregator, 'replace_plot', autospec=True,
+                                  side_effect=DiversityAggregator.replace_plot) as replace:
+                    indices = diversity_stats.get_diversity_stats()
+                self.assertEqual([call.args[1] for call in replace.call_args_list], ['P2'])
+                pd.testing.assert_frame_equal(indices, full_indices(changed), check_dtype=False)
+                with open(store) as f:
+                    self.assertEqual(json.load(f)["source_version"], diversity_stats.dataset_version(full))
+                self.assertEqual(diversity_stats.verify_diversity_stats()["mismatched_plots"], [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+from contextlib import ExitStack
+from pathlib import Path
+from unittest.mock import patch
+import pandas as pd
+from app.api.endpoints import analysis_endpoints
+from app.services.ecological_analysis import diversity_stats, ecological_analysis_service, metrics_store
+from app.infrastructure.persistence.dataset_io import write_dataset
+
+FULL = pd.DataFrame({
+    'Plot': ['Plot-P01', 'Plot-P01', 'Plot-P01', 'Plot-P02', 'Plot-P02', 'Plot-P03'],
+    'Species': ['Ficus racemosa', 'Tectona grandis', 'Ficus racemosa', 'Ficus racemosa', 'Mixed Herbs', 'Azadirachta indica'],
+    'Type': ['Tree', 'Tree', 'Tree', 'Tree', 'Herb', 'Shrub'],
+    'Number': [1, 1, 1, 1, 28, 1],
+})
+TREES = pd.DataFrame({
+    'Plot': ['Plot-P01', 'Plot-P01', 'Plot-P01', 'Plot-P02'],
+    'Species': ['Ficus racemosa', 'Tectona grandis', 'Ficus racemosa', 'Ficus racemosa'],
+    'Height_m': [13.9, 4.2, 8.3, 18.0],
+    'Effective_DBH_cm': [31.5, 8.0, 14.2, 63.3],
+})
+
+class TestMetricsStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+        self.full, self.trees, self.store = self.dir / "full.csv", self.dir / "trees.csv", self.dir / "plot_metrics.json"
+        write_dataset(FULL, self.full)
+        write_dataset(TREES, self.trees)
+        self.patches = ExitStack()
+        for module in (metrics_store, ecological_analysis_service, diversity_stats):
+            self.patches.enter_context(patch.object(module, 'CLEANED_VEG_FULL_PATH', self.full))
+        for module in (metrics_store, ecological_analysis_service):
+            self.patches.enter_context(patch.object(module, 'CLEANED_VEG_TREES_PATH', self.trees))
+        self.patches.enter_context(patch.object(metrics_store, 'PLOT_METRICS_PATH', self.store))
+        self.patches.enter_context(patch.object(metrics_store, '_memo', {"source_versions": None, "plots": {}}))
+        self.patches.enter_context(patch.object(diversity_stats, 'DIVERSITY_STATS_PATH', self.dir / "diversity_stats.json"))
+        self.patches.enter_context(patch.object(diversity_stats, '_state', {"version": None, "aggregator": None}))
+
+    def tearDown(self):
+        self.patches.close()
+        self.tmp.cleanup()
+
+    def test_store_matches_per_request_functions(self):
+        references = {
+            'richness': ecological_analysis_service.calculate_species_richness,
+            'diversity': ecological_analysis_service.calculate_diversity_indices,
+            'dominance': ecological_analysis_service.calculate_dominance,
+            'structure': ecological_analysis_service.calculate_structural_metrics,
+        }
+        for plot_id in ('Plot-P01', 'Plot-P02', 'Plot-P03', 'Plot-P99'):
+            for metric, reference in references.items():
+                self.assertEqual(metrics_store.get_plot_metric(plot_id, metric), reference(plot_id), (plot_id, metric))
+
+    def test_rewritten_source_triggers_a_recompute(self):
+        with patch.object(metrics_store, 'compute_plot_metrics', side_effect=metrics_store.compute_plot_metrics) as compute:
+            self.assertEqual(metrics_store.get_plot_metric('Plot-P01', 'richness')['total_richness'], 2)
+            metrics_store.get_plot_metric('Plot-P02', 'richness')
+            self.assertEqual(compute.call_count, 1)
+
+            write_dataset(FULL.assign(Species=FULL['Species'].replace('Tectona grandis', 'Mangifera indica')
+                                      .where(FULL.index != 0, 'Pongamia pinnata')), self.full)
+            os.utime(self.full, ns=(1, 1))
+            richness = metrics_store.get_plot_metric('Plot-P01', 'richness')
+            self.assertEqual(compute.call_count, 2)
+        self.assertEqual(richness['species_list'], ['Ficus racemosa', 'Mangifera indica', 'Pongamia pinnata'])
+        with open(self.store) as f:
+            stamped = json.load(f)["source_versions"]
+        self.assertEqual(stamped["cleaned_full"], metrics_store.dataset_version(self.full))
+
+    def test_batch_matches_per_plot_lookups_with_one_load(self):
+        plot_ids = ['Plot-P03', 'Plot-P01', 'Plot-P99']
+        expected = {plot_id: {metric: metrics_store.get_plot_metric(plot_id, metric) for metric in metrics_store.METRICS}
+                    for plot_id in plot_ids}
+        with patch.object(metrics_store, 'load_plot_metrics', side_effect=metrics_store.load_plot_metrics) as load:
+            self.assertEqual(metrics_store.get_plot_metrics_batch(plot_ids), expected)
+            self.assertEqual(load.call_count, 1)
+        self.assertEqual(metrics_store.get_plot_metrics_batch(plot_ids, 'dominance'),
+                         {plot_id: metrics['dominance'] for plot_id, metrics in expected.items()})
+        self.assertEqual(list(metrics_store.get_plot_metrics_batch(metrics=['richness'])), ['Plot-P01', 'Plot-P02', 'Plot-P03'])
+
+    def test_batch_endpoints(self):
+        everything = asyncio.run(analysis_endpoints.get_plot_metrics_batch(plots=None))
+        self.assertEqual(list(everything), ['Plot-P01', 'Plot-P02', 'Plot-P03'])
+        for endpoint, metric in ((analysis_endpoints.get_species_richness_batch, 'richness'),
+                                 (analysis_endpoints.get_dominance_metrics_batch, 'dominance'),
+                                 (analysis_endpoints.get_structural_metrics_batch, 'structure')):
+            self.assertEqual(asyncio.run(endpoint(plots="Plot-P02, Plot-P99")),
+                             {'Plot-P02': everything['Plot-P02'][metric],
+                              'Plot-P99': metrics_store.get_plot_metric('Plot-P99', metric)})
+        diversity = asyncio.run(analysis_endpoints.get_diversity_indices_batch(plots="Plot-P01", bootstrap=0, ci=0.95, seed=None))
+        self.assertEqual(diversity, {'Plot-P01': everything['Plot-P01']['diversity']})
+
+if __name__ == '__main__':
+    unittest.main()
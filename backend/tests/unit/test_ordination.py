@@ -0,0 +1,41 @@
+import unittest
+import numpy as np
+import pandas as pd
+from scipy.spatial.distance import pdist, squareform
+from unittest.mock import patch
+from app.services.ecological_analysis import ordination
+from app.services.ecological_analysis.ordination import pca, pcoa, standardise
+
+class TestOrdination(unittest.TestCase):
+    def test_pcoa_of_euclidean_distances_matches_pca(self):
+        matrix = np.random.default_rng(5).normal(size=(40, 6)) * [5, 3, 1, 1, 0.5, 0.1]
+        by_pca = pca(matrix)
+        by_pcoa = pcoa(squareform(pdist(matrix)))
+        # Axes agree up to sign, and so does the share of variance they explain
+        np.testing.assert_allclose(np.abs(by_pca['coordinates']), np.abs(by_pcoa['coordinates']), atol=1e-8)
+        np.testing.assert_allclose(by_pca['explained'], by_pcoa['explained'])
+        self.assertGreater(by_pca['explained'][0], by_pca['explained'][1])
+
+    def test_standardise(self):
+        features = pd.DataFrame({
+            'species:a': [0.5, np.nan, 1.0],
+            'stems_per_ha': [100.0, 300.0, np.nan],
+            'constant': [2.0, 2.0, 2.0],
+        }, index=['P1', 'P2', 'P3'])
+        result = standardise(features)
+        self.assertEqual(result.columns.tolist(), ['species:a', 'stems_per_ha'])
+        self.assertEqual(result['species:a'].tolist(), [0.5, 0.0, 1.0])
+        np.testing.assert_allclose(result['stems_per_ha'], [-1.0, 1.0, 0.0])
+
+    def test_empty_plot_selection(self):
+        matrix = pd.DataFrame(np.arange(6.0).reshape(3, 2), index=['P1', 'P2', 'P3'], columns=['a', 'b'])
+        self.assertEqual(pca(np.zeros((0, 2)))['explained'], [])
+        with patch.object(ordination, 'load_feature_matrix', return_value=matrix):
+            clusters = ordination.get_plot_clusters(features=['diversity'], plot_ids=['zzz'])
+            self.assertEqual(clusters['plots'], [])
+            self.assertEqual(clusters['explained_variance'], [])
+            clusters = ordination.get_plot_clusters(features=['diversity'], ordination='pcoa', plot_ids=['zzz'])
+            self.assertEqual(clusters['plots'], [])
+
+if __name__ == '__main__':
+    unittest.main()
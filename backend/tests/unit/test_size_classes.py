@@ -0,0 +1,51 @@
+import unittest
+import numpy as np
+import pandas as pd
+from app.core.config import SIZE_CLASS_MAX_CLASSES
+from app.services.ecological_analysis.size_classes import class_counts, class_edges, size_class_table
+
+TREES = pd.DataFrame({
+    'Plot': ['P2', 'P1', 'P1', 'P2', 'P1'],
+    'Effective_DBH_cm': [5.0, 10.0, 250.0, np.nan, 99.9],
+    'Height_m': [3.0, 8.0, 40.0, 6.0, 55.0],
+})
+
+class TestSizeClasses(unittest.TestCase):
+    def test_matches_pd_cut_and_keeps_large_trees(self):
+        values = np.array([0.0, 9.99, 10.0, 30.0, 120.0, np.nan, -1.0])
+        edges = [0, 10, 30, 100]
+        expected = pd.cut(values, bins=edges, right=False).value_counts().to_numpy()
+        np.testing.assert_array_equal(class_counts(np.zeros(7, dtype=np.int64), 1, values, edges)[0], expected)
+        # The default classes end open, so a 250 cm tree lands in '>100cm' instead of dropping out
+        table = size_class_table(TREES, 'dbh')
+        self.assertEqual(table.loc['P1', '>100cm'], 1)
+        self.assertEqual(int(table.to_numpy().sum()), 4)
+
+    def test_custom_edges_and_width(self):
+        table = size_class_table(TREES, 'height', edges=[0, 10, 50])
+        self.assertEqual(table.columns.tolist(), ['0-10m', '10-50m', '>50m'])
+        self.assertEqual(table.loc['P1'].tolist(), [1, 1, 1])
+        self.assertEqual(table.loc['P2'].tolist(), [2, 0, 0])
+        widths = size_class_table(TREES, 'dbh', width=100)
+        self.assertEqual(widths.columns.tolist(), ['0-100cm', '100-200cm', '200-300cm', '>300cm'])
+        self.assertEqual(widths.loc['P1'].tolist(), [2, 0, 1, 0])
+
+    def test_number_of_classes_is_capped(self):
+        with self.assertRaises(ValueError):
+            size_class_table(TREES, 'dbh', width=1e-9)
+        with self.assertRaises(ValueError):
+            size_class_table(TREES, 'dbh', edges=np.arange(SIZE_CLASS_MAX_CLASSES + 1))
+        self.assertEqual(size_class_table(TREES, 'dbh', width=250 / (SIZE_CLASS_MAX_CLASSES - 1)).shape[1],
+                         SIZE_CLASS_MAX_CLASSES)
+
+    def test_edges_must_be_finite(self):
+        for edges in ([0, np.nan, 20], [0, 10, np.nan], [-np.inf, 10, 20], [0, np.inf, np.inf]):
+            with self.assertRaises(ValueError):
+                class_edges(edges)
+        for width in (np.nan, np.inf):
+            with self.assertRaises(ValueError):
+                class_edges(width=width, maximum=50)
+        self.assertEqual(class_edges([0, 10, np.inf]).tolist(), [0, 10, np.inf])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+import numpy as np
+import pandas as pd
+from scipy.spatial.distance import cdist
+from app.services.ecological_analysis.spatial import quadrant_bounds, stem_positions, spatial_tables
+from app.services.ecological_analysis.stand_structure import DEFAULT_PLOT_CONFIGURATION
+
+rng = np.random.default_rng(3)
+N = 60
+STEMS = pd.DataFrame({
+    'Plot': 'P1',
+    'Quadrant': 'Q1',
+    'ID': [f'T{i}' for i in range(N)],
+    'X_m': rng.uniform(0, 10, N),
+    'Y_m': rng.uniform(0, 10, N),
+    'Effective_DBH_cm': rng.uniform(5, 50, N),
+})
+
+class TestSpatial(unittest.TestCase):
+    def test_kd_tree_statistics_match_brute_force(self):
+        tables = spatial_tables(STEMS, hegyi_radius=3.0, radii=[1.0, 2.5])
+        points = STEMS[['X_m', 'Y_m']].to_numpy()
+        distances = cdist(points, points)
+        np.fill_diagonal(distances, np.inf)
+        np.testing.assert_allclose(tables['stems']['nn_distance_m'], distances.min(axis=1))
+        dbh = STEMS['Effective_DBH_cm'].to_numpy()
+        hegyi = np.where(distances <= 3.0, dbh[None, :] / dbh[:, None] / distances, 0.0).sum(axis=1)
+        np.testing.assert_allclose(tables['stems']['hegyi_index'], hegyi)
+        # Ripley's K with translation edge correction over all ordered pairs
+        offsets = np.abs(points[:, None, :] - points[None, :, :])
+        weights = 100.0 / ((10 - offsets[..., 0]) * (10 - offsets[..., 1]))
+        expected = [100.0 / (N * (N - 1)) * weights[distances <= r].sum() for r in (1.0, 2.5)]
+        np.testing.assert_allclose(tables['ripley'].loc['P1', 'ripley_k'], expected)
+        self.assertAlmostEqual(tables['plots'].loc['P1', 'clark_evans_r'],
+                               distances.min(axis=1).mean() / (0.5 / np.sqrt(N / 100.0)))
+
+    def test_positions_without_coordinates_stay_in_their_quadrant(self):
+        self.assertEqual(quadrant_bounds(DEFAULT_PLOT_CONFIGURATION, 'Q2'), (0.0, 0.0, 5.0, 5.0))
+        self.assertEqual(quadrant_bounds(DEFAULT_PLOT_CONFIGURATION, 'Q4'), (5.0, 5.0, 5.0, 5.0))
+        stems = STEMS.assign(Quadrant='Q3')
+        stems.loc[:9, 'X_m'] = np.nan
+        positions = stem_positions(stems, margin=0.5)
+        derived = positions['Position_Source'].eq('derived')
+        self.assertEqual(int(derived.sum()), 10)
+        self.assertTrue(positions.loc[derived, 'X_m'].between(5.5, 9.5).all())
+        self.assertTrue(positions.loc[derived, 'Y_m'].between(0.5, 4.5).all())
+        # Derived stems are left out of the statistics unless asked for
+        self.assertEqual(spatial_tables(stems)['plots'].loc['P1', 'stems'], N - 10)
+        self.assertEqual(spatial_tables(stems, include_derived=True)['plots'].loc['P1', 'stems'], N)
+
+if __name__ == '__main__':
+    unittest.main()
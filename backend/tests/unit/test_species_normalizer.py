@@ -0,0 +1,52 @@
+import unittest
+import numpy as np
+import pandas as pd
+from app.services.data_processing.species_normalizer import SpeciesIndex, SpeciesResolver
+
+REFERENCE = pd.DataFrame({
+    'name': ['Azadirachta indica', 'Melia azadirachta', 'Neem', 'Tectona grandis', 'Teak', 'Ficus religiosa', 'Ficus racemosa'],
+    'accepted_name': ['Azadirachta indica', 'Azadirachta indica', 'Azadirachta indica', 'Tectona grandis', 'Tectona grandis', 'Ficus religiosa', 'Ficus racemosa'],
+    'name_type': ['accepted', 'synonym', 'common', 'accepted', 'common', 'accepted', 'accepted'],
+    'family': ['Meliaceae', 'Meliaceae', 'Meliaceae', 'Lamiaceae', 'Lamiaceae', 'Moraceae', 'Moraceae'],
+})
+
+class TestSpeciesNormalizer(unittest.TestCase):
+    def setUp(self):
+        self.index = SpeciesIndex(REFERENCE)
+
+    def test_exact_synonym_and_common_names(self):
+        self.assertEqual(self.index.resolve('Azadirachta indica'), ('Azadirachta indica', 'accepted'))
+        self.assertEqual(self.index.resolve('melia  Azadirachta'), ('Azadirachta indica', 'synonym'))
+        self.assertEqual(self.index.resolve('NEEM'), ('Azadirachta indica', 'common'))
+        self.assertEqual(self.index.resolve('Tectona grandis (teak)'), ('Tectona grandis', 'accepted'))
+
+    def test_common_name_collisions(self):
+        reference = pd.concat([REFERENCE, pd.DataFrame({
+            'name': ['Ficus racemosa', 'Ber', 'ber'],
+            'accepted_name': ['Ficus religiosa', 'Ziziphus mauritiana', 'Ziziphus jujuba'],
+            'name_type': ['common', 'common', 'common'],
+            'family': ['Moraceae', 'Rhamnaceae', 'Rhamnaceae'],
+        })], ignore_index=True)
+        index = SpeciesIndex(reference)
+        # A common name of another taxon does not hide an accepted name with the same key
+        self.assertEqual(index.resolve('Ficus racemosa'), ('Ficus racemosa', 'accepted'))
+        # A common name shared by two taxa stays unresolved
+        self.assertEqual(index.resolve('Ber'), ('Ber', 'unmatched'))
+
+    def test_fuzzy_fallback(self):
+        self.assertEqual(self.index.resolve('Tectona grandiss'), ('Tectona grandis', 'fuzzy'))
+        self.assertEqual(self.index.resolve('Ficus religosa'), ('Ficus religiosa', 'fuzzy'))
+        # Too far from any reference name, or too short to correct safely
+        self.assertEqual(self.index.resolve('Mixed Herbs'), ('Mixed Herbs', 'unmatched'))
+        self.assertEqual(self.index.resolve('Nem'), ('Nem', 'unmatched'))
+
+    def test_resolver_memoises_distinct_values(self):
+        resolver = SpeciesResolver(self.index)
+        species = pd.Series(['Neem', 'Azadirachta indica', np.nan, 'Neem', 'Teak'] * 100)
+        names, levels = resolver.normalize(species)
+        self.assertEqual(len(resolver.memo), 3)
+        self.assertEqual(names.dropna().unique().tolist(), ['Azadirachta indica', 'Tectona grandis'])
+        self.assertTrue(pd.isna(names.iloc[2]) and pd.isna(levels.iloc[2]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+import numpy as np
+import pandas as pd
+from app.domain.entities import PlotConfiguration, PlotDimensions, GridConfiguration
+from app.services.ecological_analysis.stand_structure import stand_tables, taper_volume
+
+TREES = pd.DataFrame({
+    'Plot': ['P1', 'P1', 'P1', 'P1', 'P2'],
+    'Quadrant': ['Q1', 'Q1', 'Q2', 'Q3', 'Q1'],
+    'Species': ['Ficus racemosa', 'Tectona grandis', 'Ficus racemosa', 'Ficus racemosa', 'Tectona grandis'],
+    'Effective_DBH_cm': [20.0, 10.0, 30.0, 10.0, 40.0],
+    'Height_m': [10.0, 6.0, 12.0, 1.0, 15.0],
+})
+
+class TestStandStructure(unittest.TestCase):
+    def test_taper_volume(self):
+        # Cylinder up to breast height, then a cone (p = 1) integrating to a third of its cylinder
+        np.testing.assert_allclose(taper_volume([0.5, 0.5], [7.3, 1.0], exponent=1.0), [0.5 * (1.3 + 2.0), 0.5])
+
+    def test_per_hectare_and_importance_values(self):
+        large = PlotConfiguration(dimensions=PlotDimensions(width=20, height=20), grid=GridConfiguration(rows=2, cols=2))
+        tables = stand_tables(TREES, {'P2': large})
+        plots = tables['plot']
+        np.testing.assert_allclose(plots['area_ha'], [0.01, 0.04])
+        np.testing.assert_allclose(plots['stems_per_ha'], [400, 25])
+        ba = np.pi / 40000 * np.array([20.0, 10.0, 30.0, 10.0]) ** 2
+        self.assertAlmostEqual(plots.loc['P1', 'basal_area_m2_per_ha'], ba.sum() / 0.01)
+        self.assertAlmostEqual(tables['quadrant'].loc[('P1', 'Q1'), 'stems_per_ha'], 2 / 0.0025)
+
+        importance = tables['importance'].loc['P1']
+        self.assertEqual(importance.index.tolist(), ['Ficus racemosa', 'Tectona grandis'])
+        # Ficus: 3 of 4 stems, 3 of 4 quadrant occurrences, and its share of the basal area
+        expected = 75 + 75 + (ba[[0, 2, 3]].sum() / ba.sum()) * 100
+        self.assertAlmostEqual(importance.loc['Ficus racemosa', 'ivi'], expected)
+        self.assertAlmostEqual(importance['ivi'].sum(), 300)
+
+    def test_sampled_quadrants_without_trees(self):
+        sampled = pd.MultiIndex.from_tuples([('P1', 'Q1'), ('P1', 'Q4'), ('P2', 'Q1'), ('P2', 'Q2'), ('P3', 'Q1')],
+                                            names=['Plot', 'Quadrant'])
+        tables = stand_tables(TREES, sampled=sampled)
+        quadrants = tables['quadrant']
+        self.assertEqual(quadrants.loc['P2'].index.tolist(), ['Q1', 'Q2'])
+        self.assertEqual(quadrants.loc[('P2', 'Q2'), 'stems_per_ha'], 0)
+        self.assertEqual(quadrants.loc[('P1', 'Q4'), 'basal_area_m2_per_ha'], 0)
+        # Quadrants with trees are kept even if the sample list misses them
+        self.assertIn(('P1', 'Q3'), quadrants.index)
+        self.assertEqual(tables['plot'].loc['P3', 'stems'], 0)
+        self.assertEqual(tables['plot'].loc['P1', 'stems'], 4)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+import numpy as np
+import pandas as pd
+from unittest.mock import patch
+from scipy import stats
+from app.core.config import ALLOMETRIC_MODELS_SELECTED
+from app.services.ecological_analysis import statistics
+from app.services.ecological_analysis.stand_structure import stand_tables
+from app.services.ecological_analysis.statistics import group_tests, correlation_matrix
+
+class TestStatistics(unittest.TestCase):
+    def test_grouped_tests_match_scipy(self):
+        rng = np.random.default_rng(2)
+        groups = np.repeat(['a', 'b', 'c'], 15)
+        values = np.column_stack([
+            rng.normal(size=45) + np.repeat([0.0, 0.4, 1.0], 15) + 1e6,
+            np.round(rng.normal(size=45)),  # many ties
+        ])
+        values[4, 0] = np.nan
+        result = group_tests(values, groups)
+        for j in range(values.shape[1]):
+            samples = [values[groups == group, j] for group in 'abc']
+            samples = [sample[~np.isnan(sample)] for sample in samples]
+            anova, kruskal = stats.f_oneway(*samples), stats.kruskal(*samples)
+            self.assertAlmostEqual(result['anova']['f'][j], anova.statistic, places=6)
+            self.assertAlmostEqual(result['anova']['p'][j], anova.pvalue, places=10)
+            self.assertAlmostEqual(result['kruskal']['h'][j], kruskal.statistic, places=10)
+            self.assertAlmostEqual(result['kruskal']['p'][j], kruskal.pvalue, places=10)
+            np.testing.assert_allclose(result['mean'][:, j], [sample.mean() for sample in samples])
+            np.testing.assert_allclose(result['sd'][:, j], [sample.std(ddof=1) for sample in samples], rtol=1e-6)
+        self.assertEqual(result['n'][:, 0].tolist(), [14, 15, 15])
+
+    def test_fewer_than_two_groups_have_no_degrees_of_freedom(self):
+        values = np.array([[1.0, np.nan], [2.0, np.nan], [4.0, 3.0]])
+        result = group_tests(values, ['a', 'a', 'a'])
+        for key in ('f', 'p', 'df_between', 'df_within', 'eta_squared'):
+            self.assertTrue(np.isnan(result['anova'][key]).all(), key)
+        self.assertTrue(np.isnan(result['kruskal']['df']).all())
+        result = group_tests(np.empty((0, 1)), [])
+        self.assertTrue(np.isnan(result['anova']['df_between']).all())
+        self.assertEqual(result['groups'], [])
+
+    def test_treeless_quadrants_are_observations(self):
+        model = ALLOMETRIC_MODELS_SELECTED[0]
+        trees = pd.DataFrame({
+            'Plot': ['P1', 'P1', 'P2'], 'Quadrant': ['Q1', 'Q2', 'Q1'], 'Species': ['A', 'B', 'A'],
+            'Effective_DBH_cm': [20.0, 10.0, 30.0], 'Height_m': [10.0, 6.0, 12.0],
+            f'Carbon_Stock_{model}_kg': [50.0, 10.0, 80.0], f'CO2_Eq_{model}_kg': [183.0, 36.6, 292.8],
+        })
+        sampled = pd.MultiIndex.from_tuples([('P1', 'Q1'), ('P1', 'Q2'), ('P2', 'Q1'), ('P2', 'Q2')],
+                                            names=['Plot', 'Quadrant'])
+        with patch.object(statistics, 'load_stand_tables', return_value=stand_tables(trees, sampled=sampled)):
+            observations = statistics._quadrant_observations(trees)
+        self.assertEqual(len(observations), 4)
+        treeless = observations.set_index(['Plot', 'Quadrant']).loc[('P2', 'Q2')]
+        self.assertEqual(treeless['stems_per_ha'], 0)
+        self.assertEqual(treeless['carbon_kg_per_ha'], 0)
+        self.assertEqual(treeless['co2_kg_per_ha'], 0)
+        result = group_tests(observations[['stems_per_ha']].to_numpy(), observations['Plot'])
+        self.assertEqual(result['anova']['df_within'][0], 2)
+
+    def test_correlation_matrix(self):
+        table = pd.DataFrame({'x': [1.0, 2.0, 3.0, 4.0, 5.0], 'y': [2.0, 1.0, 4.0, 3.0, np.nan], 'z': [5.0, 4.0, 3.0, 2.0, 1.0]})
+        result = correlation_matrix(table, 'spearman')
+        rho, p = stats.spearmanr(table['x'][:4], table['y'][:4])
+        self.assertAlmostEqual(result['r'][0, 1], rho)
+        self.assertAlmostEqual(result['p'][0, 1], p)
+        self.assertEqual(result['n'][0, 1], 4)
+        self.assertAlmostEqual(result['r'][0, 2], -1.0)
+        with self.assertRaises(ValueError):
+            correlation_matrix(table, 'kendall')
+
+    def test_correlation_needs_three_pairs(self):
+        result = correlation_matrix(pd.DataFrame({'a': [1.0, 2.0], 'b': [3.0, 1.0]}))
+        self.assertTrue(np.isnan(result['r']).all())
+        self.assertTrue(np.isnan(result['p']).all())
+        self.assertEqual(result['n'].tolist(), [[2, 2], [2, 2]])
+        # Three points on a line are a perfect correlation
+        result = correlation_matrix(pd.DataFrame({'a': [1.0, 2.0, 3.0, 4.0], 'b': [3.0, 1.0, -1.0, np.nan]}))
+        self.assertAlmostEqual(result['r'][0, 1], -1.0)
+        self.assertEqual(result['p'][0, 1], 0.0)
+        self.assertEqual(result['p'][0, 0], 0.0)
+
+if __name__ == '__main__':
+    unittest.main()
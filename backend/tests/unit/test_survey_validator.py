@@ -0,0 +1,58 @@
+import unittest
+import numpy as np
+import pandas as pd
+from app.services.data_processing.survey_validator import (
+    validate_frame,
+    validate_survey_data,
+    summarize_errors,
+    WOODY_RULES,
+    HERB_RULES,
+)
+
+class TestSurveyValidator(unittest.TestCase):
+    def setUp(self):
+        self.woody_df = pd.DataFrame({
+            'Plot_ID': ['P01', 'P01', None, 'P02'],
+            'Quad_ID': ['Q1', ' ', 'Q7', 'Q2'],
+            'Growth_Form': ['Tree', 'Saplings', 'Tree', 'Palm'],
+            'Height_m': ['4.1', 'abc', '', '250'],
+            'GBH_Stem1_cm': [15.0, 20.0, -1.0, 30.0],
+            'GBH_Stem2_cm': [0.0, np.nan, 0.0, 0.0],
+        })
+        self.herb_df = pd.DataFrame({
+            'Plot_ID': ['P01', 'P01'],
+            'Subplot_ID': ['SP1', 'SP5'],
+            'Layer_Type': ['Herb', 'Grass'],
+            'Count_or_Cover%': [28, 104],
+            'Avg_Height_cm': [20, 6],
+        })
+
+    def _violations(self, report):
+        return set(zip(report['row'], report['column'].astype(str), report['rule'].astype(str)))
+
+    def test_woody_rules(self):
+        report = validate_frame(self.woody_df, WOODY_RULES)
+        self.assertEqual(self._violations(report), {
+            (1, 'Height_m', 'numeric'),
+            (2, 'Plot_ID', 'required'),
+            (2, 'Quad_ID', 'pattern'),
+            (2, 'GBH_Stem1_cm', 'range[0,2000]'),
+            (3, 'Growth_Form', 'allowed'),
+            (3, 'Height_m', 'range[0,120]'),
+        })
+
+    def test_row_offset_and_dataset_column(self):
+        report = validate_survey_data(None, self.herb_df, row_offsets=(0, 100))
+        self.assertEqual(set(report['dataset'].astype(str)), {'herb'})
+        self.assertEqual(self._violations(report.drop(columns='dataset')), {
+            (101, 'Subplot_ID', 'pattern'),
+            (101, 'Count_or_Cover%', 'range[0,100]'),
+        })
+
+    def test_clean_data_has_no_errors(self):
+        report = validate_frame(self.herb_df.iloc[:1], HERB_RULES)
+        self.assertTrue(report.empty)
+        self.assertEqual(summarize_errors(report)["total_errors"], 0)
+
+if __name__ == '__main__':
+    unittest.main()
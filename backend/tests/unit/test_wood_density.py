@@ -0,0 +1,47 @@
+import unittest
+import numpy as np
+import pandas as pd
+from app.services.data_processing.species_normalizer import SpeciesIndex
+from app.services.ecological_analysis.wood_density import WoodDensityIndex
+
+SPECIES = pd.DataFrame({
+    'name': ['Pongamia pinnata', 'Millettia pinnata', 'Albizia lebbeck', 'Ficus religiosa', 'Tectona grandis'],
+    'accepted_name': ['Pongamia pinnata', 'Pongamia pinnata', 'Albizia lebbeck', 'Ficus religiosa', 'Tectona grandis'],
+    'name_type': ['accepted', 'synonym', 'accepted', 'accepted', 'accepted'],
+    'family': ['Fabaceae', 'Fabaceae', 'Fabaceae', 'Moraceae', 'Lamiaceae'],
+})
+
+GWDD = pd.DataFrame({
+    'Number': [1, 2, 3, 4, 5],
+    'Family': ['Fabaceae', 'Fabaceae', 'Fabaceae', 'Moraceae', 'Moraceae'],
+    'Binomial': ['Millettia pinnata', 'Pongamia pinnata', 'Dalbergia latifolia', 'Ficus racemosa', 'Ficus racemosa'],
+    'Wood density (g/cm^3), oven dry mass/fresh volume': [0.6, 0.7, 0.8, 0.4, 0.5],
+    'Region': ['India'] * 5,
+})
+
+class TestWoodDensityIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = WoodDensityIndex(GWDD, SpeciesIndex(SPECIES), default=0.62)
+
+    def assertResolves(self, name, family, density, level):
+        resolved_density, resolved_level = self.index.resolve(name, family)
+        self.assertAlmostEqual(resolved_density, density)
+        self.assertEqual(resolved_level, level)
+
+    def test_species_genus_family_fallback(self):
+        # GWDD synonym records are averaged into the accepted species
+        self.assertResolves('Pongamia pinnata', 'Fabaceae', 0.65, 'species')
+        self.assertResolves('Ficus religiosa', 'Moraceae', 0.45, 'genus')
+        # Family mean is the mean of its species means
+        self.assertResolves('Albizia lebbeck', 'Fabaceae', 0.725, 'family')
+        self.assertResolves('Tectona grandis', 'Lamiaceae', 0.62, 'default')
+
+    def test_lookup_broadcasts_per_distinct_species(self):
+        species = pd.Series(['Ficus religiosa', 'Albizia lebbeck', np.nan, 'Ficus religiosa', 'Unknown plant'], index=[3, 4, 5, 6, 7])
+        result = self.index.lookup(species)
+        self.assertEqual(result.index.tolist(), [3, 4, 5, 6, 7])
+        np.testing.assert_allclose(result['Wood_Density_g_cm3'], [0.45, 0.725, 0.62, 0.45, 0.62])
+        self.assertEqual(result['Wood_Density_Match'].tolist(), ['genus', 'family', 'default', 'genus', 'default'])
+
+if __name__ == '__main__':
+    unittest.main()